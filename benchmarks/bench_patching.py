@@ -0,0 +1,72 @@
+# benchmarks/bench_patching.py
+
+"""
+Microbenchmark de la aplicación de parches al payload de un ítem.
+
+Compara la ruta anterior (volcar el payload a dict, asignar cada parche y
+re-validar el `ItemPayloadSchema` completo) con el motor compilado en su
+sitio (`apply_patches_in_place`). La ruta anterior se mide con las rutas ya
+traducidas a índices, es decir, en el caso en que sí aplicaba los parches.
+
+Uso:
+    python -m benchmarks.bench_patching [--number N]
+"""
+
+import argparse
+import copy
+import timeit
+from typing import Any, Dict, List
+
+from benchmarks.bench_validation import SAMPLES
+from ddi.pipelines.utils.patching import apply_patches_in_place, parse_path
+from ddi.schemas.item_schemas import ItemPayloadSchema, RefinementPatch
+
+def _payload() -> ItemPayloadSchema:
+    return ItemPayloadSchema.model_validate({
+        **SAMPLES["GeneratedItemContent"][1],
+        "dominio": {"area": "Ciencias", "asignatura": "Física", "tema": "Cinemática"},
+        "objetivo_aprendizaje": "Interpretar gráficas de posición contra tiempo.",
+        "audiencia": {"nivel_educativo": "Bachillerato"},
+        "nivel_cognitivo": "Analizar",
+        "formato": {},
+        "metadata_creacion": {"agente_generador": "benchmark"},
+    })
+
+def _patches(n: int) -> List[RefinementPatch]:
+    paths = [f"cuerpo_item.opciones[{i % 4}].texto" for i in range(n)]
+    return [
+        RefinementPatch(code="E101_STYLE", field_path=path, description="", refined_value=f"Texto corregido {i}")
+        for i, path in enumerate(dict.fromkeys(paths))
+    ]
+
+def _baseline(payload: ItemPayloadSchema, patches: List[RefinementPatch]) -> ItemPayloadSchema:
+    data: Dict[str, Any] = payload.model_dump()
+    for patch in patches:
+        node: Any = data
+        segments = parse_path(patch.field_path)
+        for segment in segments[:-1]:
+            node = node[segment]
+        node[segments[-1]] = patch.refined_value
+    return ItemPayloadSchema.model_validate(data)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="Iteraciones por medición.")
+    args = parser.parse_args()
+
+    payload = _payload()
+    print(f"{'parches':<10}{'antes (µs)':>14}{'ahora (µs)':>14}{'mejora':>9}")
+    for n in (1, 4):
+        patches = _patches(n)
+        copies = [copy.deepcopy(payload) for _ in range(3 * args.number)]
+        # Comprueba que ambas rutas producen el mismo payload antes de medir.
+        check = copy.deepcopy(payload)
+        apply_patches_in_place(check, patches)
+        assert check == _baseline(payload, patches)
+        before = min(timeit.repeat(lambda: _baseline(payload, patches), number=args.number, repeat=3)) / args.number
+        pool = iter(copies)
+        after = min(timeit.repeat(lambda: apply_patches_in_place(next(pool), patches), number=args.number, repeat=3)) / args.number
+        print(f"{n:<10}{before * 1e6:>14.1f}{after * 1e6:>14.1f}{before / after:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
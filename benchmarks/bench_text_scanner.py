@@ -0,0 +1,142 @@
+# benchmarks/bench_text_scanner.py
+
+"""
+Fuzzing diferencial y benchmark del escáner de respuestas LLM
+(`clean_llm_json`) frente a las expresiones regulares que reemplazó.
+
+1. Genera un corpus reproducible (semilla fija) de respuestas con vallas
+   ```json, texto alrededor, bloques TEXTO_MULTILINEA, marcadores sin cerrar y
+   comillas sueltas, y comprueba que el escáner produce exactamente la misma
+   salida que la implementación anterior. La única diferencia esperada es
+   intencional: una valla ``` dentro del contenido de un bloque multilínea ya
+   no cierra el bloque JSON; esos casos se cuentan aparte.
+2. Mide ambas implementaciones sobre respuestas largas y sobre entradas
+   patológicas (muchos marcadores sin terminar), donde las regex retroceden.
+
+Uso:
+    python -m benchmarks.bench_text_scanner [--cases N] [--seed S]
+"""
+
+import argparse
+import json
+import random
+import re
+import time
+from typing import Callable, List
+
+from ddi.pipelines.utils.parsers import clean_llm_json
+
+# --- Implementación anterior, como referencia ---
+
+_JSON_FENCE = re.compile(r"^\s*```json\s*([\s\S]*?)```\s*$", re.IGNORECASE | re.MULTILINE)
+
+def _regex_extract_json_block(text: str) -> str:
+    m = _JSON_FENCE.search(text.strip())
+    return m.group(1).strip() if m else text.strip()
+
+def _regex_preprocess_multiline_blocks(raw_text: str) -> str:
+    multiline_pattern = re.compile(
+        r'"(.*?)"\s*:\s*"<<<TEXTO_MULTILINEA\n(.*?)\nTEXTO_MULTILINEA>>>"',
+        re.DOTALL
+    )
+
+    def escape_and_replace(match):
+        return f'"{match.group(1)}": {json.dumps(match.group(2))}'
+
+    return multiline_pattern.sub(escape_and_replace, raw_text)
+
+def regex_clean(text: str) -> str:
+    return _regex_preprocess_multiline_blocks(_regex_extract_json_block(text)).strip()
+
+# --- Corpus ---
+
+_FRAGMENTS = [
+    '{', '}', '[', ']', ',', ':', ' ', '\n', '  ', '"', '\\"', 'clave', 'texto con "comillas"',
+    '"campo": ', '"valor"', '```', '```json', '```JSON\n', 'json', 'TEXTO_MULTILINEA',
+    '"<<<TEXTO_MULTILINEA\n', '\nTEXTO_MULTILINEA>>>"', '<<<', '>>>', 'Aquí está el JSON:',
+    'á é ñ', '\t', '\r\n',
+]
+
+def _random_multiline(rng: random.Random) -> str:
+    lines = [rng.choice(["Línea con texto.", 'Cita "literal".', "", "  sangría", "a\\b", "{no es json}"])
+             for _ in range(rng.randint(0, 4))]
+    key = rng.choice(["estimulo", "texto", "justificacion", ""])
+    sep = rng.choice([": ", ":", " : ", ":\n  "])
+    terminated = rng.random() > 0.15
+    block = f'"{key}"{sep}"<<<TEXTO_MULTILINEA\n' + "\n".join(lines)
+    return block + ('\nTEXTO_MULTILINEA>>>"' if terminated else "")
+
+def _random_response(rng: random.Random) -> str:
+    parts: List[str] = []
+    for _ in range(rng.randint(1, 12)):
+        r = rng.random()
+        if r < 0.25:
+            parts.append(_random_multiline(rng))
+        elif r < 0.35:
+            parts.append(json.dumps({"a": rng.randint(0, 9), "b": [True, None, "x"]}, ensure_ascii=False))
+        else:
+            parts.append(rng.choice(_FRAGMENTS))
+    body = "".join(parts)
+    if rng.random() < 0.6:
+        indent = rng.choice(["", "  ", "\n", "Respuesta:\n"])
+        closing = rng.choice(["```", "```  ", "``` \n", "", "```\nFin."])
+        body = f"{indent}```{rng.choice(['json', 'JSON', 'Json'])}\n{body}\n{closing}"
+    return body
+
+def _fence_inside_block(text: str) -> bool:
+    """True si alguna valla ``` cae dentro del contenido de un bloque multilínea."""
+    pos = text.find("<<<TEXTO_MULTILINEA\n")
+    while pos != -1:
+        end = text.find("\nTEXTO_MULTILINEA>>>", pos)
+        if end == -1:
+            return False
+        if "```" in text[pos:end]:
+            return True
+        pos = text.find("<<<TEXTO_MULTILINEA\n", end)
+    return False
+
+# --- Ejecución ---
+
+def _time(fn: Callable[[str], str], text: str, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=20000, help="Tamaño del corpus de fuzzing.")
+    parser.add_argument("--seed", type=int, default=20250806)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    mismatches = intended = 0
+    for i in range(args.cases):
+        text = _random_response(rng)
+        expected, actual = regex_clean(text), clean_llm_json(text)
+        if expected != actual and _fence_inside_block(text):
+            intended += 1
+        elif expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"DIFERENCIA en el caso {i}:\n  entrada: {text!r}\n  regex:   {expected!r}\n  escáner: {actual!r}")
+    print(f"Fuzzing: {args.cases} casos, {mismatches} diferencias ({intended} intencionales por vallas dentro de bloques).\n")
+
+    block = '"estimulo": "<<<TEXTO_MULTILINEA\n' + "Párrafo de estímulo.\n" * 40 + 'TEXTO_MULTILINEA>>>"'
+    long_response = "```json\n{" + ", ".join([block] * 6) + ', "x": 1}\n```'
+    inputs = {
+        "arquitecto (6 bloques)": long_response,
+        "marcadores sin cerrar x50": '{"a": "<<<TEXTO_MULTILINEA\n' + 'x "b": "<<<TEXTO_MULTILINEA\n' * 50,
+        "marcadores sin cerrar x150": '{"a": "<<<TEXTO_MULTILINEA\n' + 'x "b": "<<<TEXTO_MULTILINEA\n' * 150,
+        "vallas sin cierre x2000": "```json\n" + "``` x\n" * 2000,
+    }
+    print(f"{'entrada':<30}{'bytes':>9}{'regex (ms)':>13}{'escáner (ms)':>15}")
+    for name, text in inputs.items():
+        before = _time(regex_clean, text)
+        after = _time(clean_llm_json, text)
+        print(f"{name:<30}{len(text.encode()):>9}{before * 1e3:>13.2f}{after * 1e3:>15.3f}")
+
+if __name__ == "__main__":
+    main()
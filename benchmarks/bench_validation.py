@@ -0,0 +1,101 @@
+# benchmarks/bench_validation.py
+
+"""
+Microbenchmark del parseo + validación de salidas LLM por esquema de etapa.
+
+Compara la ruta anterior (TypeAdapter nuevo en cada llamada, `json.loads`
+y `validate_python`) con el registro precompilado (`validate_llm_json`).
+
+Uso:
+    python -m benchmarks.bench_validation [--number N]
+"""
+
+import argparse
+import json
+import timeit
+from typing import Any, Dict, List
+
+from pydantic import TypeAdapter
+
+from ddi.schemas.adapters import validate_llm_json
+from ddi.schemas.item_schemas import FinalEvaluationSchema, GeneratedItemContent, PlanDeItem, RefinementPatch
+
+_TEXTO = "Texto de ejemplo con la longitud típica de una justificación generada por el modelo. " * 3
+
+SAMPLES: Dict[str, Any] = {
+    "PlanDeItem": (PlanDeItem, {
+        "faceta_a_evaluar": _TEXTO,
+        "modelo_evidencia": {
+            "evidencia_positiva": {"razonamiento": _TEXTO},
+            "evidencia_negativa": [
+                {
+                    "descripcion_razonamiento": _TEXTO,
+                    "clasificacion_error": {"distancia": "Cercano", "origen": "Concepto"},
+                    "work_product_esperado": _TEXTO,
+                }
+                for _ in range(3)
+            ],
+        },
+    }),
+    "GeneratedItemContent": (GeneratedItemContent, {
+        "cuerpo_item": {
+            "estimulo": _TEXTO,
+            "enunciado_pregunta": "¿Cuál de las siguientes opciones es correcta?",
+            "opciones": [{"id": letra, "texto": _TEXTO} for letra in "abcd"],
+        },
+        "clave_y_diagnostico": {
+            "respuesta_correcta_id": "a",
+            "retroalimentacion_opciones": [
+                {"id": letra, "es_correcta": letra == "a", "justificacion": _TEXTO} for letra in "abcd"
+            ],
+        },
+        "trazabilidad_pensamiento": {
+            "constructo_evaluado": _TEXTO,
+            "verbo_bloom": "Analizar",
+            "razonamiento_escenario": _TEXTO,
+            "errores_identificados": [{"tipo_error": "Concepto", "descripcion": _TEXTO} for _ in range(3)],
+            "alineacion_objetivo": {"es_alineado": True},
+        },
+    }),
+    "List[RefinementPatch]": (List[RefinementPatch], [
+        {
+            "code": "E101_STYLE",
+            "field_path": "cuerpo_item.opciones[1].texto",
+            "description": _TEXTO,
+            "original_value": _TEXTO,
+            "refined_value": _TEXTO,
+        }
+        for _ in range(5)
+    ]),
+    "FinalEvaluationSchema": (FinalEvaluationSchema, {
+        "is_ready_for_production": True,
+        "score_total": 87,
+        "score_breakdown": {
+            "psychometric_content_score": 35,
+            "clarity_pedagogy_score": 25,
+            "equity_policy_score": 15,
+            "execution_style_score": 12,
+        },
+        "justification": {"areas_de_mejora": _TEXTO},
+    }),
+}
+
+def _baseline(schema: Any, text: str) -> Any:
+    return TypeAdapter(schema).validate_python(json.loads(text, strict=False))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000, help="Iteraciones por medición.")
+    args = parser.parse_args()
+
+    print(f"{'esquema':<24}{'bytes':>8}{'antes (µs)':>14}{'ahora (µs)':>14}{'mejora':>9}")
+    for name, (schema, payload) in SAMPLES.items():
+        text = json.dumps(payload, ensure_ascii=False)
+        # Comprueba que ambas rutas aceptan la muestra antes de medir.
+        assert _baseline(schema, text) == validate_llm_json(schema, text)
+        before = min(timeit.repeat(lambda: _baseline(schema, text), number=args.number, repeat=3)) / args.number
+        after = min(timeit.repeat(lambda: validate_llm_json(schema, text), number=args.number, repeat=3)) / args.number
+        print(f"{name:<24}{len(text.encode()):>8}{before * 1e6:>14.1f}{after * 1e6:>14.1f}{before / after:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
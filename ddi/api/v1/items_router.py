@@ -9,7 +9,8 @@ from fastapi import (
     WebSocketDisconnect,
 )
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Any, Dict, List
+import asyncio
 import uuid
 
 # Importaciones de la aplicación DDI
@@ -21,15 +22,19 @@ from ddi.schemas.item_schemas import (
 )
 from ddi.schemas.enums import ItemStatus
 from ddi.schemas.models import Item
-from ddi.pipelines.runner import run as run_pipeline_async
+from ddi.pipelines.runner import run as run_pipeline_async, resume as resume_pipeline_async
 from ddi.pipelines.utils.stage_helpers import initialize_items_for_pipeline
+from ddi.core.config import settings
 from ddi.core.log import logger
-from ddi.db.session import get_db
+from ddi.db.session import get_db, SessionLocal
 from ddi.db import crud
 from ddi.api.progress_utils import get_batch_progress
 
 router = APIRouter()
 
+# Lotes con un pipeline en curso en este proceso, para no reanudarlos dos veces.
+_active_batches: set[str] = set()
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: dict[str, WebSocket] = {}
@@ -52,29 +57,114 @@ manager = ConnectionManager()
 async def websocket_endpoint(websocket: WebSocket, batch_id: str):
     await manager.connect(batch_id, websocket)
     logger.info(f"✅ [WS-SERVER] WebSocket CONECTADO para el lote: {batch_id}")
+    poller = asyncio.create_task(_poll_progress(batch_id)) if settings.pipeline_dispatch == "queue" else None
     try:
         while True:
             await websocket.receive_text()
     except WebSocketDisconnect:
         manager.disconnect(batch_id)
         logger.info(f"❌ [WS-SERVER] WebSocket DESCONECTADO para el lote: {batch_id}")
+    finally:
+        if poller is not None:
+            poller.cancel()
+
+async def _poll_progress(batch_id: str):
+    """
+    En modo "queue" el pipeline corre en los workers, que no pueden notificar
+    a los WebSockets de la API: el progreso se lee de la BD periódicamente.
+    """
+    last_sent = None
+    while True:
+        progress = await asyncio.to_thread(_read_batch_progress, batch_id)
+        if progress != last_sent:
+            try:
+                await manager.send_progress_update(batch_id, progress)
+            except Exception as e:
+                logger.warning(f"No se pudo enviar la actualización de progreso por WebSocket para el lote {batch_id}: {e}")
+                return
+            last_sent = progress
+        if progress["is_complete"]:
+            return
+        await asyncio.sleep(settings.worker_progress_poll_s)
+
+def _read_batch_progress(batch_id: str) -> Dict[str, Any]:
+    """Lee el progreso con su propia sesión; se ejecuta en un hilo para no bloquear el bucle de eventos."""
+    db = SessionLocal()
+    try:
+        return get_batch_progress(batch_id, db)
+    finally:
+        db.close()
+
+def _enqueue_batch(db: Session, batch_id: str) -> bool:
+    """Encola el lote para los workers. False si ya estaba en cola o en proceso."""
+    queued = crud.enqueue_job(db, batch_id, settings.worker_max_attempts)
+    if queued:
+        logger.info(f"Lote {batch_id} encolado para los workers.")
+    return queued
 
 async def run_pipeline_in_background(items: List[Item], db: Session):
     batch_id = items[0].batch_id if items else "N/A"
     ctx = {"db_session": db, "ws_manager": manager}
 
+    _active_batches.add(batch_id)
     try:
         await run_pipeline_async(
-            pipeline_config_path="config/pipeline.yml",
+            pipeline_config_path=settings.pipeline_config_path,
             items_to_process=items,
             ctx=ctx,
         )
     except Exception as e:
         logger.error(f"Error crítico al ejecutar pipeline para lote {batch_id}: {e}", exc_info=True)
     finally:
+        _active_batches.discard(batch_id)
         db.close()
         logger.info(f"Sesión de base de datos cerrada para el lote {batch_id}.")
 
+async def resume_pipeline_in_background(batch_id: str, db: Session):
+    """Reanuda un lote interrumpido desde lo persistido en la base de datos."""
+    if batch_id in _active_batches:
+        db.close()
+        return
+    ctx = {"db_session": db, "ws_manager": manager}
+
+    _active_batches.add(batch_id)
+    try:
+        await resume_pipeline_async(settings.pipeline_config_path, batch_id, ctx)
+    except Exception as e:
+        logger.error(f"Error crítico al reanudar el pipeline del lote {batch_id}: {e}", exc_info=True)
+    finally:
+        _active_batches.discard(batch_id)
+        db.close()
+        logger.info(f"Sesión de base de datos cerrada para el lote {batch_id}.")
+
+async def resume_interrupted_batches() -> None:
+    """
+    Encola, al arrancar la aplicación, todos los lotes con ítems sin estado
+    final: las tareas de un proceso anterior se perdieron con él. Los lotes que
+    ya tienen un trabajo activo no se duplican; si su worker murió, el
+    arrendamiento vencido lo libera.
+
+    Solo en modo "queue": el arrendamiento de `pipeline_jobs` garantiza que
+    cada lote lo retome un único worker. En modo "background" el registro de
+    lotes en curso es local a cada réplica y varias réplicas duplicarían el
+    trabajo, así que la reanudación queda en manos del endpoint de resume.
+    """
+    if settings.pipeline_dispatch != "queue":
+        logger.warning(
+            "Reanudación automática desactivada con pipeline_dispatch='background'; "
+            "use POST /items/batch/{batch_id}/resume para los lotes interrumpidos."
+        )
+        return
+    db = SessionLocal()
+    try:
+        queued = [batch_id for batch_id in crud.get_interrupted_batch_ids(db) if _enqueue_batch(db, batch_id)]
+        if queued:
+            logger.info(f"Encolados {len(queued)} lotes interrumpidos: {', '.join(queued)}.")
+    except Exception as e:
+        logger.error(f"No se pudieron encolar los lotes interrumpidos: {e}", exc_info=True)
+    finally:
+        db.close()
+
 @router.post("/items/generate", response_model=GenerationResultSchema, status_code=202)
 async def generate_items(
     params: ItemGenerationParams,
@@ -93,7 +183,14 @@ async def generate_items(
         logger.critical(f"Fallo al persistir ítems iniciales para el lote {batch_id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Error de base de datos al iniciar el proceso.")
 
-    background_tasks.add_task(run_pipeline_in_background, initialized_items, db)
+    if settings.pipeline_dispatch == "queue":
+        try:
+            _enqueue_batch(db, batch_id)
+        except Exception as e:
+            logger.critical(f"Fallo al encolar el lote {batch_id}: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail="Error de base de datos al iniciar el proceso.")
+    else:
+        background_tasks.add_task(run_pipeline_in_background, initialized_items, db)
 
     return GenerationResultSchema(
         message="Proceso de generación de ítems iniciado con éxito.",
@@ -101,6 +198,34 @@ async def generate_items(
         num_items=params.n_items,
     )
 
+@router.post("/items/batch/{batch_id}/resume", response_model=GenerationResultSchema, status_code=202)
+async def resume_batch(
+    batch_id: str,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    db_items = crud.get_items_by_batch_id(db, batch_id)
+    if not db_items:
+        raise HTTPException(status_code=404, detail="ID de lote no encontrado.")
+    if batch_id in _active_batches:
+        raise HTTPException(status_code=409, detail="El lote ya se está procesando.")
+
+    pending = [item for item in db_items if item.status not in crud.TERMINAL_STATUSES]
+    if not pending:
+        raise HTTPException(status_code=409, detail="Todos los ítems del lote ya tienen un estado final.")
+
+    if settings.pipeline_dispatch == "queue":
+        if not _enqueue_batch(db, batch_id):
+            raise HTTPException(status_code=409, detail="El lote ya está en cola o se está procesando.")
+    else:
+        background_tasks.add_task(resume_pipeline_in_background, batch_id, db)
+
+    return GenerationResultSchema(
+        message="Reanudación del lote iniciada con éxito.",
+        batch_id=batch_id,
+        num_items=len(pending),
+    )
+
 @router.get("/items/batch/{batch_id}", response_model=BatchStatusResultSchema)
 def get_batch_status(
     batch_id: str, include_payloads: bool = False, db: Session = Depends(get_db)
@@ -0,0 +1,34 @@
+# ddi/api/v1/llm_status_router.py
+
+from typing import Any, Dict
+
+from fastapi import APIRouter
+
+from ddi.core import metrics
+from ddi.core.config import settings
+from ddi.llm.limiter import limiter_snapshot
+from ddi.llm.retry import breaker_snapshot, get_retry_budget
+from ddi.llm.router import router_snapshot
+
+router = APIRouter()
+
+@router.get("/llm/status")
+def get_llm_status() -> Dict[str, Any]:
+    """
+    Estado operativo de la capa LLM: circuit breakers por proveedor, presupuesto
+    global de reintentos, limitadores, rutas y contadores de métricas.
+
+    El estado es el de este proceso de la API. Con `pipeline_dispatch: queue`
+    los lotes se ejecutan en los workers (`python -m ddi.worker`), cuyos
+    breakers, limitadores y métricas no aparecen aquí; solo reflejan las
+    llamadas LLM hechas por la propia API.
+    """
+    return {
+        "scope": "api_process",
+        "pipeline_dispatch": settings.pipeline_dispatch,
+        "circuit_breakers": breaker_snapshot(),
+        "retry_budget": get_retry_budget().snapshot(),
+        "limiters": limiter_snapshot(),
+        "routes": router_snapshot(),
+        "metrics": metrics.snapshot("llm"),
+    }
@@ -1,6 +1,6 @@
 # ddi/core/config.py
 
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional
 from pydantic import ConfigDict, Field, AnyHttpUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
@@ -24,10 +24,121 @@ class Settings(BaseSettings):
     llm_temperature: float = Field(0.5, env="LLM_TEMPERATURE")
     llm_max_tokens: int = Field(8192, env="LLM_MAX_TOKENS")
     prompt_version: str = Field("2025-08-06", env="PROMPT_VERSION")
+    # Directorio con las versiones de prompts (v_<versión>/); relativo a la raíz del proyecto
+    prompts_dir: str = Field("prompts", env="PROMPTS_DIR")
+    # Versiones adicionales a precargar al arrancar, para servirlas en paralelo
+    prompt_preload_versions: List[str] = Field(default_factory=list, env="PROMPT_PRELOAD_VERSIONS")
+    # Cada cuántos segundos se buscan cambios en los archivos (0 = sin recarga en caliente)
+    prompt_reload_interval_s: float = Field(10.0, env="PROMPT_RELOAD_INTERVAL_S")
+    llm_max_retries: int = Field(3, env="LLM_MAX_RETRIES")
+    # Entradas con más tokens estimados se rechazan sin llamar al LLM (0 = sin límite).
+    llm_max_input_tokens: int = Field(32000, env="LLM_MAX_INPUT_TOKENS")
+
+    # Pool de clientes HTTP hacia los proveedores de LLM
+    llm_request_timeout_s: float = Field(120.0, env="LLM_REQUEST_TIMEOUT_S")
+    llm_http_max_connections: int = Field(50, env="LLM_HTTP_MAX_CONNECTIONS")
+    llm_http_max_keepalive: int = Field(20, env="LLM_HTTP_MAX_KEEPALIVE")
+    llm_http_keepalive_expiry_s: float = Field(60.0, env="LLM_HTTP_KEEPALIVE_EXPIRY_S")
+
+    # Limitador adaptativo por proveedor/modelo (0 = sin límite de RPM/TPM).
+    # `llm_rate_limits` permite valores específicos, p. ej.
+    # {"gemini/gemini-1.5-pro-latest": {"rpm": 360, "tpm": 2000000}}
+    llm_rpm_limit: float = Field(0, env="LLM_RPM_LIMIT")
+    llm_tpm_limit: float = Field(0, env="LLM_TPM_LIMIT")
+    llm_initial_concurrency: int = Field(8, env="LLM_INITIAL_CONCURRENCY")
+    llm_min_concurrency: int = Field(1, env="LLM_MIN_CONCURRENCY")
+    llm_max_concurrency: int = Field(64, env="LLM_MAX_CONCURRENCY")
+    llm_rate_limits: Dict[str, Dict[str, float]] = Field(default_factory=dict, env="LLM_RATE_LIMITS")
+
+    # Salida estructurada nativa (JSON Schema) a partir del esquema de cada etapa
+    llm_structured_output_enabled: bool = Field(True, env="LLM_STRUCTURED_OUTPUT_ENABLED")
+
+    # Caché de prefijos de prompt en el proveedor (context caching de Gemini)
+    llm_prompt_cache_enabled: bool = Field(True, env="LLM_PROMPT_CACHE_ENABLED")
+    llm_prompt_cache_ttl_s: float = Field(3600.0, env="LLM_PROMPT_CACHE_TTL_S")
+    llm_prompt_cache_refresh_margin_s: float = Field(300.0, env="LLM_PROMPT_CACHE_REFRESH_MARGIN_S")
+    # Mínimo de tokens que el proveedor exige para cachear un contenido
+    llm_prompt_cache_min_tokens: int = Field(1024, env="LLM_PROMPT_CACHE_MIN_TOKENS")
+
+    # Reintentos: espera con jitter, presupuesto global y circuit breaker por proveedor
+    llm_retry_base_s: float = Field(1.0, env="LLM_RETRY_BASE_S")
+    llm_retry_max_wait_s: float = Field(60.0, env="LLM_RETRY_MAX_WAIT_S")
+    llm_retry_budget_ratio: float = Field(0.2, env="LLM_RETRY_BUDGET_RATIO")
+    llm_retry_budget_min_per_s: float = Field(1.0, env="LLM_RETRY_BUDGET_MIN_PER_S")
+    llm_retry_budget_capacity: float = Field(50.0, env="LLM_RETRY_BUDGET_CAPACITY")
+    llm_breaker_failure_rate: float = Field(0.5, env="LLM_BREAKER_FAILURE_RATE")
+    llm_breaker_min_calls: int = Field(10, env="LLM_BREAKER_MIN_CALLS")
+    llm_breaker_window_s: float = Field(30.0, env="LLM_BREAKER_WINDOW_S")
+    llm_breaker_open_s: float = Field(30.0, env="LLM_BREAKER_OPEN_S")
+    # Tiempo máximo que una llamada espera en cola con el breaker abierto (0 = fallar de inmediato)
+    llm_breaker_queue_s: float = Field(0.0, env="LLM_BREAKER_QUEUE_S")
+
+    # Enrutamiento entre proveedores: cobertura (hedging) y conmutación por error.
+    # Las rutas alternativas se expresan como "<proveedor>/<modelo>".
+    llm_fallback_routes: List[str] = Field(default_factory=list, env="LLM_FALLBACK_ROUTES")
+    llm_hedge_enabled: bool = Field(True, env="LLM_HEDGE_ENABLED")
+    llm_hedge_quantile: float = Field(0.95, env="LLM_HEDGE_QUANTILE")
+    llm_hedge_min_samples: int = Field(20, env="LLM_HEDGE_MIN_SAMPLES")
+    llm_failover_error_rate: float = Field(0.5, env="LLM_FAILOVER_ERROR_RATE")
+    llm_failover_min_calls: int = Field(5, env="LLM_FAILOVER_MIN_CALLS")
+    llm_failover_window_s: float = Field(60.0, env="LLM_FAILOVER_WINDOW_S")
+
+    # Modo de ejecución del pipeline: "interactive" (latencia), "bulk" (APIs batch)
+    # o "streaming" (cada ítem avanza por las etapas sin esperar al lote)
+    pipeline_execution_mode: Literal["interactive", "bulk", "streaming"] = Field("interactive", env="PIPELINE_EXECUTION_MODE")
+    # Ítems cuyo ciclo de QA puede correr a la vez en modo interactivo
+    qa_max_concurrency: int = Field(8, env="QA_MAX_CONCURRENCY")
+    # Encolar al arrancar los lotes que quedaron a medias (p. ej., tras un reinicio); solo con dispatch "queue"
+    pipeline_resume_on_startup: bool = Field(True, env="PIPELINE_RESUME_ON_STARTUP")
+    pipeline_config_path: str = Field("config/pipeline.yml", env="PIPELINE_CONFIG_PATH")
+    # Cómo se despachan los lotes: "queue" (cola en Postgres que procesan los
+    # workers de `python -m ddi.worker`) o "background" (tarea en el proceso de la API)
+    pipeline_dispatch: Literal["queue", "background"] = Field("queue", env="PIPELINE_DISPATCH")
+
+    # Workers de la cola de lotes
+    # Lotes que un proceso worker procesa a la vez
+    worker_concurrency: int = Field(2, env="WORKER_CONCURRENCY")
+    # Segundos sin renovar el arrendamiento tras los que otro worker puede tomar el trabajo
+    worker_visibility_timeout_s: float = Field(300.0, env="WORKER_VISIBILITY_TIMEOUT_S")
+    worker_poll_interval_s: float = Field(2.0, env="WORKER_POLL_INTERVAL_S")
+    worker_max_attempts: int = Field(3, env="WORKER_MAX_ATTEMPTS")
+    # Espera antes de reintentar un trabajo fallido, multiplicada por los intentos hechos
+    worker_retry_delay_s: float = Field(30.0, env="WORKER_RETRY_DELAY_S")
+    # Cada cuántos segundos el WebSocket de un lote consulta su progreso en la BD (modo "queue")
+    worker_progress_poll_s: float = Field(2.0, env="WORKER_PROGRESS_POLL_S")
+    llm_batch_base_url: Optional[str] = Field(None, env="LLM_BATCH_BASE_URL")
+    llm_batch_poll_interval_s: float = Field(30.0, env="LLM_BATCH_POLL_INTERVAL_S")
+    llm_batch_timeout_s: float = Field(24 * 3600, env="LLM_BATCH_TIMEOUT_S")
+
+    # Caché de respuestas LLM (memoria + disco)
+    llm_cache_enabled: bool = Field(True, env="LLM_CACHE_ENABLED")
+    llm_cache_path: str = Field(".cache/llm_responses.sqlite3", env="LLM_CACHE_PATH")
+    llm_cache_ttl_s: int = Field(7 * 24 * 3600, env="LLM_CACHE_TTL_S")
+    llm_cache_memory_entries: int = Field(512, env="LLM_CACHE_MEMORY_ENTRIES")
+    llm_cache_max_disk_mb: int = Field(256, env="LLM_CACHE_MAX_DISK_MB")
+
+    # Ítems por petición en las etapas empaquetables (1 = una petición por ítem)
+    llm_pack_size: int = Field(1, env="LLM_PACK_SIZE")
+    # Límite de salida del modelo para una petición empaquetada: su `max_tokens`
+    # es el de un ítem por el tamaño del grupo, y los grupos se acotan para no superarlo
+    llm_pack_max_tokens: int = Field(16384, env="LLM_PACK_MAX_TOKENS")
+
+    # Detección de casi-duplicados tras generar el borrador
+    dedup_similarity_threshold: float = Field(0.6, env="DEDUP_SIMILARITY_THRESHOLD")
+    # Ítems recientes de otros lotes contra los que se compara (0 = solo el lote)
+    dedup_history_items: int = Field(500, env="DEDUP_HISTORY_ITEMS")
+
+    # Caché de veredictos de validación en la BD (compartida entre lotes)
+    verdict_cache_enabled: bool = Field(True, env="VERDICT_CACHE_ENABLED")
+    verdict_cache_ttl_s: int = Field(30 * 24 * 3600, env="VERDICT_CACHE_TTL_S")
 
     # Claves de APIs
     GEMINI_API_KEY: Optional[str] = Field(None, env="GEMINI_API_KEY")
     OPENAI_API_KEY: Optional[str] = Field(None, env="OPENAI_API_KEY")
+    OPENAI_BASE_URL: Optional[str] = Field(None, env="OPENAI_BASE_URL")
+    OPENROUTER_API_KEY: Optional[str] = Field(None, env="OPENROUTER_API_KEY")
+    OPENROUTER_BASE_URL: str = Field("https://openrouter.ai/api/v1", env="OPENROUTER_BASE_URL")
+    OLLAMA_HOST: str = Field("http://localhost:11434", env="OLLAMA_HOST")
 
     BACKEND_CORS_ORIGINS: List[str] = ["*"]
 
@@ -0,0 +1,29 @@
+# ddi/core/metrics.py
+
+"""
+Contadores en memoria del proceso para observar el comportamiento del pipeline
+(aciertos de caché, llamadas ahorradas, etc.). No sustituyen a un sistema de
+métricas externo; solo exponen un snapshot consultable.
+"""
+
+import threading
+from collections import Counter
+from typing import Dict
+
+_counters: Counter = Counter()
+_lock = threading.Lock()
+
+def incr(name: str, value: int = 1) -> None:
+    """Incrementa el contador `name` en `value`."""
+    with _lock:
+        _counters[name] += value
+
+def get(name: str) -> int:
+    """Devuelve el valor actual del contador `name`."""
+    with _lock:
+        return _counters.get(name, 0)
+
+def snapshot(prefix: str = "") -> Dict[str, int]:
+    """Devuelve una copia de los contadores cuyo nombre empieza por `prefix`."""
+    with _lock:
+        return {k: v for k, v in _counters.items() if k.startswith(prefix)}
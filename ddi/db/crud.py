@@ -2,14 +2,21 @@
 
 import logging
 import uuid
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import and_, func, or_, text
 
 from . import models as db_models
 from ddi.schemas import models as pydantic_models
+from ddi.schemas.enums import ItemStatus, JobStatus
 
 logger = logging.getLogger(__name__)
 
+# Estados en los que un ítem ya no avanza por el pipeline.
+TERMINAL_STATUSES = (ItemStatus.FATAL.value, ItemStatus.PERSISTENCE_SUCCESS.value)
+
 def save_items(db: Session, items: List[pydantic_models.Item]) -> List[db_models.ItemModel]:
     """
     Guarda o actualiza una lista de ítems Pydantic en la base de datos.
@@ -31,7 +38,9 @@ def save_items(db: Session, items: List[pydantic_models.Item]) -> List[db_models
         payload_data = item_pydantic.payload.model_dump(mode="json") if item_pydantic.payload else None
         process_log_data = [log.model_dump(mode="json") for log in item_pydantic.process_log]
         refinement_log_data = [patch.model_dump(mode="json") for patch in item_pydantic.refinement_log]
+        llm_usage_data = [usage.model_dump(mode="json") for usage in item_pydantic.llm_usage]
         plan_de_item_data = item_pydantic.plan_de_item.model_dump(mode="json") if item_pydantic.plan_de_item else None
+        checkpoint_data = dict(item_pydantic.checkpoint)
 
 
         if db_item:
@@ -41,8 +50,10 @@ def save_items(db: Session, items: List[pydantic_models.Item]) -> List[db_models
             db_item.payload = payload_data
             db_item.process_log = process_log_data
             db_item.refinement_log = refinement_log_data
+            db_item.llm_usage = llm_usage_data
             db_item.generation_params = generation_params_data
             db_item.plan_de_item = plan_de_item_data
+            db_item.checkpoint = checkpoint_data
 
         else:
             # Crea un nuevo registro en la base de datos si el ítem no existe
@@ -56,6 +67,8 @@ def save_items(db: Session, items: List[pydantic_models.Item]) -> List[db_models
                 payload=payload_data,
                 process_log=process_log_data,
                 refinement_log=refinement_log_data,
+                llm_usage=llm_usage_data,
+                checkpoint=checkpoint_data,
             )
             db.add(db_item)
         db_items_to_return.append(db_item)
@@ -84,6 +97,240 @@ def get_items_by_batch_id(db: Session, batch_id: str) -> List[db_models.ItemMode
     """Obtiene todos los ítems asociados con un batch_id específico."""
     return db.query(db_models.ItemModel).filter(db_models.ItemModel.batch_id == batch_id).all()
 
+def load_items(db: Session, batch_id: str) -> List[pydantic_models.Item]:
+    """Reconstruye los ítems Pydantic de un lote desde la base de datos, para reanudarlo."""
+    items = []
+    for db_item in get_items_by_batch_id(db, batch_id):
+        items.append(pydantic_models.Item.model_validate({
+            "item_id": db_item.id,
+            "temp_id": db_item.temp_id,
+            "batch_id": db_item.batch_id,
+            "status": db_item.status,
+            "token_usage": db_item.token_usage,
+            "generation_params": db_item.generation_params,
+            "plan_de_item": db_item.plan_de_item,
+            "payload": db_item.payload,
+            "process_log": db_item.process_log or [],
+            "refinement_log": db_item.refinement_log or [],
+            "llm_usage": db_item.llm_usage or [],
+            "checkpoint": db_item.checkpoint or {},
+        }))
+    return items
+
+def get_interrupted_batch_ids(db: Session) -> List[str]:
+    """Lotes con algún ítem que no llegó a un estado final (persistido o fallido)."""
+    rows = (
+        db.query(db_models.ItemModel.batch_id)
+        .filter(db_models.ItemModel.status.notin_(TERMINAL_STATUSES))
+        .distinct()
+        .all()
+    )
+    return [row.batch_id for row in rows]
+
 def get_items(db: Session, skip: int = 0, limit: int = 100) -> List[db_models.ItemModel]:
     """Obtiene una lista de ítems de la base de datos con paginación."""
     return db.query(db_models.ItemModel).offset(skip).limit(limit).all()
+
+def get_recent_item_bodies(db: Session, exclude_batch_id: str, limit: int) -> List[tuple]:
+    """
+    Devuelve (id, cuerpo_item) de los ítems más recientes con payload y no
+    fallidos, excluyendo los del lote indicado.
+    """
+    return (
+        db.query(db_models.ItemModel.id, db_models.ItemModel.payload["cuerpo_item"])
+        .filter(
+            db_models.ItemModel.payload.isnot(None),
+            db_models.ItemModel.status != "fatal",
+            db_models.ItemModel.batch_id != exclude_batch_id,
+        )
+        .order_by(db_models.ItemModel.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+# --- Caché de veredictos de validación ---
+
+def get_verdicts(db: Session, keys: List[str], max_age_s: int) -> Dict[str, Any]:
+    """Devuelve {clave: veredicto} de las claves con un veredicto más reciente que `max_age_s`."""
+    if not keys:
+        return {}
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=max_age_s)
+    rows = (
+        db.query(db_models.VerdictCacheModel)
+        .filter(db_models.VerdictCacheModel.cache_key.in_(keys), db_models.VerdictCacheModel.created_at >= cutoff)
+        .all()
+    )
+    return {row.cache_key: row.verdict for row in rows}
+
+def save_verdict(db: Session, cache_key: str, stage_name: str, prompt_version: str, verdict: Any) -> None:
+    """Guarda (o renueva) el veredicto de una clave."""
+    stmt = pg_insert(db_models.VerdictCacheModel).values(
+        cache_key=cache_key,
+        stage_name=stage_name,
+        prompt_version=prompt_version,
+        verdict=verdict,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[db_models.VerdictCacheModel.cache_key],
+        set_={"verdict": stmt.excluded.verdict, "created_at": func.now()},
+    )
+    try:
+        db.execute(stmt)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+# --- Cola de lotes (pipeline_jobs) ---
+
+ACTIVE_JOB_STATUSES = (JobStatus.QUEUED.value, JobStatus.RUNNING.value)
+
+def enqueue_job(db: Session, batch_id: str, max_attempts: int) -> bool:
+    """
+    Encola el procesamiento de un lote. Devuelve False si el lote ya tenía un
+    trabajo en cola o en curso (el índice único parcial lo impide).
+    """
+    Job = db_models.PipelineJobModel
+    stmt = pg_insert(Job).values(
+        batch_id=batch_id,
+        status=JobStatus.QUEUED.value,
+        max_attempts=max_attempts,
+    ).on_conflict_do_nothing(
+        index_elements=[Job.batch_id],
+        # Debe coincidir con el predicado de `ux_pipeline_jobs_active_batch`.
+        index_where=text("status IN ('queued', 'running')"),
+    ).returning(Job.id)
+    try:
+        job_id = db.execute(stmt).scalar()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return job_id is not None
+
+def lease_job(db: Session, worker_id: str, visibility_timeout_s: float) -> Optional[db_models.PipelineJobModel]:
+    """
+    Arrienda el trabajo disponible más antiguo: uno en cola cuyo `available_at`
+    ya pasó, o uno en curso cuyo arrendamiento venció (su worker murió). Las
+    filas bloqueadas por otros workers se saltan (SKIP LOCKED), de modo que
+    varios workers pueden arrendar a la vez sin esperarse.
+
+    Un trabajo vencido que ya agotó sus intentos se da por fallido, junto con
+    los ítems pendientes de su lote, y se pasa al siguiente.
+    """
+    Job = db_models.PipelineJobModel
+    try:
+        while True:
+            job = (
+                db.query(Job)
+                .filter(or_(
+                    and_(Job.status == JobStatus.QUEUED.value, Job.available_at <= func.now()),
+                    and_(Job.status == JobStatus.RUNNING.value, Job.lease_expires_at < func.now()),
+                ))
+                .order_by(Job.available_at)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if job is None:
+                db.commit()
+                return None
+            if job.attempts >= job.max_attempts:
+                _fail_job_and_items(db, job, f"El arrendamiento venció tras {job.attempts} intentos.")
+                db.commit()
+                continue
+            job.status = JobStatus.RUNNING.value
+            job.attempts += 1
+            job.leased_by = worker_id
+            job.lease_expires_at = func.now() + timedelta(seconds=visibility_timeout_s)
+            db.commit()
+            db.refresh(job)
+            return job
+    except Exception:
+        db.rollback()
+        raise
+
+def renew_lease(db: Session, job_id: uuid.UUID, worker_id: str, visibility_timeout_s: float) -> bool:
+    """Extiende el arrendamiento de un trabajo. False si el worker ya no lo tiene."""
+    return _update_leased_job(db, job_id, worker_id, {
+        "lease_expires_at": func.now() + timedelta(seconds=visibility_timeout_s),
+    })
+
+def complete_job(db: Session, job_id: uuid.UUID, worker_id: str) -> bool:
+    """Marca como terminado un trabajo arrendado por `worker_id`."""
+    return _update_leased_job(db, job_id, worker_id, {
+        "status": JobStatus.DONE.value,
+        "leased_by": None,
+        "lease_expires_at": None,
+    })
+
+def release_job(db: Session, job_id: uuid.UUID, worker_id: str) -> bool:
+    """
+    Devuelve un trabajo a la cola sin contarlo como intento (el worker se
+    detiene de forma ordenada); otro worker lo reanudará desde el checkpoint.
+    """
+    Job = db_models.PipelineJobModel
+    return _update_leased_job(db, job_id, worker_id, {
+        "status": JobStatus.QUEUED.value,
+        "attempts": Job.attempts - 1,
+        "available_at": func.now(),
+        "leased_by": None,
+        "lease_expires_at": None,
+    })
+
+def fail_job(db: Session, job_id: uuid.UUID, worker_id: str, error: str, retry_delay_s: float) -> bool:
+    """
+    Registra el fallo de un intento. Si quedan intentos, el trabajo vuelve a
+    la cola tras `retry_delay_s` por intento hecho; si no, se da por fallido
+    junto con los ítems pendientes de su lote.
+    """
+    Job = db_models.PipelineJobModel
+    try:
+        job = (
+            db.query(Job)
+            .filter(Job.id == job_id, Job.leased_by == worker_id, Job.status == JobStatus.RUNNING.value)
+            .with_for_update()
+            .first()
+        )
+        if job is None:
+            db.commit()
+            return False
+        if job.attempts >= job.max_attempts:
+            _fail_job_and_items(db, job, error)
+        else:
+            job.status = JobStatus.QUEUED.value
+            job.last_error = error
+            job.available_at = func.now() + timedelta(seconds=retry_delay_s * job.attempts)
+            job.leased_by = None
+            job.lease_expires_at = None
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        raise
+
+def _update_leased_job(db: Session, job_id: uuid.UUID, worker_id: str, values: Dict[str, Any]) -> bool:
+    Job = db_models.PipelineJobModel
+    try:
+        updated = (
+            db.query(Job)
+            .filter(Job.id == job_id, Job.leased_by == worker_id, Job.status == JobStatus.RUNNING.value)
+            .update(values, synchronize_session=False)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return updated == 1
+
+def _fail_job_and_items(db: Session, job: db_models.PipelineJobModel, error: str) -> None:
+    """Marca el trabajo como fallido y los ítems sin estado final de su lote como FATAL."""
+    job.status = JobStatus.FAILED.value
+    job.last_error = error
+    job.leased_by = None
+    job.lease_expires_at = None
+    (
+        db.query(db_models.ItemModel)
+        .filter(db_models.ItemModel.batch_id == job.batch_id, db_models.ItemModel.status.notin_(TERMINAL_STATUSES))
+        .update({"status": ItemStatus.FATAL.value}, synchronize_session=False)
+    )
+    logger.error(f"El trabajo del lote {job.batch_id} falló definitivamente: {error}")
@@ -1,6 +1,6 @@
 # ddi/db/models.py
 
-from sqlalchemy import Column, String, Integer, TIMESTAMP, text
+from sqlalchemy import Column, Index, String, Integer, Text, TIMESTAMP, text
 from sqlalchemy.dialects.postgresql import UUID as PGUUID, JSONB
 from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
@@ -23,10 +23,57 @@ class ItemModel(Base):
 
     # Columnas de Datos JSONB que almacenan los schemas Pydantic como JSON
     generation_params = Column(JSONB, nullable=False)
+    plan_de_item = Column(JSONB, nullable=True)
     payload = Column(JSONB, nullable=True)
     process_log = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
     refinement_log = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
+    llm_usage = Column(JSONB, nullable=False, server_default=text("'[]'::jsonb"))
+    # Progreso del ítem en el pipeline (etapas completadas, iteraciones de QA) para reanudarlo
+    checkpoint = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
 
     # Metadatos de la fila, manejados automáticamente por la base de datos
     created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+class VerdictCacheModel(Base):
+    """
+    Veredictos de las etapas de validación, indexados por el hash de su
+    entrada serializada y de la versión del prompt. Se comparten entre lotes.
+    """
+    __tablename__ = "verdict_cache"
+
+    cache_key = Column(String(64), primary_key=True)
+    stage_name = Column(String, nullable=False, index=True)
+    prompt_version = Column(String, nullable=False)
+    verdict = Column(JSONB, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+
+class PipelineJobModel(Base):
+    """
+    Cola durable de lotes por procesar. Los workers arriendan un trabajo con
+    `SELECT ... FOR UPDATE SKIP LOCKED` y lo mantienen renovando
+    `lease_expires_at`; si un worker muere, el trabajo vuelve a estar
+    disponible al vencer el arrendamiento.
+    """
+    __tablename__ = "pipeline_jobs"
+
+    id = Column(PGUUID(as_uuid=True), primary_key=True, server_default=text("gen_random_uuid()"))
+    batch_id = Column(String, nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    leased_by = Column(String, nullable=True)
+    lease_expires_at = Column(TIMESTAMP(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        # Como mucho un trabajo activo por lote: encolarlo dos veces no lo duplica.
+        Index(
+            "ux_pipeline_jobs_active_batch", "batch_id", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+        Index("ix_pipeline_jobs_status_available_at", "status", "available_at"),
+    )
@@ -0,0 +1,307 @@
+# ddi/llm/batch.py
+
+"""
+Ejecución de peticiones LLM en modo masivo (bulk) mediante las APIs batch de
+los proveedores.
+
+Las peticiones de una etapa se agrupan en un trabajo, se envían al endpoint
+batch del proveedor y se sondea su estado hasta que termina. El resultado es
+un `LLMResponse` por `custom_id`, que la etapa procesa igual que en el modo
+interactivo. Se sacrifica latencia a cambio de precio batch y límites de
+tasa mucho más altos.
+"""
+
+from __future__ import annotations
+import asyncio
+import io
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Type
+
+from openai import AsyncOpenAI
+from google.genai import types
+
+from ddi.core.config import settings, Settings
+from ddi.llm.providers import LLMResponse, OpenAIClient, generate_response, get_client, make_usage
+
+log = logging.getLogger("app.llm.batch")
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    messages: List[Dict[str, Any]]
+    model: str
+    temperature: float
+    max_tokens: int
+    extra: Dict[str, Any] = field(default_factory=dict)
+    # Tipo Pydantic al que se restringe la salida, si el proveedor lo admite.
+    response_schema: Any = None
+
+class BatchJobFailedError(RuntimeError):
+    """El trabajo batch terminó en un estado no exitoso o excedió el tiempo de espera."""
+    pass
+
+_BATCH_BACKEND_REGISTRY: Dict[str, Type['BaseBatchBackend']] = {}
+
+def register_batch_backend(name: str):
+    def decorator(cls: Type['BaseBatchBackend']):
+        _BATCH_BACKEND_REGISTRY[name.lower()] = cls
+        return cls
+    return decorator
+
+def get_batch_backend(name: str) -> 'BaseBatchBackend':
+    """
+    Devuelve el backend batch para un proveedor. Los proveedores sin API batch
+    usan el backend 'local', que ejecuta las peticiones de forma concurrente.
+    """
+    client_cls = _BATCH_BACKEND_REGISTRY.get(name.lower(), _BATCH_BACKEND_REGISTRY["local"])
+    return client_cls(settings, provider=name.lower())
+
+class BaseBatchBackend(ABC):
+    def __init__(self, settings: Settings, provider: str):
+        self.settings = settings
+        self.provider = provider
+        self.logger = logging.getLogger(f"app.llm.batch.{self.__class__.__name__}")
+
+    @abstractmethod
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        """Envía el trabajo y devuelve su identificador."""
+        pass
+
+    @abstractmethod
+    async def is_done(self, job_id: str) -> bool:
+        """Devuelve True si el trabajo terminó con éxito; lanza BatchJobFailedError si falló."""
+        pass
+
+    @abstractmethod
+    async def fetch_results(self, job_id: str, requests: List[BatchRequest]) -> Dict[str, LLMResponse]:
+        """Descarga los resultados indexados por `custom_id`."""
+        pass
+
+    async def wait(self, job_id: str) -> None:
+        """Espera a que el trabajo termine, sondeando `is_done` cada `llm_batch_poll_interval_s`."""
+        deadline = time.monotonic() + self.settings.llm_batch_timeout_s
+        while not await self.is_done(job_id):
+            if time.monotonic() > deadline:
+                raise BatchJobFailedError(f"El trabajo batch {job_id} excedió el tiempo de espera.")
+            await asyncio.sleep(self.settings.llm_batch_poll_interval_s)
+
+    async def run(self, requests: List[BatchRequest]) -> Dict[str, LLMResponse]:
+        """Envía, espera hasta que termine y devuelve los resultados."""
+        if not requests:
+            return {}
+        job_id = await self.submit(requests)
+        self.logger.info(f"Trabajo batch {job_id} enviado con {len(requests)} peticiones.")
+        await self.wait(job_id)
+        self.logger.info(f"Trabajo batch {job_id} completado.")
+        return await self.fetch_results(job_id, requests)
+
+    async def aclose(self) -> None:
+        """Libera los recursos propios del backend. Por defecto no hace nada."""
+        return None
+
+@register_batch_backend("local")
+class LocalBatchBackend(BaseBatchBackend):
+    """
+    Sustituto local de una API batch: ejecuta las peticiones de forma
+    concurrente a través del cliente interactivo (y su limitador).
+    """
+    def __init__(self, settings: Settings, provider: str):
+        super().__init__(settings, provider)
+        self._jobs: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        async def _run_all() -> List[LLMResponse]:
+            return await asyncio.gather(*[
+                generate_response(
+                    messages=r.messages,
+                    provider=self.provider,
+                    model=r.model,
+                    temperature=r.temperature,
+                    max_tokens=r.max_tokens,
+                    response_schema=r.response_schema,
+                    **r.extra,
+                )
+                for r in requests
+            ])
+        job_id = f"local-{id(requests)}-{time.monotonic_ns()}"
+        self._jobs[job_id] = asyncio.create_task(_run_all())
+        return job_id
+
+    async def is_done(self, job_id: str) -> bool:
+        return self._jobs[job_id].done()
+
+    async def wait(self, job_id: str) -> None:
+        # Los resultados se producen en este proceso: se espera la tarea, sin sondear.
+        task = self._jobs[job_id]
+        done, _ = await asyncio.wait([task], timeout=self.settings.llm_batch_timeout_s)
+        if not done:
+            task.cancel()
+            self._jobs.pop(job_id, None)
+            raise BatchJobFailedError(f"El trabajo batch {job_id} excedió el tiempo de espera.")
+
+    async def fetch_results(self, job_id: str, requests: List[BatchRequest]) -> Dict[str, LLMResponse]:
+        responses = await self._jobs.pop(job_id)
+        return {r.custom_id: resp for r, resp in zip(requests, responses)}
+
+@register_batch_backend("openai")
+class OpenAIBatchBackend(BaseBatchBackend):
+    """
+    Backend para la Batch API de OpenAI (JSONL sobre /v1/chat/completions).
+    `llm_batch_base_url` permite apuntarlo a un servidor compatible local.
+    """
+    _TERMINAL_FAILURES = {"failed", "expired", "cancelled", "cancelling"}
+
+    def __init__(self, settings: Settings, provider: str):
+        super().__init__(settings, provider)
+        # Con un servidor batch propio se crea un cliente que se cierra al
+        # terminar el trabajo; si no, se reutiliza el cliente OpenAI del pool.
+        self._owns_client = bool(settings.llm_batch_base_url)
+        if self._owns_client:
+            self._client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY or "not-needed",
+                base_url=settings.llm_batch_base_url,
+            )
+        else:
+            self._client = get_client("openai", settings.llm_model)._client
+
+    async def aclose(self) -> None:
+        if self._owns_client:
+            await self._client.close()
+
+    @staticmethod
+    def build_jsonl(requests: List[BatchRequest]) -> bytes:
+        lines = []
+        for r in requests:
+            lines.append(json.dumps({
+                "custom_id": r.custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": r.model,
+                    "messages": r.messages,
+                    "temperature": r.temperature,
+                    "max_tokens": r.max_tokens,
+                    **(OpenAIClient.structured_format(r.response_schema) or {}),
+                    **r.extra,
+                },
+            }, ensure_ascii=False))
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        input_file = await self._client.files.create(
+            file=("batch.jsonl", io.BytesIO(self.build_jsonl(requests))),
+            purpose="batch",
+        )
+        batch = await self._client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        return batch.id
+
+    async def is_done(self, job_id: str) -> bool:
+        batch = await self._client.batches.retrieve(job_id)
+        if batch.status in self._TERMINAL_FAILURES:
+            raise BatchJobFailedError(f"El trabajo batch {job_id} terminó con estado '{batch.status}'.")
+        return batch.status == "completed"
+
+    async def fetch_results(self, job_id: str, requests: List[BatchRequest]) -> Dict[str, LLMResponse]:
+        batch = await self._client.batches.retrieve(job_id)
+        results: Dict[str, LLMResponse] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await self._client.files.content(file_id)
+            for line in content.text.splitlines():
+                if line.strip():
+                    record = json.loads(line)
+                    results[record["custom_id"]] = self._parse_record(record)
+        return results
+
+    @staticmethod
+    def _parse_record(record: Dict[str, Any]) -> LLMResponse:
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code", 200) >= 400:
+            error = record.get("error") or body.get("error") or {}
+            return LLMResponse(
+                text="", model=body.get("model", "unknown"), usage={}, success=False,
+                error_message=f"Error en la petición batch: {error}",
+            )
+        choices = body.get("choices") or [{}]
+        text = (choices[0].get("message") or {}).get("content") or ""
+        usage = body.get("usage") or {}
+        return LLMResponse(
+            text=text,
+            model=body.get("model", "unknown"),
+            usage=make_usage(
+                prompt=usage.get("prompt_tokens", 0),
+                completion=usage.get("completion_tokens", 0),
+                cached=(usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0),
+                total=usage.get("total_tokens"),
+            ),
+            extra={"truncated": choices[0].get("finish_reason") == "length"},
+        )
+
+@register_batch_backend("gemini")
+class GeminiBatchBackend(BaseBatchBackend):
+    """
+    Backend para la API batch de Gemini. Usa peticiones en línea (el SDK
+    conserva el orden de las respuestas) y reutiliza el cliente del pool.
+    """
+    _TERMINAL_FAILURES = {
+        types.JobState.JOB_STATE_FAILED,
+        types.JobState.JOB_STATE_CANCELLED,
+        types.JobState.JOB_STATE_EXPIRED,
+    }
+
+    async def submit(self, requests: List[BatchRequest]) -> str:
+        # Un trabajo batch de Gemini es de un único modelo.
+        model = requests[0].model
+        client = get_client("gemini", model)
+        inlined = []
+        for r in requests:
+            inlined.append(types.InlinedRequest(
+                contents=client._build_gemini_history(r.messages),
+                config=client._build_generation_config(
+                    r.messages, temperature=r.temperature, max_tokens=r.max_tokens, response_schema=r.response_schema,
+                ),
+            ))
+        job = await client._client.aio.batches.create(model=model, src=inlined)
+        return job.name
+
+    async def _get_job(self, job_id: str) -> types.BatchJob:
+        return await get_client("gemini", self.settings.llm_model)._client.aio.batches.get(name=job_id)
+
+    async def is_done(self, job_id: str) -> bool:
+        job = await self._get_job(job_id)
+        if job.state in self._TERMINAL_FAILURES:
+            raise BatchJobFailedError(f"El trabajo batch {job_id} terminó con estado '{job.state.name}'.")
+        return job.state in (types.JobState.JOB_STATE_SUCCEEDED, types.JobState.JOB_STATE_PARTIALLY_SUCCEEDED)
+
+    async def fetch_results(self, job_id: str, requests: List[BatchRequest]) -> Dict[str, LLMResponse]:
+        job = await self._get_job(job_id)
+        client = get_client("gemini", requests[0].model)
+        inlined_responses = (job.dest.inlined_responses if job.dest else None) or []
+        results: Dict[str, LLMResponse] = {}
+        for r, inlined in zip(requests, inlined_responses):
+            if inlined.error or inlined.response is None:
+                results[r.custom_id] = LLMResponse(
+                    text="", model=r.model, usage={}, success=False,
+                    error_message=f"Error en la petición batch: {inlined.error}",
+                )
+            else:
+                results[r.custom_id] = client._parse_gemini_response(inlined.response, r.model)
+        return results
+
+async def run_batch(requests: List[BatchRequest], provider: Optional[str] = None) -> Dict[str, LLMResponse]:
+    """Ejecuta un lote de peticiones por el backend batch del proveedor."""
+    backend = get_batch_backend(provider or settings.llm_provider)
+    try:
+        return await backend.run(requests)
+    finally:
+        await backend.aclose()
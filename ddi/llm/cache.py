@@ -0,0 +1,225 @@
+# ddi/llm/cache.py
+
+"""
+Caché de respuestas LLM direccionada por contenido.
+
+La clave es un hash de (proveedor, modelo, temperatura, versión de prompt,
+max_tokens, esquema de salida estructurada, mensajes renderizados). Tiene dos niveles: un LRU acotado en memoria y un
+almacén SQLite local que sobrevive a reinicios, ambos con TTL.
+"""
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ddi.core import metrics
+from ddi.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    model TEXT,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access);
+"""
+
+# Cada cuántas escrituras se ejecuta la evicción en disco.
+_EVICTION_INTERVAL = 50
+
+def make_cache_key(
+    provider: str,
+    model: str,
+    temperature: float,
+    prompt_version: str,
+    messages: List[Dict[str, Any]],
+    max_tokens: Optional[int] = None,
+    response_schema: Optional[str] = None,
+) -> str:
+    """
+    Calcula la clave estable de una llamada LLM. `response_schema` es el nombre
+    del esquema pedido como salida estructurada (None en modo texto).
+    """
+    material = json.dumps(
+        {
+            "provider": provider.lower(),
+            "model": model,
+            "temperature": temperature,
+            "prompt_version": prompt_version,
+            "max_tokens": max_tokens,
+            "response_schema": response_schema,
+            "messages": messages,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+class LLMResponseCache:
+    """Caché de dos niveles (memoria LRU + SQLite) para respuestas de texto del LLM."""
+
+    def __init__(
+        self,
+        path: Optional[str],
+        ttl_seconds: int,
+        max_memory_entries: int,
+        max_disk_bytes: int,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if path:
+            try:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.executescript(_SCHEMA)
+            except sqlite3.Error as e:
+                logger.warning(f"No se pudo abrir la caché LLM en disco '{path}'; solo se usará memoria. Error: {e}")
+                self._conn = None
+
+    # --- Nivel en memoria ---
+
+    def _memory_get(self, key: str) -> Optional[str]:
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        text, created_at = entry
+        if time.time() - created_at > self.ttl_seconds:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return text
+
+    def _memory_set(self, key: str, text: str, created_at: float) -> None:
+        self._memory[key] = (text, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    # --- Nivel en disco ---
+
+    def _disk_get(self, key: str) -> Optional[Tuple[str, float]]:
+        if self._conn is None:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return row[0], row[1]
+
+    def _disk_set(self, key: str, text: str, model: Optional[str], created_at: float) -> None:
+        if self._conn is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, model, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, text, model, len(text.encode("utf-8")), created_at, created_at),
+            )
+            self._conn.commit()
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= _EVICTION_INTERVAL:
+                self._writes_since_eviction = 0
+                self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        """Elimina entradas expiradas y, si se excede el tamaño, las menos usadas."""
+        self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        if total > self.max_disk_bytes:
+            excess = total - self.max_disk_bytes
+            freed = 0
+            victims = []
+            for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC"):
+                victims.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            self._conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+            metrics.incr("llm_cache.evicted", len(victims))
+        self._conn.commit()
+
+    # --- API pública ---
+
+    async def get(self, key: str) -> Optional[str]:
+        text = self._memory_get(key)
+        if text is not None:
+            metrics.incr("llm_cache.hit_memory")
+            return text
+        try:
+            row = await asyncio.to_thread(self._disk_get, key)
+        except sqlite3.Error as e:
+            logger.warning(f"Error leyendo la caché LLM en disco: {e}")
+            row = None
+        if row is not None:
+            text, created_at = row
+            self._memory_set(key, text, created_at)
+            metrics.incr("llm_cache.hit_disk")
+            return text
+        metrics.incr("llm_cache.miss")
+        return None
+
+    async def set(self, key: str, text: str, model: Optional[str] = None) -> None:
+        created_at = time.time()
+        self._memory_set(key, text, created_at)
+        try:
+            await asyncio.to_thread(self._disk_set, key, text, model, created_at)
+        except sqlite3.Error as e:
+            logger.warning(f"Error escribiendo la caché LLM en disco: {e}")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+                self._conn = None
+
+@lru_cache()
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """Devuelve la caché compartida del proceso, o None si está deshabilitada."""
+    if not settings.llm_cache_enabled:
+        return None
+    return LLMResponseCache(
+        path=settings.llm_cache_path or None,
+        ttl_seconds=settings.llm_cache_ttl_s,
+        max_memory_entries=settings.llm_cache_memory_entries,
+        max_disk_bytes=settings.llm_cache_max_disk_mb * 1024 * 1024,
+    )
+
+def close_response_cache() -> None:
+    """Cierra la conexión SQLite de la caché compartida, si llegó a crearse. Se invoca al apagar."""
+    if get_response_cache.cache_info().currsize == 0:
+        return
+    cache = get_response_cache()
+    if cache is not None:
+        cache.close()
+    get_response_cache.cache_clear()
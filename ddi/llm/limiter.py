@@ -0,0 +1,206 @@
+# ddi/llm/limiter.py
+
+"""
+Limitador adaptativo de concurrencia por (proveedor, modelo).
+
+Cada limitador combina:
+- Presupuestos de peticiones por minuto (RPM) y tokens por minuto (TPM),
+  implementados como cubetas de tokens que se rellenan de forma continua.
+- Una ventana de concurrencia AIMD: crece de forma aditiva con cada respuesta
+  sana y se reduce de forma multiplicativa ante un 429, ante otros fallos
+  transitorios (5xx, timeouts, conexiones cortadas) o ante latencias muy por
+  encima de la media observada.
+
+El objetivo es mantener el goodput cerca del techo del proveedor sin alternar
+entre periodos ociosos y tormentas de reintentos.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from ddi.core import metrics
+from ddi.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Factor de reducción multiplicativa ante un 429.
+_THROTTLE_BACKOFF = 0.5
+# Factor de reducción ante un fallo transitorio que no es un 429 (5xx, timeout...).
+_FAILURE_BACKOFF = 0.75
+# Factor de reducción ante latencia anómala (más suave que ante un 429).
+_LATENCY_BACKOFF = 0.9
+# Una latencia mayor que este múltiplo de la media se considera congestión.
+_LATENCY_CONGESTION_RATIO = 2.0
+# Peso de cada nueva observación en la media móvil de latencia.
+_LATENCY_EWMA_ALPHA = 0.1
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """Detecta un 429 independientemente del SDK que lo haya lanzado."""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        if value == 429 or getattr(value, "value", None) == 429:
+            return True
+    return False
+
+class _RateBudget:
+    """Cubeta de tokens con capacidad de un minuto de presupuesto."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: float) -> None:
+        if self.unlimited:
+            return
+        amount = min(amount, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, delta: float) -> None:
+        """Corrige el consumo estimado con el real (delta positivo = se consumió más)."""
+        if self.unlimited:
+            return
+        self._refill()
+        self.tokens = max(-self.capacity, min(self.capacity, self.tokens - delta))
+
+class AdaptiveLimiter:
+    """Limitador de un único par (proveedor, modelo)."""
+
+    def __init__(
+        self,
+        name: str,
+        rpm: float,
+        tpm: float,
+        initial_concurrency: int,
+        min_concurrency: int,
+        max_concurrency: int,
+    ):
+        self.name = name
+        self.min_concurrency = max(1, min_concurrency)
+        self.max_concurrency = max(self.min_concurrency, max_concurrency)
+        self.limit = float(min(max(initial_concurrency, self.min_concurrency), self.max_concurrency))
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None
+        self._requests = _RateBudget(rpm)
+        self._tokens = _RateBudget(tpm)
+        self._cond = asyncio.Condition()
+        self._last_decrease = 0.0
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """Espera un hueco de concurrencia y presupuesto RPM/TPM."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            await self._requests.take(1)
+            await self._tokens.take(estimated_tokens)
+        except BaseException:
+            await self._release_slot()
+            raise
+
+    async def release(
+        self,
+        latency_s: float,
+        throttled: bool = False,
+        failed: bool = False,
+        estimated_tokens: int = 0,
+        actual_tokens: Optional[int] = None,
+    ) -> None:
+        """
+        Libera el hueco y ajusta la ventana según el resultado observado. Una
+        llamada `failed` (fallo transitorio) reduce la ventana y no alimenta la
+        media de latencia: su duración no es la de una respuesta sana.
+        """
+        if actual_tokens:
+            self._tokens.adjust(actual_tokens - estimated_tokens)
+
+        if throttled:
+            self._decrease(_THROTTLE_BACKOFF, latency_s)
+            metrics.incr(f"llm_limiter.throttled.{self.name}")
+        elif failed:
+            self._decrease(_FAILURE_BACKOFF, latency_s)
+            metrics.incr(f"llm_limiter.failed.{self.name}")
+        else:
+            if self.latency_ewma is None:
+                self.latency_ewma = latency_s
+            congested = latency_s > _LATENCY_CONGESTION_RATIO * self.latency_ewma
+            self.latency_ewma += _LATENCY_EWMA_ALPHA * (latency_s - self.latency_ewma)
+            if congested:
+                self._decrease(_LATENCY_BACKOFF, latency_s)
+            else:
+                # Incremento aditivo: ~+1 de ventana por cada "ronda" completa.
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+
+        await self._release_slot()
+
+    async def abandon(self) -> None:
+        """Libera el hueco de una llamada cancelada sin usarla como señal de congestión."""
+        await self._release_slot()
+
+    def _decrease(self, factor: float, latency_s: float) -> None:
+        # Varias respuestas de la misma ráfaga cuentan como una sola señal.
+        now = time.monotonic()
+        if now - self._last_decrease < max(latency_s, 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_concurrency, self.limit * factor)
+        logger.info(f"Limitador {self.name}: ventana de concurrencia reducida a {self.limit:.1f}.")
+
+    async def _release_slot(self) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "latency_ewma_s": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "rpm_available": None if self._requests.unlimited else round(self._requests.tokens, 1),
+            "tpm_available": None if self._tokens.unlimited else round(self._tokens.tokens, 1),
+        }
+
+_LIMITERS: Dict[Tuple[str, str], AdaptiveLimiter] = {}
+
+def get_limiter(provider: str, model: str) -> AdaptiveLimiter:
+    """
+    Devuelve el limitador compartido para (proveedor, modelo). Los límites se
+    toman de `settings.llm_rate_limits["<proveedor>/<modelo>"]` o, en su
+    defecto, de `settings.llm_rate_limits["<proveedor>"]` y los valores globales.
+    """
+    key = (provider.lower(), model)
+    limiter = _LIMITERS.get(key)
+    if limiter is None:
+        overrides = settings.llm_rate_limits.get(f"{key[0]}/{model}") or settings.llm_rate_limits.get(key[0]) or {}
+        limiter = AdaptiveLimiter(
+            name=f"{key[0]}/{model}",
+            rpm=overrides.get("rpm", settings.llm_rpm_limit),
+            tpm=overrides.get("tpm", settings.llm_tpm_limit),
+            initial_concurrency=int(overrides.get("initial_concurrency", settings.llm_initial_concurrency)),
+            min_concurrency=int(overrides.get("min_concurrency", settings.llm_min_concurrency)),
+            max_concurrency=int(overrides.get("max_concurrency", settings.llm_max_concurrency)),
+        )
+        _LIMITERS[key] = limiter
+    return limiter
+
+def limiter_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Estado actual de todos los limitadores, para diagnóstico."""
+    return {limiter.name: limiter.snapshot() for limiter in _LIMITERS.values()}
@@ -0,0 +1,137 @@
+# ddi/llm/prompt_cache.py
+
+"""
+Caché de prefijos de prompt en el proveedor.
+
+Los mensajes de sistema de cada versión de prompts son grandes y se reenvían
+idénticos en cada ítem y en cada iteración de QA. Con Gemini se registran una
+vez mediante la API de context caching (`client.caches`) y las llamadas
+posteriores solo referencian el handle, de modo que esos tokens se facturan
+como tokens en caché y el tiempo hasta el primer token baja.
+
+OpenAI aplica caché de prefijo automáticamente y Ollama conserva el KV-cache
+del modelo cargado; en ambos basta con que el mensaje de sistema (estático)
+vaya primero y el contenido dinámico al final, que es el orden que produce
+`build_prompt_messages`.
+"""
+
+from __future__ import annotations
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from google import genai
+from google.genai import types
+from google.genai import errors as genai_errors
+
+from ddi.core import metrics
+from ddi.core.config import settings
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Errores permanentes de `caches.create` (prefijo demasiado pequeño, modelo sin
+# soporte de caché): el prefijo se recuerda como no cacheable.
+_UNCACHEABLE_CODES = {400, 404}
+
+@dataclass
+class _CacheHandle:
+    name: str
+    expires_at: float
+
+class GeminiPromptCache:
+    """
+    Gestiona los handles de caché de un cliente Gemini: los crea al primer uso,
+    los renueva antes de que expiren y recuerda qué prefijos no son cacheables
+    (demasiado pequeños o rechazados por el modelo) para no reintentarlo.
+    """
+
+    def __init__(self, client: genai.Client):
+        self._client = client
+        self._handles: Dict[str, _CacheHandle] = {}
+        self._uncacheable: set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def _key(model: str, system_instruction: str) -> str:
+        return hashlib.sha256(f"{model}\x00{system_instruction}".encode("utf-8")).hexdigest()
+
+    async def handle_for(self, model: str, system_instruction: Optional[str]) -> Optional[str]:
+        """Devuelve el nombre del contenido en caché para este prefijo, o None si no aplica."""
+        if not settings.llm_prompt_cache_enabled or not system_instruction:
+            return None
+        key = self._key(model, system_instruction)
+        if key in self._uncacheable:
+            return None
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            handle = self._handles.get(key)
+            now = time.time()
+            if handle and handle.expires_at - now > settings.llm_prompt_cache_refresh_margin_s:
+                metrics.incr("llm_prompt_cache.hit")
+                return handle.name
+            if handle:
+                return await self._refresh(key, handle)
+            return await self._create(key, model, system_instruction)
+
+    async def _create(self, key: str, model: str, system_instruction: str) -> Optional[str]:
+        if estimate_tokens(system_instruction) < settings.llm_prompt_cache_min_tokens:
+            # Por debajo del mínimo del proveedor se envía el prompt completo.
+            self._uncacheable.add(key)
+            metrics.incr("llm_prompt_cache.skipped_small")
+            return None
+        try:
+            cached = await self._client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_instruction,
+                    ttl=f"{int(settings.llm_prompt_cache_ttl_s)}s",
+                    display_name=f"ddi-{settings.prompt_version}-{key[:12]}",
+                ),
+            )
+        except Exception as e:
+            metrics.incr("llm_prompt_cache.failed")
+            if isinstance(e, genai_errors.ClientError) and e.code in _UNCACHEABLE_CODES:
+                logger.warning(f"Gemini no admite el prompt en caché ({model}): {e}. Se enviará completo.")
+                self._uncacheable.add(key)
+            else:
+                # 429, 5xx o fallo de red: solo esta llamada va sin caché; la siguiente lo reintenta.
+                logger.warning(f"No se pudo registrar el prompt en la caché de Gemini ({model}): {e}. Se enviará completo.")
+            return None
+        self._handles[key] = _CacheHandle(cached.name, time.time() + settings.llm_prompt_cache_ttl_s)
+        metrics.incr("llm_prompt_cache.created")
+        logger.info(f"Prompt registrado en la caché de Gemini como {cached.name} ({model}).")
+        return cached.name
+
+    async def _refresh(self, key: str, handle: _CacheHandle) -> Optional[str]:
+        try:
+            await self._client.aio.caches.update(
+                name=handle.name,
+                config=types.UpdateCachedContentConfig(ttl=f"{int(settings.llm_prompt_cache_ttl_s)}s"),
+            )
+        except genai_errors.APIError as e:
+            logger.warning(f"No se pudo renovar la caché {handle.name}: {e}")
+            self._handles.pop(key, None)
+            return None
+        handle.expires_at = time.time() + settings.llm_prompt_cache_ttl_s
+        metrics.incr("llm_prompt_cache.refreshed")
+        return handle.name
+
+    def invalidate(self, name: str) -> None:
+        """Olvida un handle que el proveedor ya no reconoce (expirado o borrado)."""
+        for key, handle in list(self._handles.items()):
+            if handle.name == name:
+                del self._handles[key]
+
+    async def aclose(self) -> None:
+        """Borra los contenidos en caché creados por este proceso."""
+        for handle in list(self._handles.values()):
+            try:
+                await self._client.aio.caches.delete(name=handle.name)
+            except Exception as e:
+                logger.debug(f"No se pudo borrar la caché {handle.name}: {e}")
+        self._handles.clear()
@@ -1,19 +1,29 @@
 # ddi/llm/providers.py
 
 from __future__ import annotations
+import asyncio
 import logging
 import json
+import time
 import uuid
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Type, Tuple, Literal
 
 from ddi.core.config import settings, Settings
-from .retry import make_retry # <-- CORRECCIÓN: Importa desde el nuevo archivo
+from ddi.core import metrics
+from .retry import make_retry, get_breaker, get_retry_budget, is_transient_error
+from .limiter import get_limiter, is_rate_limit_error
+from .streaming import StreamAbortedError
+from .tokens import estimate_messages_tokens
+from .prompt_cache import GeminiPromptCache
+from . import structured
 
-from openai import AsyncOpenAI, APIError, RateLimitError, APITimeoutError, AuthenticationError
+import httpx
+from openai import AsyncOpenAI, APIError, APIConnectionError, InternalServerError, RateLimitError, APITimeoutError, AuthenticationError
 from google import genai
 from google.genai import types
+from google.genai import errors as genai_errors
 from google.api_core import exceptions as google_exceptions
 import ollama
 from aiohttp.client_exceptions import ClientConnectorError, ConnectionTimeoutError
@@ -26,6 +36,18 @@ class EmptyLLMResponseError(ValueError):
     """Excepción para cuando el LLM devuelve una respuesta vacía."""
     pass
 
+def make_usage(prompt: int = 0, completion: int = 0, cached: int = 0, total: Optional[int] = None) -> Dict[str, int]:
+    """
+    Desglose normalizado de tokens de una llamada. `cached` es la parte de
+    `prompt` servida desde la caché de contexto del proveedor.
+    """
+    return {
+        "prompt": prompt or 0,
+        "completion": completion or 0,
+        "cached": cached or 0,
+        "total": total if total else (prompt or 0) + (completion or 0),
+    }
+
 @dataclass
 class LLMResponse:
     text: str
@@ -39,35 +61,200 @@ class LLMResponse:
 
 _PROVIDER_REGISTRY: Dict[str, Type['BaseLLMClient']] = {}
 
+# Pool de clientes de larga vida, indexado por (proveedor, modelo). Cada cliente
+# conserva su sesión HTTP (con keep-alive) durante toda la vida del proceso.
+_CLIENT_POOL: Dict[Tuple[str, str], 'BaseLLMClient'] = {}
+
 def register_provider(name: str):
     def decorator(cls: Type['BaseLLMClient']):
         _PROVIDER_REGISTRY[name.lower()] = cls
+        cls.provider_name = name.lower()
         return cls
     return decorator
 
-def get_provider(name: str) -> 'BaseLLMClient':
+def get_provider(name: str, model: Optional[str] = None) -> 'BaseLLMClient':
+    """Construye un cliente nuevo. Para uso normal, preferir `get_client`."""
     try:
         client_cls = _PROVIDER_REGISTRY[name.lower()]
-        return client_cls(settings)
     except KeyError:
         raise ValueError(f"Proveedor LLM no soportado: {name!r}")
+    return client_cls(settings, model=model)
+
+def get_client(provider: str, model: Optional[str] = None) -> 'BaseLLMClient':
+    """
+    Devuelve el cliente compartido para (proveedor, modelo), creándolo la primera
+    vez que se solicita.
+    """
+    key = (provider.lower(), model or settings.llm_model)
+    client = _CLIENT_POOL.get(key)
+    if client is None:
+        client = get_provider(key[0], model=key[1])
+        _CLIENT_POOL[key] = client
+        log.info(f"Cliente LLM creado en el pool para {key[0]}/{key[1]}.")
+    return client
+
+def init_client_pool() -> None:
+    """
+    Crea por adelantado el cliente del proveedor y modelo por defecto.
+    Se invoca una sola vez al arrancar la aplicación.
+    """
+    try:
+        get_client(settings.llm_provider, settings.llm_model)
+    except Exception as e:
+        log.warning(f"No se pudo inicializar el cliente LLM por defecto; se creará bajo demanda. Error: {e}")
+
+async def close_client_pool() -> None:
+    """Cierra todas las sesiones HTTP del pool. Se invoca al apagar la aplicación."""
+    clients = list(_CLIENT_POOL.values())
+    _CLIENT_POOL.clear()
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            log.warning(f"Error al cerrar el cliente {client.__class__.__name__}: {e}")
+
+def _build_http_transport() -> httpx.AsyncHTTPTransport:
+    """Transporte HTTP compartido con límites de conexión y keep-alive."""
+    return httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=settings.llm_http_max_connections,
+            max_keepalive_connections=settings.llm_http_max_keepalive,
+            keepalive_expiry=settings.llm_http_keepalive_expiry_s,
+        ),
+    )
 
 class BaseLLMClient(ABC):
-    def __init__(self, settings: Settings):
+    # Nombre con el que se registró el proveedor; lo asigna `register_provider`.
+    provider_name: str = ""
+
+    def __init__(self, settings: Settings, model: Optional[str] = None):
         self.settings = settings
+        self.model = model or settings.llm_model
         self.logger = logging.getLogger(f"app.llm.{self.__class__.__name__}")
         self._retry = make_retry(self.retry_exceptions(), settings.llm_max_retries)
+        # El envoltorio de reintentos se construye una sola vez por cliente. Cada
+        # intento pasa por el limitador, de modo que los reintentos también
+        # respetan los presupuestos RPM/TPM compartidos.
+        self._call_with_retry = self._retry(self._limited_call)
 
     @classmethod
     def retry_exceptions(cls) -> Tuple[Type[Exception], ...]:
         return ()
 
+    @classmethod
+    def structured_format(cls, response_schema: Any) -> Optional[Dict[str, Any]]:
+        """
+        Parámetro de salida estructurada del proveedor para `response_schema`,
+        o None si el proveedor no puede restringir la salida a ese esquema.
+        """
+        return None
+
     async def generate_response(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice = "auto", **kwargs: Any) -> LLMResponse:
+        """
+        Si se pasa `stream_observer` (ver `ddi.llm.streaming.JSONStreamObserver`),
+        la respuesta se recibe en streaming y el observador puede abortarla en
+        cuanto detecta que la salida no es aprovechable.
+
+        Si se pasa `response_schema` (un tipo Pydantic) y el proveedor lo admite,
+        la salida se restringe a ese esquema; si el proveedor lo rechaza, se
+        repite la llamada en modo texto.
+        """
+        model_name = kwargs.get("model", self.model)
+        response_schema = kwargs.pop("response_schema", None)
+        if response_schema is not None and (
+            self.structured_format(response_schema) is None
+            or not structured.is_supported(self.provider_name, model_name, response_schema)
+        ):
+            response_schema = None
+
+        get_retry_budget().record_request()
         try:
-            return await self._retry(self._call)(messages, tool_choice=tool_choice, **kwargs)
+            response = await self._call_with_retry(messages, tool_choice=tool_choice, response_schema=response_schema, **kwargs)
+            response.extra["structured_output"] = response_schema is not None
+            return response
+        except StreamAbortedError as e:
+            self.logger.warning(f"Stream abortado para {self.__class__.__name__}: {e}")
+            return LLMResponse(
+                text=e.partial_text,
+                model=kwargs.get("model", self.model),
+                usage=make_usage(prompt=estimate_messages_tokens(messages), completion=len(e.partial_text) // 4),
+                success=False,
+                error_message=str(e),
+                extra={"stream_abort_code": e.code},
+            )
         except Exception as e:
+            status = getattr(e, "status_code", None) or getattr(e, "code", None)
+            if response_schema is not None and status == 400 and structured.is_schema_rejection(e):
+                self.logger.warning(
+                    f"{self.__class__.__name__} rechazó el esquema {structured.schema_name(response_schema)} "
+                    f"para {model_name}; se usará el modo texto. Detalle: {e}"
+                )
+                structured.mark_unsupported(self.provider_name, model_name, response_schema)
+                metrics.incr("llm_structured.schema_rejected")
+                return await self.generate_response(messages, tool_choice=tool_choice, **kwargs)
             self.logger.error(f"Error durante la llamada LLM para {self.__class__.__name__}: {e}", exc_info=True)
-            return LLMResponse(text="", model=kwargs.get("model", "unknown"), usage={}, success=False, error_message=str(e))
+            return LLMResponse(text="", model=kwargs.get("model", self.model), usage={}, success=False, error_message=str(e))
+
+    async def _limited_call(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, stream_observer: Any = None, **kwargs: Any) -> LLMResponse:
+        breaker = get_breaker(self.provider_name)
+        await breaker.before_call()
+        limiter = get_limiter(self.provider_name, kwargs.get("model", self.model))
+        estimated_tokens = estimate_messages_tokens(messages)
+        try:
+            await limiter.acquire(estimated_tokens)
+        except BaseException:
+            # Cancelada o fallida antes de enviarse: la llamada de prueba (si lo era) queda libre.
+            breaker.record_abandoned()
+            raise
+        start = time.monotonic()
+        try:
+            if stream_observer is not None:
+                stream_observer.reset()
+                response = await self._stream(messages, tool_choice=tool_choice, stream_observer=stream_observer, **kwargs)
+            else:
+                response = await self._call(messages, tool_choice=tool_choice, **kwargs)
+        except asyncio.CancelledError:
+            # Llamada cancelada (p. ej. al perder una cobertura): se libera el hueco.
+            await limiter.abandon()
+            breaker.record_abandoned()
+            raise
+        except Exception as e:
+            if is_transient_error(e, self.retry_exceptions()):
+                breaker.record_failure()
+                await limiter.release(
+                    time.monotonic() - start,
+                    throttled=is_rate_limit_error(e),
+                    failed=True,
+                    estimated_tokens=estimated_tokens,
+                )
+            else:
+                # Errores no transitorios (esquema rechazado, autenticación, stream
+                # abortado...) no dicen nada de la salud del proveedor, pero deben
+                # liberar la llamada de prueba del estado semiabierto y el hueco.
+                breaker.record_abandoned()
+                await limiter.abandon()
+            raise
+        breaker.record_success()
+        await limiter.release(
+            time.monotonic() - start,
+            estimated_tokens=estimated_tokens,
+            actual_tokens=response.usage.get("total"),
+        )
+        return response
+
+    async def _stream(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, stream_observer: Any, **kwargs: Any) -> LLMResponse:
+        """
+        Llamada en streaming. Los proveedores sin soporte entregan la respuesta
+        completa al observador como un único fragmento.
+        """
+        response = await self._call(messages, tool_choice=tool_choice, **kwargs)
+        if response.success and response.text:
+            await stream_observer.on_chunk(response.text)
+        return response
+
+    async def aclose(self) -> None:
+        """Libera los recursos de red del cliente. Por defecto no hace nada."""
+        return None
 
     @abstractmethod
     async def _call(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, **kwargs: Any) -> LLMResponse:
@@ -75,37 +262,144 @@ class BaseLLMClient(ABC):
 
 @register_provider("gemini")
 class GeminiClient(BaseLLMClient):
+    _SAFETY_SETTINGS = [
+        types.SafetySetting(category=cat, threshold=types.HarmBlockThreshold.BLOCK_NONE)
+        for cat in (
+            types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+            types.HarmCategory.HARM_CATEGORY_HATE_SPEECH,
+            types.HarmCategory.HARM_CATEGORY_HARASSMENT,
+            types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+        )
+    ]
+
     @classmethod
     def retry_exceptions(cls) -> Tuple[Type[Exception], ...]:
         return (
             google_exceptions.ResourceExhausted,
             google_exceptions.InternalServerError,
+            genai_errors.ServerError,
             ConnectionTimeoutError,
             ClientConnectorError
         )
 
-    def __init__(self, settings: Settings):
-        super().__init__(settings)
-        if not settings.google_api_key:
-            raise ValueError("Para la API de Gemini, se requiere 'google_api_key'.")
-        # La configuración se realiza una sola vez
-        genai.configure(api_key=settings.google_api_key)
+    def __init__(self, settings: Settings, model: Optional[str] = None):
+        super().__init__(settings, model=model)
+        if not settings.GEMINI_API_KEY:
+            raise ValueError("Para la API de Gemini, se requiere 'GEMINI_API_KEY'.")
+        # El cliente (y su sesión HTTP) se crea una sola vez. Al inyectar un
+        # transporte httpx propio, el SDK reutiliza un único AsyncClient con
+        # keep-alive en lugar de abrir una sesión nueva por petición.
+        self._client = genai.Client(
+            api_key=settings.GEMINI_API_KEY,
+            http_options=types.HttpOptions(
+                timeout=int(settings.llm_request_timeout_s * 1000),
+                async_client_args={"transport": _build_http_transport()},
+            ),
+        )
+        self._prompt_cache = GeminiPromptCache(self._client)
 
-    async def _call(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, **kwargs: Any) -> LLMResponse:
-        system_instruction = next((msg.get("content") for msg in messages if msg.get("role") == "system"), None)
-        model_name = kwargs.get("model", settings.llm_model)
-        gemini_history = self._build_gemini_history(messages)
+    async def aclose(self) -> None:
+        await self._prompt_cache.aclose()
+        http_client = getattr(self._client._api_client, "_async_httpx_client", None)
+        if http_client is not None:
+            await http_client.aclose()
 
-        generation_config = types.GenerateContentConfig(
-            temperature=kwargs.get("temperature", settings.llm_temperature),
-            max_output_tokens=kwargs.get("max_tokens", settings.llm_max_tokens),
-            safety_settings=[types.SafetySetting(category=cat, threshold=types.HarmBlockThreshold.BLOCK_NONE) for cat in (types.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT, types.HarmCategory.HARM_CATEGORY_HATE_SPEECH, types.HarmCategory.HARM_CATEGORY_HARASSMENT, types.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT)],
+    @classmethod
+    def structured_format(cls, response_schema: Any) -> Optional[Dict[str, Any]]:
+        if response_schema is None:
+            return None
+        return {"response_mime_type": "application/json", "response_json_schema": structured.json_schema_for(response_schema)}
+
+    def _build_generation_config(self, messages: List[Dict[str, Any]], **kwargs: Any) -> types.GenerateContentConfig:
+        system_instruction = next((msg.get("content") for msg in messages if msg.get("role") == "system"), None)
+        return types.GenerateContentConfig(
+            system_instruction=system_instruction,
+            temperature=kwargs.get("temperature", self.settings.llm_temperature),
+            max_output_tokens=kwargs.get("max_tokens", self.settings.llm_max_tokens),
+            safety_settings=self._SAFETY_SETTINGS,
+            **(self.structured_format(kwargs.get("response_schema")) or {}),
         )
 
-        model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
-        res = await model.generate_content_async(contents=gemini_history, generation_config=generation_config)
+    async def _cached_generation_config(self, model_name: str, messages: List[Dict[str, Any]], **kwargs: Any) -> types.GenerateContentConfig:
+        """Sustituye el mensaje de sistema por su handle en la caché de Gemini, si está disponible."""
+        generation_config = self._build_generation_config(messages, **kwargs)
+        cached_name = await self._prompt_cache.handle_for(model_name, generation_config.system_instruction)
+        if cached_name:
+            generation_config.system_instruction = None
+            generation_config.cached_content = cached_name
+        return generation_config
+
+    def _drop_stale_cache(self, error: Exception, generation_config: types.GenerateContentConfig, messages: List[Dict[str, Any]], **kwargs: Any) -> Optional[types.GenerateContentConfig]:
+        """Si el handle ya no existe en el proveedor, lo olvida y devuelve la configuración sin caché."""
+        if generation_config.cached_content and isinstance(error, genai_errors.ClientError) and error.code in (403, 404):
+            self.logger.warning(f"La caché {generation_config.cached_content} ya no es válida; se envía el prompt completo.")
+            self._prompt_cache.invalidate(generation_config.cached_content)
+            return self._build_generation_config(messages, **kwargs)
+        return None
+
+    async def _call(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, **kwargs: Any) -> LLMResponse:
+        model_name = kwargs.get("model", self.model)
+        gemini_history = self._build_gemini_history(messages)
+        generation_config = await self._cached_generation_config(model_name, messages, **kwargs)
+
+        try:
+            res = await self._client.aio.models.generate_content(model=model_name, contents=gemini_history, config=generation_config)
+        except genai_errors.ClientError as e:
+            generation_config = self._drop_stale_cache(e, generation_config, messages, **kwargs)
+            if generation_config is None:
+                raise
+            res = await self._client.aio.models.generate_content(model=model_name, contents=gemini_history, config=generation_config)
         return self._parse_gemini_response(res, model_name)
 
+    async def _stream(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, stream_observer: Any, **kwargs: Any) -> LLMResponse:
+        model_name = kwargs.get("model", self.model)
+        gemini_history = self._build_gemini_history(messages)
+        generation_config = await self._cached_generation_config(model_name, messages, **kwargs)
+
+        try:
+            stream = await self._client.aio.models.generate_content_stream(model=model_name, contents=gemini_history, config=generation_config)
+        except genai_errors.ClientError as e:
+            generation_config = self._drop_stale_cache(e, generation_config, messages, **kwargs)
+            if generation_config is None:
+                raise
+            stream = await self._client.aio.models.generate_content_stream(model=model_name, contents=gemini_history, config=generation_config)
+        parts: List[str] = []
+        last_chunk = None
+        try:
+            async for chunk in stream:
+                last_chunk = chunk
+                if chunk.prompt_feedback and chunk.prompt_feedback.block_reason:
+                    return self._parse_gemini_response(chunk, model_name)
+                for candidate in chunk.candidates or []:
+                    for part in (candidate.content.parts if candidate.content else None) or []:
+                        if part.text:
+                            parts.append(part.text)
+                            await stream_observer.on_chunk(part.text)
+        finally:
+            # Cerrar el stream corta la descarga si el observador abortó.
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+        usage = self._usage(last_chunk.usage_metadata if last_chunk is not None else None)
+        text = "".join(parts)
+        if not text:
+            return LLMResponse(text="", model=model_name, usage=usage, success=False, error_message="El stream de Gemini no devolvió contenido.")
+        finish_reason = last_chunk.candidates[0].finish_reason if last_chunk.candidates else None
+        return LLMResponse(text=text, model=model_name, usage=usage, extra={"truncated": finish_reason == types.FinishReason.MAX_TOKENS})
+
+    @staticmethod
+    def _usage(usage_metadata: Optional[types.GenerateContentResponseUsageMetadata]) -> Dict[str, int]:
+        if not usage_metadata:
+            return make_usage()
+        return make_usage(
+            prompt=usage_metadata.prompt_token_count,
+            # Los tokens de razonamiento se facturan como salida.
+            completion=(usage_metadata.candidates_token_count or 0) + (usage_metadata.thoughts_token_count or 0),
+            cached=usage_metadata.cached_content_token_count,
+            total=usage_metadata.total_token_count,
+        )
+
     def _build_gemini_history(self, messages: List[Dict[str, Any]]) -> List[types.Content]:
         gemini_history = []
         for msg in messages:
@@ -116,9 +410,10 @@ class GeminiClient(BaseLLMClient):
         return gemini_history
 
     def _parse_gemini_response(self, res: types.GenerateContentResponse, model_name: str) -> LLMResponse:
-        text_content, success, error_message = "", True, None
+        text_content, success, error_message, truncated = "", True, None, False
         try:
             candidate = res.candidates[0]
+            truncated = candidate.finish_reason == types.FinishReason.MAX_TOKENS
 
             if (candidate.finish_reason == types.FinishReason.STOP and not candidate.content.parts):
                 raise EmptyLLMResponseError(f"Respuesta vacía. Razón: {candidate.finish_reason.name}")
@@ -128,14 +423,189 @@ class GeminiClient(BaseLLMClient):
             elif candidate.content and candidate.content.parts:
                 text_content = "".join(part.text for part in candidate.content.parts if part.text)
 
-        except (IndexError, AttributeError):
+        except (IndexError, AttributeError, TypeError):
             success, error_message = False, f"Error al parsear la respuesta de Gemini. Raw: {res}"
 
-        usage = {"total": res.usage_metadata.total_token_count if hasattr(res, 'usage_metadata') else 0}
-        return LLMResponse(text=text_content, model=model_name, usage=usage, success=success, error_message=error_message)
+        return LLMResponse(
+            text=text_content, model=model_name, usage=self._usage(res.usage_metadata),
+            success=success, error_message=error_message, extra={"truncated": truncated},
+        )
+
+
+@register_provider("openai")
+class OpenAIClient(BaseLLMClient):
+    """Cliente para la API de Chat Completions de OpenAI (y APIs compatibles)."""
+
+    @classmethod
+    def retry_exceptions(cls) -> Tuple[Type[Exception], ...]:
+        return (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+    def _api_key(self) -> Optional[str]:
+        return self.settings.OPENAI_API_KEY
+
+    def _base_url(self) -> Optional[str]:
+        return self.settings.OPENAI_BASE_URL
+
+    def __init__(self, settings: Settings, model: Optional[str] = None):
+        super().__init__(settings, model=model)
+        api_key = self._api_key()
+        if not api_key:
+            raise ValueError(f"Para el proveedor '{self.provider_name}' se requiere una API key.")
+        # Los reintentos se gestionan en `make_retry`; el SDK no debe reintentar por su cuenta.
+        self._client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=self._base_url(),
+            max_retries=0,
+            http_client=httpx.AsyncClient(
+                transport=_build_http_transport(),
+                timeout=settings.llm_request_timeout_s,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.close()
+
+    @classmethod
+    def structured_format(cls, response_schema: Any) -> Optional[Dict[str, Any]]:
+        if response_schema is None:
+            return None
+        json_schema = structured.json_schema_for(response_schema)
+        # `response_format` de tipo json_schema exige un objeto en la raíz.
+        if json_schema.get("type") != "object":
+            return None
+        return {
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": structured.schema_name(response_schema), "schema": json_schema, "strict": False},
+            }
+        }
+
+    def _request_params(self, messages: List[Dict[str, Any]], **kwargs: Any) -> Dict[str, Any]:
+        return {
+            "model": kwargs.get("model", self.model),
+            "messages": messages,
+            "temperature": kwargs.get("temperature", self.settings.llm_temperature),
+            "max_tokens": kwargs.get("max_tokens", self.settings.llm_max_tokens),
+            **(self.structured_format(kwargs.get("response_schema")) or {}),
+        }
+
+    async def _call(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, **kwargs: Any) -> LLMResponse:
+        params = self._request_params(messages, **kwargs)
+        res = await self._client.chat.completions.create(**params)
+        if not res.choices:
+            raise EmptyLLMResponseError("La respuesta no contiene 'choices'.")
+        text = res.choices[0].message.content or ""
+        return LLMResponse(
+            text=text, model=res.model or params["model"], usage=self._usage(res.usage),
+            extra={"truncated": res.choices[0].finish_reason == "length"},
+        )
+
+    @staticmethod
+    def _usage(usage: Any) -> Dict[str, int]:
+        if not usage:
+            return make_usage()
+        details = getattr(usage, "prompt_tokens_details", None)
+        return make_usage(
+            prompt=usage.prompt_tokens,
+            completion=usage.completion_tokens,
+            cached=getattr(details, "cached_tokens", 0) if details else 0,
+            total=usage.total_tokens,
+        )
+
+    async def _stream(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, stream_observer: Any, **kwargs: Any) -> LLMResponse:
+        params = self._request_params(messages, **kwargs)
+        stream = await self._client.chat.completions.create(**params, stream=True, stream_options={"include_usage": True})
+        parts: List[str] = []
+        usage = make_usage()
+        finish_reason = None
+        try:
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = self._usage(chunk.usage)
+                if chunk.choices:
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        await stream_observer.on_chunk(delta)
+        finally:
+            await stream.close()
+        return LLMResponse(text="".join(parts), model=params["model"], usage=usage, extra={"truncated": finish_reason == "length"})
+
+@register_provider("openrouter")
+class OpenRouterClient(OpenAIClient):
+    """OpenRouter expone una API compatible con OpenAI."""
+
+    def _api_key(self) -> Optional[str]:
+        return self.settings.OPENROUTER_API_KEY
+
+    def _base_url(self) -> Optional[str]:
+        return self.settings.OPENROUTER_BASE_URL
+
+@register_provider("ollama")
+class OllamaClient(BaseLLMClient):
+    """Cliente para modelos locales servidos por Ollama."""
+
+    @classmethod
+    def retry_exceptions(cls) -> Tuple[Type[Exception], ...]:
+        return (httpx.ConnectError, httpx.ReadTimeout)
+
+    def __init__(self, settings: Settings, model: Optional[str] = None):
+        super().__init__(settings, model=model)
+        self._client = ollama.AsyncClient(
+            host=settings.OLLAMA_HOST,
+            transport=_build_http_transport(),
+            timeout=settings.llm_request_timeout_s,
+        )
+
+    async def aclose(self) -> None:
+        await self._client._client.aclose()
+
+    @classmethod
+    def structured_format(cls, response_schema: Any) -> Optional[Dict[str, Any]]:
+        if response_schema is None:
+            return None
+        return {"format": structured.json_schema_for(response_schema)}
+
+    def _request_params(self, messages: List[Dict[str, Any]], **kwargs: Any) -> Dict[str, Any]:
+        return {
+            "model": kwargs.get("model", self.model),
+            "messages": messages,
+            "options": {
+                "temperature": kwargs.get("temperature", self.settings.llm_temperature),
+                "num_predict": kwargs.get("max_tokens", self.settings.llm_max_tokens),
+            },
+            **(self.structured_format(kwargs.get("response_schema")) or {}),
+        }
+
+    @staticmethod
+    def _usage(res: Any) -> Dict[str, int]:
+        return make_usage(prompt=res.prompt_eval_count, completion=res.eval_count)
+
+    async def _call(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, **kwargs: Any) -> LLMResponse:
+        params = self._request_params(messages, **kwargs)
+        res = await self._client.chat(**params)
+        return LLMResponse(
+            text=res.message.content or "", model=params["model"], usage=self._usage(res),
+            extra={"truncated": res.done_reason == "length"},
+        )
+
+    async def _stream(self, messages: List[Dict[str, Any]], tool_choice: ToolChoice, stream_observer: Any, **kwargs: Any) -> LLMResponse:
+        params = self._request_params(messages, **kwargs)
+        parts: List[str] = []
+        usage = make_usage()
+        truncated = False
+        async for chunk in await self._client.chat(**params, stream=True):
+            if chunk.message and chunk.message.content:
+                parts.append(chunk.message.content)
+                await stream_observer.on_chunk(chunk.message.content)
+            if chunk.done:
+                usage = self._usage(chunk)
+                truncated = chunk.done_reason == "length"
+        return LLMResponse(text="".join(parts), model=params["model"], usage=usage, extra={"truncated": truncated})
 
 
 async def generate_response(messages: List[Dict[str, Any]], **kwargs: Any) -> LLMResponse:
     provider_name = kwargs.pop("provider", settings.llm_provider)
-    client = get_provider(provider_name)
+    client = get_client(provider_name, kwargs.get("model"))
     return await client.generate_response(messages=messages, **kwargs)
@@ -0,0 +1,103 @@
+# ddi/llm/repair.py
+
+"""
+Reparación local y determinista de salidas JSON casi válidas.
+
+Se aplica cuando una respuesta no supera el parseo o la validación, antes de
+darla por perdida: reparar cuesta milisegundos y regenerar, decenas de
+segundos. Corrige en una sola pasada:
+
+- texto adicional antes o después del JSON;
+- saltos de línea, tabuladores y caracteres de control sin escapar en strings;
+- comillas sin escapar dentro de un string;
+- comas colgantes antes de `}` o `]`;
+- cierres de llaves/corchetes que faltan o no corresponden.
+"""
+
+from typing import List, Optional
+
+_CONTROL_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+def _next_significant(text: str, i: int) -> str:
+    """Primer carácter no blanco a partir de `i` ("" si se acaba el texto)."""
+    n = len(text)
+    while i < n and text[i] in " \t\r\n":
+        i += 1
+    return text[i] if i < n else ""
+
+def _strip_dangling(out: List[str]) -> None:
+    """Quita blancos y una coma colgante al final de la salida."""
+    while out and out[-1] in (" ", "\t", "\r", "\n"):
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+def repair_json(text: str, expected_root: Optional[str] = None) -> Optional[str]:
+    """
+    Devuelve una versión reparada del JSON contenido en `text`, o None si no
+    hay ninguna estructura JSON que reparar. No garantiza que el resultado sea
+    válido: el llamador debe volver a parsearlo y validarlo.
+    """
+    openers = expected_root or "{["
+    start = next((i for i, ch in enumerate(text) if ch in openers), None)
+    if start is None:
+        return None
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escape = False
+
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                out.append(ch)
+                escape = False
+            elif ch == "\\":
+                out.append(ch)
+                escape = True
+            elif ch == '"':
+                # Una comilla solo cierra el string si le sigue un delimitador JSON.
+                if _next_significant(text, i + 1) in (",", "}", "]", ":", ""):
+                    in_string = False
+                    out.append(ch)
+                else:
+                    out.append('\\"')
+            elif ch in _CONTROL_ESCAPES:
+                out.append(_CONTROL_ESCAPES[ch])
+            elif ord(ch) < 0x20:
+                out.append(f"\\u{ord(ch):04x}")
+            else:
+                out.append(ch)
+            continue
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch in "}]":
+            _strip_dangling(out)
+            # Se usa el cierre que corresponde a la apertura, aunque el modelo haya puesto otro.
+            out.append(stack.pop())
+            if not stack:
+                # Fin de la raíz: lo que sigue es texto adicional.
+                return "".join(out)
+        else:
+            out.append(ch)
+
+    # Salida cortada: se cierra el string abierto y las estructuras pendientes.
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    _strip_dangling(out)
+    if out and out[-1] == ":":
+        out.append("null")
+    while stack:
+        _strip_dangling(out)
+        out.append(stack.pop())
+    return "".join(out)
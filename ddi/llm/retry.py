@@ -1,7 +1,228 @@
 # ddi/llm/retry.py
 
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from typing import Tuple, Type
+"""
+Subsistema de reintentos compartido por todos los clientes LLM:
+
+- Espera exponencial con *full jitter*, para que cientos de llamadas que fallan
+  a la vez no reintenten en sincronía.
+- Respeto de la cabecera `Retry-After` cuando el proveedor la envía.
+- Presupuesto global de reintentos: cada petición aporta una fracción de
+  reintento, de modo que durante un incidente los reintentos no pueden
+  multiplicar la carga sobre el proveedor.
+- Circuit breaker por proveedor: si la tasa de fallos transitorios supera el
+  umbral, las llamadas fallan de inmediato (o esperan en cola un tiempo
+  acotado) hasta que una llamada de prueba confirma la recuperación.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, Optional, Tuple, Type
+
+from tenacity import retry, stop_after_attempt
+from tenacity.wait import wait_base
+
+from ddi.core import metrics
+from ddi.core.config import settings
+from .limiter import is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(RuntimeError):
+    """El circuit breaker del proveedor está abierto; la llamada no se envía."""
+    pass
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Extrae el valor de `Retry-After` (segundos o fecha HTTP) de la respuesta, si existe."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+def is_transient_error(exc: BaseException, exc_types: Tuple[Type[Exception], ...] = ()) -> bool:
+    """Errores que indican un problema del proveedor (y no de la petición)."""
+    if isinstance(exc, exc_types) or is_rate_limit_error(exc):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(exc, "code", None)
+    return isinstance(status, int) and status >= 500
+
+class RetryBudget:
+    """
+    Presupuesto de reintentos del proceso. Cada petición original deposita
+    `ratio` fichas y cada reintento consume una; además se repone un mínimo
+    por segundo para que un tráfico bajo pueda seguir reintentando.
+    """
+
+    def __init__(self, ratio: float, min_per_s: float, capacity: float):
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.min_per_s)
+        self.updated = now
+
+    def record_request(self) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        metrics.incr("llm_retry.budget_exhausted")
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        self._refill()
+        return {"available_retries": round(self.tokens, 2), "capacity": self.capacity}
+
+_RETRY_BUDGET = RetryBudget(
+    ratio=settings.llm_retry_budget_ratio,
+    min_per_s=settings.llm_retry_budget_min_per_s,
+    capacity=settings.llm_retry_budget_capacity,
+)
+
+def get_retry_budget() -> RetryBudget:
+    return _RETRY_BUDGET
+
+class CircuitBreaker:
+    """Circuit breaker de un proveedor (cerrado → abierto → semiabierto)."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.outcomes: Deque[Tuple[float, bool]] = deque()
+        self._probe_in_flight = False
+
+    def _refresh_state(self) -> str:
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= settings.llm_breaker_open_s:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"Circuit breaker {self.name}: semiabierto, se permite una llamada de prueba.")
+        return self.state
+
+    def _remaining_open_s(self) -> float:
+        return max(0.0, settings.llm_breaker_open_s - (time.monotonic() - self.opened_at))
+
+    async def before_call(self) -> None:
+        """Deja pasar la llamada, la retiene en cola un tiempo acotado o falla de inmediato."""
+        deadline = time.monotonic() + settings.llm_breaker_queue_s
+        while True:
+            state = self._refresh_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            wait = self._remaining_open_s() if state == self.OPEN else 0.5
+            if time.monotonic() + wait > deadline:
+                metrics.incr(f"llm_breaker.rejected.{self.name}")
+                raise CircuitOpenError(f"Circuit breaker abierto para '{self.name}'; la llamada no se envía.")
+            await asyncio.sleep(wait)
+
+    def record_success(self) -> None:
+        if self.state == self.HALF_OPEN:
+            logger.info(f"Circuit breaker {self.name}: la llamada de prueba tuvo éxito; se cierra.")
+            self.state = self.CLOSED
+            self.outcomes.clear()
+            self._probe_in_flight = False
+            return
+        self._record(True)
+
+    def record_failure(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self._record(False)
+        failures = sum(1 for _, ok in self.outcomes if not ok)
+        if (
+            self.state == self.CLOSED
+            and len(self.outcomes) >= settings.llm_breaker_min_calls
+            and failures / len(self.outcomes) >= settings.llm_breaker_failure_rate
+        ):
+            self._open()
+
+    def record_abandoned(self) -> None:
+        """Una llamada de prueba cancelada no debe dejar el breaker bloqueado."""
+        self._probe_in_flight = False
+
+    def _record(self, ok: bool) -> None:
+        now = time.monotonic()
+        self.outcomes.append((now, ok))
+        cutoff = now - settings.llm_breaker_window_s
+        while self.outcomes and self.outcomes[0][0] < cutoff:
+            self.outcomes.popleft()
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._probe_in_flight = False
+        metrics.incr(f"llm_breaker.opened.{self.name}")
+        logger.warning(f"Circuit breaker {self.name}: ABIERTO durante {settings.llm_breaker_open_s}s.")
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self._refresh_state()
+        failures = sum(1 for _, ok in self.outcomes if not ok)
+        return {
+            "state": state,
+            "recent_calls": len(self.outcomes),
+            "recent_failures": failures,
+            "reopens_in_s": round(self._remaining_open_s(), 1) if state == self.OPEN else None,
+        }
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    key = provider.lower()
+    breaker = _BREAKERS.get(key)
+    if breaker is None:
+        breaker = _BREAKERS[key] = CircuitBreaker(key)
+    return breaker
+
+def breaker_snapshot() -> Dict[str, Dict[str, Any]]:
+    return {name: breaker.snapshot() for name, breaker in _BREAKERS.items()}
+
+class wait_full_jitter_retry_after(wait_base):
+    """
+    Espera aleatoria en [0, min(máximo, base·2^intento)] ("full jitter"), salvo
+    que el proveedor indique `Retry-After`, en cuyo caso se respeta.
+    """
+
+    def __init__(self, base: float, maximum: float):
+        self.base = base
+        self.maximum = maximum
+
+    def __call__(self, retry_state: Any) -> float:
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        if exc is not None:
+            retry_after = retry_after_seconds(exc)
+            if retry_after is not None:
+                return min(self.maximum, retry_after)
+        ceiling = min(self.maximum, self.base * (2 ** (retry_state.attempt_number - 1)))
+        return random.uniform(0, ceiling)
 
 def make_retry(
     exc_types: Tuple[Type[Exception], ...],
@@ -10,11 +231,22 @@ def make_retry(
     """
     Construye un decorador de reintentos para la librería Tenacity, parametrizado
     por los tipos de excepción que deben provocar un reintento y el número
-    máximo de intentos.
+    máximo de intentos. Cada reintento consume del presupuesto global; el
+    último intento fallido no reintenta, así que no lo consume.
     """
+    def should_retry(retry_state: Any) -> bool:
+        if not retry_state.outcome.failed:
+            return False
+        if not is_transient_error(retry_state.outcome.exception(), exc_types):
+            return False
+        if retry_state.attempt_number >= max_retries:
+            return False
+        metrics.incr("llm_retry.attempts")
+        return _RETRY_BUDGET.try_spend()
+
     return retry(
         reraise=True,  # Vuelve a lanzar la excepción original si todos los reintentos fallan
         stop=stop_after_attempt(max_retries),
-        wait=wait_exponential(multiplier=1, min=2, max=60), # Espera exponencial entre reintentos
-        retry=retry_if_exception_type(exc_types),
+        wait=wait_full_jitter_retry_after(settings.llm_retry_base_s, settings.llm_retry_max_wait_s),
+        retry=should_retry,
     )
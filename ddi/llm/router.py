@@ -0,0 +1,201 @@
+# ddi/llm/router.py
+
+"""
+Enrutamiento de llamadas LLM entre los proveedores registrados.
+
+- Cobertura (hedging): si la llamada a la ruta principal supera su latencia p95
+  observada, se lanza un duplicado a la ruta secundaria y se usa la primera
+  respuesta exitosa. Así la latencia de cola de una etapa no depende del ítem
+  más lento.
+- Conmutación por error (failover): si la tasa de error reciente de una ruta
+  supera el umbral, se envía el tráfico a la siguiente ruta sana; si una
+  llamada falla, se reintenta una vez por la ruta secundaria. Las rutas cuyo
+  circuit breaker está abierto se consideran no sanas.
+
+Las rutas alternativas se configuran en `settings.llm_fallback_routes`.
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from ddi.core import metrics
+from ddi.core.config import settings
+from ddi.llm.providers import LLMResponse, get_client
+from ddi.llm.retry import get_breaker, CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+# Número de latencias recientes usadas para estimar cuantiles.
+_LATENCY_SAMPLES = 200
+
+@dataclass(frozen=True)
+class Route:
+    provider: str
+    model: str
+
+    @classmethod
+    def parse(cls, spec: str) -> "Route":
+        provider, _, model = spec.partition("/")
+        return cls(provider.lower(), model or settings.llm_model)
+
+    def __str__(self) -> str:
+        return f"{self.provider}/{self.model}"
+
+class RouteStats:
+    """Latencias y resultados recientes de una ruta."""
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self.outcomes: Deque[Tuple[float, bool]] = deque()
+
+    def record(self, latency_s: float, ok: bool) -> None:
+        now = time.monotonic()
+        if ok:
+            self.latencies.append(latency_s)
+        self.outcomes.append((now, ok))
+        self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - settings.llm_failover_window_s
+        while self.outcomes and self.outcomes[0][0] < cutoff:
+            self.outcomes.popleft()
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < settings.llm_hedge_min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def error_rate(self) -> Tuple[float, int]:
+        self._trim(time.monotonic())
+        total = len(self.outcomes)
+        if total == 0:
+            return 0.0, 0
+        return sum(1 for _, ok in self.outcomes if not ok) / total, total
+
+    def is_healthy(self) -> bool:
+        rate, total = self.error_rate()
+        return total < settings.llm_failover_min_calls or rate < settings.llm_failover_error_rate
+
+_STATS: Dict[Route, RouteStats] = {}
+
+def _stats_for(route: Route) -> RouteStats:
+    stats = _STATS.get(route)
+    if stats is None:
+        stats = _STATS[route] = RouteStats()
+    return stats
+
+def _is_content_failure(response: LLMResponse) -> bool:
+    """Un stream abortado por contenido no es un fallo del proveedor."""
+    return "stream_abort_code" in response.extra
+
+async def _timed_call(route: Route, messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> LLMResponse:
+    start = time.monotonic()
+    client = get_client(route.provider, route.model)
+    response = await client.generate_response(messages=messages, model=route.model, **kwargs)
+    _stats_for(route).record(time.monotonic() - start, response.success or _is_content_failure(response))
+    response.extra.setdefault("route", str(route))
+    return response
+
+def _candidate_routes(primary: Route) -> List[Route]:
+    routes = [primary]
+    for spec in settings.llm_fallback_routes:
+        route = Route.parse(spec)
+        if route not in routes:
+            routes.append(route)
+    healthy = [
+        r for r in routes
+        if _stats_for(r).is_healthy() and get_breaker(r.provider).snapshot()["state"] != CircuitBreaker.OPEN
+    ]
+    if healthy and healthy[0] != primary:
+        metrics.incr("llm_router.failovers")
+        logger.warning(f"Ruta {primary} con tasa de error alta; se enruta a {healthy[0]}.")
+    return healthy or routes
+
+async def _hedged_call(
+    first: Route,
+    secondary: Route,
+    hedge_after_s: float,
+    messages: List[Dict[str, Any]],
+    kwargs: Dict[str, Any],
+) -> LLMResponse:
+    primary_task = asyncio.create_task(_timed_call(first, messages, kwargs))
+    pending = {primary_task}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=hedge_after_s)
+        if done:
+            response = primary_task.result()
+            if response.success or _is_content_failure(response):
+                return response
+            metrics.incr("llm_router.failover_retries")
+            fallback_response = await _timed_call(secondary, messages, kwargs)
+            return fallback_response if fallback_response.success else response
+
+        metrics.incr("llm_router.hedges")
+        hedge_task = asyncio.create_task(_timed_call(secondary, messages, kwargs))
+        pending.add(hedge_task)
+        failures: Dict[asyncio.Task, LLMResponse] = {}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                response = task.result()
+                if response.success or _is_content_failure(response):
+                    if task is hedge_task:
+                        metrics.incr("llm_router.hedge_wins")
+                    return response
+                failures[task] = response
+        # Si ambas fallan se informa el error de la ruta principal, como sin cobertura.
+        return failures.get(primary_task) or failures[hedge_task]
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def generate_response(messages: List[Dict[str, Any]], **kwargs: Any) -> LLMResponse:
+    """
+    Punto de entrada enrutado. Acepta los mismos argumentos que
+    `ddi.llm.providers.generate_response`.
+    """
+    primary = Route(
+        kwargs.pop("provider", None) or settings.llm_provider,
+        kwargs.pop("model", None) or settings.llm_model,
+    )
+    routes = _candidate_routes(primary)
+    first = routes[0]
+    secondary = routes[1] if len(routes) > 1 else None
+
+    if secondary is None:
+        return await _timed_call(first, messages, kwargs)
+
+    # Un observador de streaming no puede alimentarse de dos respuestas a la vez.
+    hedge_after_s = None
+    if settings.llm_hedge_enabled and kwargs.get("stream_observer") is None:
+        hedge_after_s = _stats_for(first).quantile(settings.llm_hedge_quantile)
+
+    if hedge_after_s is not None:
+        return await _hedged_call(first, secondary, hedge_after_s, messages, kwargs)
+
+    response = await _timed_call(first, messages, kwargs)
+    if response.success or _is_content_failure(response):
+        return response
+    metrics.incr("llm_router.failover_retries")
+    fallback_response = await _timed_call(secondary, messages, kwargs)
+    return fallback_response if fallback_response.success else response
+
+def router_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Estado de las rutas observadas, para diagnóstico."""
+    snapshot = {}
+    for route, stats in _STATS.items():
+        rate, total = stats.error_rate()
+        p95 = stats.quantile(0.95)
+        snapshot[str(route)] = {
+            "p95_latency_s": round(p95, 3) if p95 is not None else None,
+            "error_rate": round(rate, 3),
+            "recent_calls": total,
+            "healthy": stats.is_healthy(),
+        }
+    return snapshot
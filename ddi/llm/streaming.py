@@ -0,0 +1,227 @@
+# ddi/llm/streaming.py
+
+"""
+Validación incremental de respuestas LLM recibidas en streaming.
+
+`IncrementalJSONScanner` recorre cada fragmento una sola vez (tiempo lineal)
+manteniendo el estado estructural del JSON: pila de corchetes, si se está
+dentro de una cadena, escapes y bloques TEXTO_MULTILINEA. Con ello detecta
+pronto salidas claramente malformadas (corchetes que no casan, texto que no es
+JSON, raíz del tipo equivocado) o que exceden el presupuesto de tokens, para
+abortar la llamada en lugar de pagar miles de tokens que se descartarían.
+"""
+
+from __future__ import annotations
+import typing
+from typing import Any, Awaitable, Callable, List, Optional
+
+MULTILINE_OPEN = "<<<TEXTO_MULTILINEA"
+MULTILINE_CLOSE = "TEXTO_MULTILINEA>>>"
+
+# Caracteres válidos fuera de cadenas además de la estructura ({}[]":,).
+_LITERAL_CHARS = frozenset(" \t\r\n-+.0123456789eEtrufalsn")
+# Texto máximo tolerado antes del inicio del JSON (p. ej. "```json" o una frase de introducción).
+_MAX_PREAMBLE_CHARS = 1000
+_CLOSERS = {"{": "}", "[": "]"}
+
+class StreamAbortedError(Exception):
+    """Se aborta un stream porque la salida no es aprovechable."""
+    def __init__(self, message: str, code: str, partial_text: str = ""):
+        super().__init__(message)
+        self.code = code
+        self.partial_text = partial_text
+
+def expected_root_for(schema: Any) -> Optional[str]:
+    """Carácter de apertura esperado para la raíz según el esquema de la etapa."""
+    if schema is None:
+        return None
+    origin = typing.get_origin(schema)
+    if origin in (list, List, tuple):
+        return "["
+    return "{"
+
+class IncrementalJSONScanner:
+    """Escáner estructural de JSON alimentado por fragmentos."""
+
+    def __init__(self, expected_root: Optional[str] = None, max_chars: Optional[int] = None):
+        self.expected_root = expected_root
+        self.max_chars = max_chars
+        self.reset()
+
+    def reset(self) -> None:
+        self.chars_received = 0
+        self.completed_fields: List[str] = []
+        self.done = False
+        self._preamble = ""
+        self._started = False
+        self._structural = True
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_head = ""
+        self._multiline = False
+        self._tail = ""
+        self._expect_key = False
+        self._capturing_key = False
+        self._key_buf: List[str] = []
+        self._pending_key: Optional[str] = None
+
+    def _abort(self, message: str, code: str = "E904_LLM_RESPONSE_FORMAT_ERROR") -> None:
+        raise StreamAbortedError(message, code)
+
+    def feed(self, chunk: str) -> None:
+        """Procesa un fragmento; lanza StreamAbortedError si la salida no es aprovechable."""
+        self.chars_received += len(chunk)
+        if self.max_chars is not None and self.chars_received > self.max_chars:
+            self._abort(
+                f"La salida excede el presupuesto de {self.max_chars} caracteres.",
+                code="E906_LLM_OUTPUT_BUDGET_EXCEEDED",
+            )
+        if self.done or not self._structural:
+            return
+        for ch in chunk:
+            if not self._started:
+                self._feed_preamble(ch)
+            else:
+                self._feed_body(ch)
+            if self.done or not self._structural:
+                return
+
+    def _feed_preamble(self, ch: str) -> None:
+        if ch in "{[":
+            before = self._preamble.strip()
+            if before and "```" not in before:
+                # Texto libre antes del JSON ("Aquí tienes el JSON: {..."). La respuesta
+                # completa aún es recuperable por el análisis y la reparación
+                # habituales, así que se deja de validar la estructura (solo sigue
+                # vigente el presupuesto de caracteres) en lugar de abortar.
+                self._structural = False
+                return
+            if self.expected_root and ch != self.expected_root:
+                self._abort(f"Se esperaba que el JSON comenzara con '{self.expected_root}' y comenzó con '{ch}'.")
+            self._started = True
+            self._open(ch)
+            return
+        self._preamble += ch
+        if len(self._preamble) > _MAX_PREAMBLE_CHARS:
+            self._abort("No se encontró el inicio del JSON en la respuesta.")
+
+    def _open(self, ch: str) -> None:
+        self._stack.append(_CLOSERS[ch])
+        if len(self._stack) == 1 and ch == "{":
+            self._expect_key = True
+
+    def _complete_root_field(self) -> None:
+        if self._pending_key is not None:
+            self.completed_fields.append(self._pending_key)
+            self._pending_key = None
+
+    def _feed_body(self, ch: str) -> None:
+        if self._in_string:
+            self._feed_string(ch)
+            return
+
+        depth = len(self._stack)
+        if ch == '"':
+            self._in_string = True
+            self._string_head = ""
+            self._capturing_key = depth == 1 and self._expect_key
+            self._key_buf = []
+        elif ch in "{[":
+            self._open(ch)
+        elif ch in "}]":
+            if not self._stack or self._stack[-1] != ch:
+                self._abort(f"Cierre '{ch}' inesperado tras {self.chars_received} caracteres recibidos.")
+            self._stack.pop()
+            if not self._stack:
+                self._complete_root_field()
+                self.done = True
+        elif ch == ",":
+            if depth == 1:
+                self._complete_root_field()
+                self._expect_key = self._stack[0] == "}"
+        elif ch == ":":
+            pass
+        elif ch not in _LITERAL_CHARS:
+            self._abort(f"Carácter '{ch}' no válido fuera de una cadena JSON.")
+
+    def _feed_string(self, ch: str) -> None:
+        if self._multiline:
+            # Dentro de un bloque multilínea todo es literal hasta el marcador de cierre.
+            self._tail = (self._tail + ch)[-len(MULTILINE_CLOSE):]
+            if self._tail == MULTILINE_CLOSE:
+                self._multiline = False
+            return
+        if self._escape:
+            self._escape = False
+        elif ch == "\\":
+            self._escape = True
+        elif ch == '"':
+            self._in_string = False
+            if self._capturing_key:
+                self._pending_key = "".join(self._key_buf)
+                self._expect_key = False
+                self._capturing_key = False
+            return
+        if self._capturing_key:
+            self._key_buf.append(ch)
+        if len(self._string_head) < len(MULTILINE_OPEN):
+            self._string_head += ch
+            if self._string_head == MULTILINE_OPEN:
+                self._multiline = True
+                self._tail = ""
+
+ProgressCallback = Callable[[IncrementalJSONScanner], Awaitable[None]]
+
+class JSONStreamObserver:
+    """
+    Observador que los clientes LLM alimentan con cada fragmento recibido.
+    Valida la estructura de forma incremental y, opcionalmente, reporta el
+    progreso cuando se completa un campo raíz o cada `report_every_chars`.
+    """
+
+    def __init__(
+        self,
+        expected_root: Optional[str] = None,
+        max_chars: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        report_every_chars: int = 2000,
+    ):
+        self.scanner = IncrementalJSONScanner(expected_root=expected_root, max_chars=max_chars)
+        self.on_progress = on_progress
+        self.report_every_chars = report_every_chars
+        self._parts: List[str] = []
+        self._last_report_chars = 0
+        self._last_report_fields = 0
+        self._reported_done = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def reset(self) -> None:
+        """Se invoca al inicio de cada intento (los reintentos reinician el stream)."""
+        self.scanner.reset()
+        self._parts = []
+        self._last_report_chars = 0
+        self._last_report_fields = 0
+        self._reported_done = False
+
+    async def on_chunk(self, chunk: str) -> None:
+        self._parts.append(chunk)
+        try:
+            self.scanner.feed(chunk)
+        except StreamAbortedError as e:
+            e.partial_text = self.text
+            raise
+
+        if self.on_progress is None:
+            return
+        new_fields = len(self.scanner.completed_fields) > self._last_report_fields
+        enough_chars = self.scanner.chars_received - self._last_report_chars >= self.report_every_chars
+        finished = self.scanner.done and not self._reported_done
+        if new_fields or enough_chars or finished:
+            self._reported_done = self.scanner.done
+            self._last_report_chars = self.scanner.chars_received
+            self._last_report_fields = len(self.scanner.completed_fields)
+            await self.on_progress(self.scanner)
@@ -0,0 +1,42 @@
+# ddi/llm/structured.py
+
+"""
+Salida estructurada nativa de los proveedores.
+
+El esquema Pydantic que declara cada etapa se traduce a JSON Schema y se envía
+al proveedor (response_json_schema en Gemini, response_format json_schema en
+OpenAI, format en Ollama), de modo que el modelo queda restringido a producir
+JSON válido con la forma esperada. Si un proveedor rechaza un esquema, la
+combinación proveedor/modelo/esquema se recuerda y se vuelve al modo texto.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Set, Tuple
+
+from ddi.schemas.adapters import get_adapter
+
+_UNSUPPORTED: Set[Tuple[str, str, str]] = set()
+
+# Menciones que identifican un 400 causado por el esquema o el formato de respuesta.
+_SCHEMA_REJECTION = re.compile(r"schema|response_format|responseformat|response_mime_type|json_object|structured", re.IGNORECASE)
+
+@lru_cache(maxsize=None)
+def json_schema_for(schema: Any) -> Dict[str, Any]:
+    """JSON Schema del tipo Pydantic, calculado una sola vez por esquema."""
+    return get_adapter(schema).json_schema()
+
+def schema_name(schema: Any) -> str:
+    """Nombre estable del esquema, válido como identificador de la API de OpenAI."""
+    name = getattr(schema, "__name__", None) or str(schema)
+    return re.sub(r"[^a-zA-Z0-9_-]", "_", name)[:64]
+
+def is_supported(provider: str, model: str, schema: Any) -> bool:
+    return (provider, model, schema_name(schema)) not in _UNSUPPORTED
+
+def mark_unsupported(provider: str, model: str, schema: Any) -> None:
+    _UNSUPPORTED.add((provider, model, schema_name(schema)))
+
+def is_schema_rejection(exc: BaseException) -> bool:
+    """True si el error del proveedor se debe al esquema o a `response_format`, y no a otra parte de la petición."""
+    return bool(_SCHEMA_REJECTION.search(str(exc)))
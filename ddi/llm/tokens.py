@@ -0,0 +1,43 @@
+# ddi/llm/tokens.py
+
+"""
+Estimación local de tokens antes de cada llamada.
+
+Si `tiktoken` está disponible se usa su codificación `o200k_base` como
+aproximación común a todos los proveedores; si no (o si no puede cargar sus
+tablas), se recurre a la heurística de ~4 caracteres por token. La estimación
+sirve para reservar presupuesto TPM, dimensionar `max_tokens` y rechazar
+entradas demasiado grandes antes de enviarlas.
+"""
+
+from __future__ import annotations
+import logging
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tokens adicionales por mensaje (rol y delimitadores del formato de chat).
+_PER_MESSAGE_OVERHEAD = 4
+
+@lru_cache()
+def _get_encoding() -> Optional[Any]:
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.info(f"tiktoken no disponible; se usará la heurística de caracteres. Detalle: {e}")
+        return None
+
+def estimate_tokens(text: str) -> int:
+    """Número estimado de tokens de un texto."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+def estimate_messages_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Número estimado de tokens de entrada de una lista de mensajes de chat."""
+    return sum(estimate_tokens(str(msg.get("content", ""))) + _PER_MESSAGE_OVERHEAD for msg in messages)
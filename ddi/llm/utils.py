@@ -3,72 +3,164 @@
 from __future__ import annotations
 import logging
 import json
-import re
 from typing import Tuple, List, Optional, Type, Any, Dict
 
-from pydantic import BaseModel, ValidationError, TypeAdapter
+from pydantic import BaseModel, ValidationError
 from google.genai import types
 
-from ddi.llm.providers import generate_response
-from ddi.schemas.item_schemas import RefinementPatch
+from ddi.core.config import settings
+from ddi.llm.providers import LLMResponse
+from ddi.llm.router import generate_response
+from ddi.llm.cache import get_response_cache, make_cache_key
+from ddi.llm import structured
+from ddi.llm.streaming import JSONStreamObserver, IncrementalJSONScanner, expected_root_for
+from ddi.llm.tokens import estimate_messages_tokens
+from ddi.llm.repair import repair_json
+from ddi.core import metrics
+from ddi.schemas.item_schemas import RefinementPatch, LLMCallUsage
 from ddi.schemas.models import Item
-from ddi.prompts import load_prompt
-from ddi.pipelines.utils.parsers import extract_json_block, build_prompt_messages, parse_payload
+from ddi.schemas.adapters import validate_llm_json
+from ddi.prompts import get_prompt
+from ddi.pipelines.utils.parsers import clean_llm_json
 
 logger = logging.getLogger(__name__)
 
 
-def _preprocess_multiline_blocks(raw_text: str) -> str:
+def build_llm_messages(prompt_name: str, user_input_content: str, prompt_version: Optional[str] = None) -> List[Dict[str, Any]]:
     """
-    Busca bloques de texto multilínea delimitados y los convierte en
-    strings JSON escapados válidos.
+    Toma la plantilla precompilada del registro de prompts y construye los
+    mensajes system+user para la llamada al LLM.
     """
-    multiline_pattern = re.compile(
-        r'"(.*?)"\s*:\s*"<<<TEXTO_MULTILINEA\n(.*?)\nTEXTO_MULTILINEA>>>"',
-        re.DOTALL
+    prompt = get_prompt(prompt_name, prompt_version)
+    if not prompt.content:
+        raise ValueError(f"No se pudo cargar una plantilla de prompt válida desde '{prompt_name}'.")
+
+    return prompt.build_messages(user_input_content)
+
+def check_input_budget(messages: List[Dict[str, Any]], max_input_tokens: Optional[int]) -> Tuple[int, Optional[RefinementPatch]]:
+    """
+    Estima los tokens de entrada y, si exceden `max_input_tokens`, devuelve el
+    error correspondiente para no enviar la llamada.
+    """
+    estimated_prompt_tokens = estimate_messages_tokens(messages)
+    if max_input_tokens and estimated_prompt_tokens > max_input_tokens:
+        error = RefinementPatch(
+            code="E907_LLM_INPUT_TOO_LARGE",
+            field_path="llm_request",
+            description=f"La entrada estimada ({estimated_prompt_tokens} tokens) excede el máximo permitido de {max_input_tokens}.",
+        )
+        return estimated_prompt_tokens, error
+    return estimated_prompt_tokens, None
+
+def record_llm_usage(
+    item: Item,
+    stage_name: str,
+    llm_response: LLMResponse,
+    estimated_prompt_tokens: Optional[int] = None,
+) -> int:
+    """
+    Registra el desglose de tokens de una llamada en el ítem y en las métricas
+    de la etapa. Devuelve el total de tokens de la llamada.
+    """
+    usage = llm_response.usage
+    call_usage = LLMCallUsage(
+        stage_name=stage_name,
+        model=llm_response.model,
+        prompt_tokens=usage.get("prompt", 0),
+        completion_tokens=usage.get("completion", 0),
+        cached_tokens=usage.get("cached", 0),
+        total_tokens=usage.get("total", 0),
+        estimated_prompt_tokens=estimated_prompt_tokens,
+        cache_hit=bool(llm_response.extra.get("cache_hit")),
     )
+    item.llm_usage.append(call_usage)
+    item.token_usage += call_usage.total_tokens
+    metrics.incr(f"tokens.{stage_name}.prompt", call_usage.prompt_tokens)
+    metrics.incr(f"tokens.{stage_name}.completion", call_usage.completion_tokens)
+    metrics.incr(f"tokens.{stage_name}.cached", call_usage.cached_tokens)
+    if not call_usage.cache_hit:
+        metrics.incr(f"llm_calls.{stage_name}")
+    return call_usage.total_tokens
+
+def share_llm_usage(lead: Item, items: List[Item], usage_mark: int) -> List[int]:
+    """
+    Reparte a partes iguales entre `items` el consumo que se registró en `lead`
+    a partir de `usage_mark` (una petición que empaquetó a varios ítems).
+    Devuelve los tokens asignados a cada ítem.
+    """
+    shared = lead.llm_usage[usage_mark:]
+    del lead.llm_usage[usage_mark:]
+    lead.token_usage -= sum(usage.total_tokens for usage in shared)
 
-    def escape_and_replace(match):
-        field_name = match.group(1)
-        content_to_escape = match.group(2)
-        escaped_content = json.dumps(content_to_escape)
-        return f'"{field_name}": {escaped_content}'
+    n = len(items)
+    assigned = [0] * n
+    fields = ("prompt_tokens", "completion_tokens", "cached_tokens", "total_tokens", "estimated_prompt_tokens")
+    for usage in shared:
+        for i, item in enumerate(items):
+            update = {}
+            for field in fields:
+                value = getattr(usage, field)
+                if value is not None:
+                    update[field] = value // n + (1 if i < value % n else 0)
+            part = usage.model_copy(update=update)
+            item.llm_usage.append(part)
+            item.token_usage += part.total_tokens
+            assigned[i] += part.total_tokens
+    return assigned
 
-    return multiline_pattern.sub(escape_and_replace, raw_text)
+def _output_mode(llm_response: LLMResponse) -> str:
+    """Modo de salida de la respuesta, para separar métricas de formato."""
+    return "structured" if llm_response.extra.get("structured_output") else "text"
 
-async def call_llm_and_parse_json_result(
-    prompt_name: str,
-    user_input_content: str,
+def _try_local_repair(
+    text: str,
+    expected_schema: Type[BaseModel],
+    llm_response: LLMResponse,
+    stage_name: str,
+    item: Item,
+) -> Optional[BaseModel]:
+    """
+    Intenta salvar una respuesta casi válida con la reparación local antes de
+    dar la llamada por perdida. Las salidas cortadas por `max_tokens` no se
+    reparan: cerrar sus llaves daría por buenos campos incompletos.
+    """
+    if llm_response.extra.get("truncated"):
+        return None
+    repaired_text = repair_json(text, expected_root_for(expected_schema))
+    if not repaired_text or repaired_text == text:
+        metrics.incr("llm_repair.not_applicable")
+        return None
+    try:
+        repaired_obj = validate_llm_json(expected_schema, repaired_text)
+    except (json.JSONDecodeError, ValidationError):
+        metrics.incr("llm_repair.failed")
+        return None
+    metrics.incr("llm_repair.saved")
+    metrics.incr(f"llm_repair.saved.{stage_name}")
+    logger.info(f"[{stage_name}] Item {item.temp_id}: respuesta reparada localmente; se evita una regeneración.")
+    return repaired_obj
+
+def parse_llm_response(
+    llm_response: LLMResponse,
     stage_name: str,
     item: Item,
-    ctx: Dict[str, Any],
     expected_schema: Optional[Type[BaseModel]] = None,
-    **kwargs,
+    estimated_prompt_tokens: Optional[int] = None,
 ) -> Tuple[Optional[BaseModel | str], Optional[List[RefinementPatch]], int]:
     """
-    Llama a un LLM, limpia la respuesta y valida el resultado contra un esquema Pydantic.
+    Contabiliza los tokens de una respuesta ya recibida, la limpia y la valida
+    contra un esquema Pydantic. Es común a los modos interactivo y batch.
     """
     total_tokens_used = 0
     response_text = ""
-    llm_response = None
     try:
-        prompt_data = load_prompt(prompt_name)
-        system_template = prompt_data.get("system_message", "") if isinstance(prompt_data, dict) else ""
-        user_prompt_template = prompt_data.get("content", "") if isinstance(prompt_data, dict) else prompt_data
-
-        if not user_prompt_template:
-            raise ValueError(f"No se pudo cargar una plantilla de prompt válida desde '{prompt_name}'.")
-
-        messages = build_prompt_messages(system_template, user_prompt_template, user_input_content)
-
-        llm_response = await generate_response(messages=messages, **kwargs)
-        tokens_used = llm_response.usage.get("total", 0)
-        total_tokens_used += tokens_used
-        item.token_usage += tokens_used
+        total_tokens_used += record_llm_usage(item, stage_name, llm_response, estimated_prompt_tokens)
 
         if not llm_response.success:
             error_msg = llm_response.error_message or "Error desconocido del proveedor LLM."
-            error = RefinementPatch(code="E905_LLM_CALL_FAILED", field_path="llm_response", description=error_msg)
+            # Un stream abortado por el validador incremental trae su propio código.
+            code = llm_response.extra.get("stream_abort_code", "E905_LLM_CALL_FAILED")
+            error = RefinementPatch(code=code, field_path="llm_response", description=error_msg)
             return None, [error], total_tokens_used
 
         response_text = llm_response.text
@@ -76,24 +168,29 @@ async def call_llm_and_parse_json_result(
             error = RefinementPatch(code="E904_LLM_NO_RESPONSE", field_path="llm_response", description="El LLM no devolvió contenido.")
             return None, [error], total_tokens_used
 
-        clean_text = extract_json_block(response_text)
-        processed_text = _preprocess_multiline_blocks(clean_text)
+        processed_text = clean_llm_json(response_text)
 
         if expected_schema is None:
             return processed_text, None, total_tokens_used
 
-        payload_data = json.loads(processed_text, strict=False)
-        validated_obj = TypeAdapter(expected_schema).validate_python(payload_data)
+        validated_obj = validate_llm_json(expected_schema, processed_text)
 
+        metrics.incr(f"llm_format.ok.{_output_mode(llm_response)}")
         return validated_obj, None, total_tokens_used
 
     except (json.JSONDecodeError, ValidationError) as e:
+        metrics.incr(f"llm_format.failures.{_output_mode(llm_response)}")
+        repaired_obj = _try_local_repair(processed_text, expected_schema, llm_response, stage_name, item)
+        if repaired_obj is not None:
+            return repaired_obj, None, total_tokens_used
         raw_response_text = llm_response.text if llm_response and hasattr(llm_response, 'text') else "No se pudo obtener la respuesta de texto."
         logger.error(
             f"[{stage_name}] Item {item.temp_id}: Falló la validación/parseo. Respuesta cruda: \n{raw_response_text}"
         )
         error_msg = f"Error parseando/validando respuesta: {e}. Respuesta: {response_text[:500]}..."
-        error = RefinementPatch(code="E904_LLM_RESPONSE_FORMAT_ERROR", field_path="llm_response", description=error_msg)
+        # Una salida cortada por max_tokens se distingue de un error de formato.
+        code = "E908_LLM_OUTPUT_TRUNCATED" if llm_response.extra.get("truncated") else "E904_LLM_RESPONSE_FORMAT_ERROR"
+        error = RefinementPatch(code=code, field_path="llm_response", description=error_msg)
         return None, [error], total_tokens_used
     except Exception as e:
         error_msg = f"Error inesperado en la utilidad LLM: {e}"
@@ -101,6 +198,120 @@ async def call_llm_and_parse_json_result(
         error = RefinementPatch(code="E999_UNEXPECTED_ERROR", field_path="llm_call", description=error_msg)
         return None, [error], total_tokens_used
 
+def _build_stream_observer(
+    stage_name: str,
+    item: Item,
+    ctx: Dict[str, Any],
+    expected_schema: Optional[Type[BaseModel]],
+    max_tokens: Optional[int],
+) -> JSONStreamObserver:
+    """
+    Crea el observador de streaming de una llamada: valida la estructura del
+    JSON a medida que llega y reporta el avance por el WebSocket del lote.
+    """
+    ws_manager = ctx.get("ws_manager")
+
+    async def report_progress(scanner: IncrementalJSONScanner) -> None:
+        if not ws_manager:
+            return
+        try:
+            await ws_manager.send_progress_update(item.batch_id, {
+                "event": "stream_progress",
+                "item_id": str(item.temp_id),
+                "stage": stage_name,
+                "chars_received": scanner.chars_received,
+                "completed_fields": list(scanner.completed_fields),
+                "is_stream_complete": scanner.done,
+            })
+        except Exception as e:
+            logger.warning(f"[{stage_name}] No se pudo enviar el progreso del stream para el ítem {item.temp_id}: {e}")
+
+    return JSONStreamObserver(
+        expected_root=expected_root_for(expected_schema),
+        # Aproximación de ~4 caracteres por token.
+        max_chars=max_tokens * 4 if max_tokens else None,
+        on_progress=report_progress,
+    )
+
+async def call_llm_and_parse_json_result(
+    prompt_name: str,
+    user_input_content: str,
+    stage_name: str,
+    item: Item,
+    ctx: Dict[str, Any],
+    expected_schema: Optional[Type[BaseModel]] = None,
+    **kwargs,
+) -> Tuple[Optional[BaseModel | str], Optional[List[RefinementPatch]], int]:
+    """
+    Llama a un LLM, limpia la respuesta y valida el resultado contra un esquema Pydantic.
+    Las respuestas válidas se guardan en la caché de respuestas, de modo que una
+    llamada idéntica posterior no vuelve a pagar latencia ni tokens.
+
+    Con `stream=True` (parámetro de etapa) la respuesta se recibe en streaming y
+    se valida de forma incremental; `stream_max_tokens` fija un presupuesto de
+    salida a partir del cual se aborta la llamada.
+
+    Si hay `expected_schema`, se pide al proveedor salida estructurada nativa
+    restringida a ese esquema (desactivable con `structured_output: false`);
+    la limpieza de texto se mantiene como respaldo.
+    """
+    cache = get_response_cache() if kwargs.pop("cache", True) else None
+    cache_key = None
+    stream = kwargs.pop("stream", False)
+    stream_max_tokens = kwargs.pop("stream_max_tokens", None)
+    max_input_tokens = kwargs.pop("max_input_tokens", settings.llm_max_input_tokens)
+    prompt_version = kwargs.pop("prompt_version", None) or settings.prompt_version
+    if kwargs.pop("structured_output", settings.llm_structured_output_enabled) and expected_schema is not None:
+        kwargs["response_schema"] = expected_schema
+    try:
+        messages = build_llm_messages(prompt_name, user_input_content, prompt_version)
+
+        estimated_prompt_tokens, budget_error = check_input_budget(messages, max_input_tokens)
+        if budget_error:
+            logger.error(f"[{stage_name}] Item {item.temp_id}: {budget_error.description}")
+            return None, [budget_error], 0
+
+        cached_text = None
+        if cache is not None:
+            cache_key = make_cache_key(
+                provider=kwargs.get("provider", settings.llm_provider),
+                model=kwargs.get("model", settings.llm_model),
+                temperature=kwargs.get("temperature", settings.llm_temperature),
+                prompt_version=prompt_version,
+                messages=messages,
+                max_tokens=kwargs.get("max_tokens", settings.llm_max_tokens),
+                response_schema=structured.schema_name(kwargs["response_schema"]) if kwargs.get("response_schema") else None,
+            )
+            cached_text = await cache.get(cache_key)
+
+        if cached_text is not None:
+            logger.debug(f"[{stage_name}] Item {item.temp_id}: respuesta servida desde la caché.")
+            llm_response = LLMResponse(
+                text=cached_text,
+                model=kwargs.get("model", settings.llm_model),
+                usage={},
+                extra={"cache_hit": True},
+            )
+            cache_key = None  # Ya está en caché; no hay que volver a escribirla.
+        else:
+            stream_observer = None
+            if stream:
+                stream_observer = _build_stream_observer(stage_name, item, ctx, expected_schema, stream_max_tokens)
+            llm_response = await generate_response(messages=messages, stream_observer=stream_observer, **kwargs)
+    except Exception as e:
+        error_msg = f"Error inesperado en la utilidad LLM: {e}"
+        logger.error(f"[{stage_name}] Item {item.temp_id}: {error_msg}", exc_info=True)
+        error = RefinementPatch(code="E999_UNEXPECTED_ERROR", field_path="llm_call", description=error_msg)
+        return None, [error], 0
+
+    result, errors, tokens_used = parse_llm_response(llm_response, stage_name, item, expected_schema, estimated_prompt_tokens)
+
+    # Solo se cachean respuestas que superaron la validación.
+    if cache_key and errors is None:
+        await cache.set(cache_key, llm_response.text, llm_response.model)
+
+    return result, errors, tokens_used
+
 async def call_llm_with_tools(
     prompt_name: str,
     user_input_content: str,
@@ -1,13 +1,20 @@
 # ddi/main.py
 
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Importaciones del proyecto DDI
 from ddi.db.session import engine
 from ddi.db import models
-from ddi.api.v1.items_router import router as items_router
+from ddi.api.v1.items_router import router as items_router, resume_interrupted_batches
+from ddi.api.v1.llm_status_router import router as llm_status_router
 from ddi.core.config import settings
+from ddi.llm.providers import init_client_pool, close_client_pool
+from ddi.llm.cache import close_response_cache
+from ddi.prompts import preload_prompts, watch_prompts
 
 # --- IMPORTACIÓN CRUCIAL POR EFECTO SECUNDARIO ---
 # Esta importación asegura que todas las etapas del pipeline se registren
@@ -17,9 +24,29 @@ from ddi.pipelines import builtins
 # Crea las tablas en la base de datos al iniciar la aplicación, si no existen.
 models.Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ciclo de vida de la aplicación: precarga los prompts y crea el pool de
+    clientes LLM al arrancar, y en modo "queue" encola los lotes que un proceso
+    anterior dejó a medias; al apagar, detiene la vigilancia de prompts y
+    cierra las sesiones HTTP y la caché de respuestas LLM.
+    """
+    preload_prompts()
+    prompt_watcher = asyncio.create_task(watch_prompts()) if settings.prompt_reload_interval_s > 0 else None
+    init_client_pool()
+    if settings.pipeline_resume_on_startup:
+        await resume_interrupted_batches()
+    yield
+    if prompt_watcher is not None:
+        prompt_watcher.cancel()
+    await close_client_pool()
+    close_response_cache()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # Configura los orígenes permitidos para CORS
@@ -34,6 +61,8 @@ if settings.BACKEND_CORS_ORIGINS:
 
 # Incluye todas las rutas (endpoints) definidas en el router de ítems
 app.include_router(items_router, prefix=settings.API_V1_STR)
+# Estado de la capa LLM (circuit breakers, presupuesto de reintentos, limitadores)
+app.include_router(llm_status_router, prefix=settings.API_V1_STR)
 
 @app.get("/")
 def read_root():
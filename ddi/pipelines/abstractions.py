@@ -2,23 +2,117 @@
 
 from __future__ import annotations
 import asyncio
-from typing import List, Dict, Any, Optional
+import json
+from typing import List, Dict, Any, Optional, Set, Tuple
 from abc import ABC, abstractmethod
-from pydantic import TypeAdapter
+from pydantic import TypeAdapter, ValidationError
 
+from ddi.core.config import settings
 from ddi.core.log import logger
+from ddi.core import metrics
 from ddi.schemas.models import Item
 # Asumimos que la capa de comunicación del LLM existirá en ddi/llm/utils.py
-from ddi.llm.utils import call_llm_and_parse_json_result, call_llm_with_tools
+from ddi.llm.utils import (
+    call_llm_and_parse_json_result, call_llm_with_tools, build_llm_messages, parse_llm_response, check_input_budget,
+    share_llm_usage,
+)
+from ddi.llm.batch import BatchRequest, run_batch
+from ddi.llm.providers import LLMResponse
+from ddi.pipelines.utils.serializers import serialize_stage_input, project_model
+from ddi.pipelines.utils.stage_helpers import paths_touching, add_process_log_entry
+from ddi.pipelines.utils.verdict_cache import verdict_key, lookup_verdicts, store_verdict
+from ddi.prompts import get_prompt
+from ddi.schemas.adapters import get_adapter
+
+# Se antepone a la entrada empaquetada para que el modelo conteste por ítem.
+PACKED_INPUT_INSTRUCTIONS = (
+    "La entrada contiene varios ítems en 'items'. Evalúa cada 'entrada' de forma independiente, "
+    "exactamente como si fuera la única entrada recibida. Responde con un único objeto JSON cuyas "
+    "claves sean los 'temp_id' y cuyo valor sea, para cada uno, la respuesta que darías a esa entrada."
+)
 
 class BaseStage(ABC):
     """Clase base abstracta para todas las etapas del pipeline."""
+    # Campos de primer nivel del payload que necesita el prompt de la etapa
+    # (None = todos). Ver `_serialize_input`.
+    payload_fields: Optional[Set[str]] = None
+    # Dependencias de la etapa dentro del ciclo de QA: rutas del payload cuyo
+    # cambio invalida su último resultado (None = cualquier cambio), etapas
+    # cuyos cambios no le afectan y si sabe re-validar solo lo modificado.
+    depends_on: Optional[Tuple[str, ...]] = None
+    ignore_changes_from: Tuple[str, ...] = ()
+    supports_partial_input: bool = False
+    # Si el resultado depende solo de la entrada y puede reutilizarse desde
+    # la caché de veredictos (ver ddi/pipelines/utils/verdict_cache.py).
+    cache_verdicts: bool = False
+    pydantic_schema: Any = None
+
     def __init__(self, stage_name: str, params: Dict[str, Any], ctx: Dict[str, Any]):
         self.stage_name = stage_name
         self.params = params
         self.ctx = ctx
         self.logger = logger
 
+    def skip_reason(self, item: Item) -> Optional[str]:
+        """
+        Motivo por el que la etapa no tiene nada que hacer con el ítem, o None
+        si debe ejecutarse. Se consulta antes de preparar la entrada o cargar
+        el prompt, de modo que un salto no cuesta ninguna llamada.
+        """
+        return None
+
+    def _partition_skipped(self, items: List[Item]) -> List[Item]:
+        """Registra los ítems que la etapa salta y devuelve los que sí debe procesar."""
+        to_process = []
+        for item in items:
+            reason = self.skip_reason(item)
+            if reason is None:
+                to_process.append(item)
+                continue
+            metrics.incr(f"stage_skipped.{self.stage_name}")
+            add_process_log_entry(item, self.stage_name, item.status, f"Omitida. {reason}", tokens_used=0)
+        return to_process
+
+    def _serialize_input(self, data: Any, full: Any = None) -> str:
+        """Serializa la entrada de forma compacta y registra los tokens ahorrados."""
+        return serialize_stage_input(self.stage_name, data, full)
+
+    def _project_payload(self, item: Item) -> Any:
+        """El payload del ítem reducido a `payload_fields`, sin nulos."""
+        return project_model(item.payload, self.payload_fields)
+
+    def _verdict_cache_key(self, user_input: str) -> Optional[str]:
+        """Clave de caché de la entrada, o None si la etapa no usa la caché de veredictos."""
+        enabled = self.params.get("verdict_cache", settings.verdict_cache_enabled)
+        if not (self.cache_verdicts and enabled and user_input and self.ctx.get("db_session")):
+            return None
+        prompt = get_prompt(self.params["prompt"], self.params.get("prompt_version"))
+        return verdict_key(self.stage_name, prompt, user_input)
+
+    async def _cached_verdicts(self, keys: List[Optional[str]]) -> Dict[str, Any]:
+        return await lookup_verdicts(self.stage_name, self.pydantic_schema, keys)
+
+    async def _store_verdict(self, key: Optional[str], verdict: Any) -> None:
+        if key is None or verdict is None:
+            return
+        prompt = get_prompt(self.params["prompt"], self.params.get("prompt_version"))
+        await store_verdict(self.stage_name, prompt, key, self.pydantic_schema, verdict)
+
+    async def _process_cached_verdict(self, item: Item, verdict: Any) -> None:
+        """Procesa un veredicto recuperado de la caché como si viniera del LLM, sin tokens."""
+        self.logger.info(f"Etapa '{self.stage_name}': veredicto reutilizado desde la caché para el ítem {item.temp_id}.")
+        await self._process_llm_result(item, verdict, 0)
+
+    def relevant_changes(self, item: Item) -> Set[str]:
+        """Rutas modificadas del ítem que invalidan el último resultado de la etapa."""
+        changed = {
+            path for path, origin in item.dirty_fields.items()
+            if origin not in self.ignore_changes_from
+        }
+        if self.depends_on is None:
+            return changed
+        return paths_touching(changed, self.depends_on)
+
     @abstractmethod
     async def execute(self, items: List[Item]) -> List[Item]:
         """
@@ -33,7 +127,9 @@ class LLMStage(BaseStage):
     Abstracción para etapas que realizan una única llamada al LLM por ítem.
     Maneja la orquestación de preparar-llamar-validar-procesar.
     """
-    pydantic_schema: Any = None
+    # Si la entrada de la etapa es un JSON autocontenido por ítem y puede
+    # empaquetarse con la de otros ítems en una sola petición (ver `_execute_packed`).
+    packable: bool = False
 
     @abstractmethod
     def _prepare_llm_input(self, item: Item) -> str:
@@ -47,12 +143,27 @@ class LLMStage(BaseStage):
 
     async def _execute_single_item(self, item: Item) -> Item:
         """Orquesta el flujo para un solo ítem."""
+        if not self._partition_skipped([item]):
+            return item
+
         prompt_name = self.params.get("prompt")
         if not prompt_name:
             raise ValueError(f"La etapa '{self.stage_name}' no tiene un 'prompt' válido.")
 
         user_input = self._prepare_llm_input(item)
+        cache_key = self._verdict_cache_key(user_input)
+        cached = await self._cached_verdicts([cache_key])
+        if cache_key in cached:
+            await self._process_cached_verdict(item, cached[cache_key])
+            return item
+
+        await self._call_and_process(prompt_name, item, user_input, cache_key)
 
+        # Devolvemos explícitamente el ítem (potencialmente modificado)
+        return item
+
+    async def _call_and_process(self, prompt_name: str, item: Item, user_input: str, cache_key: Optional[str]) -> None:
+        """Una llamada al LLM para un ítem, con su validación y procesamiento."""
         validated_obj, errors, tokens_used = await call_llm_and_parse_json_result(
             prompt_name=prompt_name,
             user_input_content=user_input,
@@ -62,14 +173,184 @@ class LLMStage(BaseStage):
             expected_schema=self.pydantic_schema,
             **self.params
         )
+        if not errors:
+            await self._store_verdict(cache_key, validated_obj)
 
         result_to_process = errors if errors else validated_obj
         await self._process_llm_result(item, result_to_process, tokens_used)
 
-        # Devolvemos explícitamente el ítem (potencialmente modificado)
-        return item
+    def _pack_size(self) -> int:
+        """Ítems por grupo, acotado para que la salida de todo el grupo quepa en `llm_pack_max_tokens`."""
+        if not self.packable:
+            return 1
+        size = max(1, int(self.params.get("pack_size", settings.llm_pack_size)))
+        return max(1, min(size, self._pack_max_tokens() // self._item_max_tokens()))
+
+    def _item_max_tokens(self) -> int:
+        return max(1, int(self.params.get("max_tokens", settings.llm_max_tokens)))
+
+    def _pack_max_tokens(self) -> int:
+        return int(self.params.get("pack_max_tokens", settings.llm_pack_max_tokens))
+
+    async def _execute_packed(self, items: List[Item]) -> List[Item]:
+        """
+        Modo empaquetado: agrupa hasta `pack_size` ítems por petición, de modo
+        que el prompt de sistema se envía una vez por grupo y no por ítem.
+        """
+        prompt_name = self.params.get("prompt")
+        if not prompt_name:
+            raise ValueError(f"La etapa '{self.stage_name}' no tiene un 'prompt' válido.")
+
+        to_process = self._partition_skipped(items)
+        user_inputs = {item.temp_id: self._prepare_llm_input(item) for item in to_process}
+        cache_keys = {item.temp_id: self._verdict_cache_key(user_inputs[item.temp_id]) for item in to_process}
+        cached = await self._cached_verdicts(list(cache_keys.values()))
+
+        pending: List[Tuple[Item, str, Optional[str]]] = []
+        for item in to_process:
+            user_input, cache_key = user_inputs[item.temp_id], cache_keys[item.temp_id]
+            if cache_key in cached:
+                await self._process_cached_verdict(item, cached[cache_key])
+            else:
+                pending.append((item, user_input, cache_key))
+
+        size = self._pack_size()
+        groups = [pending[i:i + size] for i in range(0, len(pending), size)]
+        await asyncio.gather(*[self._execute_pack(prompt_name, group) for group in groups])
+        return items
+
+    def _pack_input(self, group: List[Tuple[Item, str, Optional[str]]]) -> str:
+        """Une las entradas JSON ya serializadas de un grupo, identificadas por `temp_id`."""
+        entries = ",".join(
+            f'{{"temp_id":"{item.temp_id}","entrada":{user_input}}}' for item, user_input, _ in group
+        )
+        instructions = json.dumps(PACKED_INPUT_INSTRUCTIONS, ensure_ascii=False)
+        return f'{{"instrucciones_lote":{instructions},"items":[{entries}]}}'
+
+    async def _execute_pack(self, prompt_name: str, group: List[Tuple[Item, str, Optional[str]]]) -> None:
+        """
+        Una petición para todo el grupo. Las entradas de la respuesta que faltan
+        o no validan se resuelven con llamadas individuales para esos ítems.
+        """
+        if len(group) == 1:
+            item, user_input, cache_key = group[0]
+            await self._call_and_process(prompt_name, item, user_input, cache_key)
+            return
+
+        lead = group[0][0]
+        usage_mark = len(lead.llm_usage)
+        # Salida en texto: el esquema empaquetado (un objeto por temp_id) no
+        # es expresable de forma estricta en todos los proveedores.
+        params = {**self.params, "structured_output": False, "stream": False}
+        params.pop("pack_size", None)
+        params.pop("pack_max_tokens", None)
+        # Una respuesta por ítem: el presupuesto de salida crece con el grupo.
+        params["max_tokens"] = min(self._item_max_tokens() * len(group), self._pack_max_tokens())
+        packed, errors, _ = await call_llm_and_parse_json_result(
+            prompt_name=prompt_name,
+            user_input_content=self._pack_input(group),
+            stage_name=self.stage_name,
+            item=lead,
+            ctx=self.ctx,
+            expected_schema=Dict[str, Any],
+            **params
+        )
+        tokens_per_item = share_llm_usage(lead, [item for item, _, _ in group], usage_mark)
+        metrics.incr(f"llm_pack.calls.{self.stage_name}")
+        metrics.incr(f"llm_pack.items.{self.stage_name}", len(group))
+
+        results = packed if not errors and isinstance(packed, dict) else {}
+        adapter = get_adapter(self.pydantic_schema)
+        fallback: List[Tuple[Item, str, Optional[str]]] = []
+        for (item, user_input, cache_key), tokens_used in zip(group, tokens_per_item):
+            if str(item.temp_id) not in results:
+                fallback.append((item, user_input, cache_key))
+                continue
+            try:
+                verdict = adapter.validate_python(results[str(item.temp_id)])
+            except ValidationError:
+                fallback.append((item, user_input, cache_key))
+                continue
+            await self._store_verdict(cache_key, verdict)
+            await self._process_llm_result(item, verdict, tokens_used)
+
+        if fallback:
+            metrics.incr(f"llm_pack.fallbacks.{self.stage_name}", len(fallback))
+            self.logger.warning(
+                f"Etapa '{self.stage_name}': {len(fallback)} de {len(group)} ítems sin respuesta válida en la "
+                f"petición empaquetada; se reintentan por separado."
+            )
+            await asyncio.gather(*[
+                self._call_and_process(prompt_name, item, user_input, cache_key)
+                for item, user_input, cache_key in fallback
+            ])
+
+    async def _execute_bulk(self, items: List[Item]) -> List[Item]:
+        """
+        Modo masivo: envía las peticiones de todos los ítems como un único
+        trabajo batch del proveedor y procesa cada resultado al terminar.
+        """
+        prompt_name = self.params.get("prompt")
+        if not prompt_name:
+            raise ValueError(f"La etapa '{self.stage_name}' no tiene un 'prompt' válido.")
+
+        model = self.params.get("model", settings.llm_model)
+        max_input_tokens = self.params.get("max_input_tokens", settings.llm_max_input_tokens)
+        requests: List[BatchRequest] = []
+        batched_items: List[Item] = []
+        estimates: Dict[str, int] = {}
+        cache_keys: Dict[str, Optional[str]] = {}
+        to_process = self._partition_skipped(items)
+        user_inputs = {str(item.temp_id): self._prepare_llm_input(item) for item in to_process}
+        for item in to_process:
+            cache_keys[str(item.temp_id)] = self._verdict_cache_key(user_inputs[str(item.temp_id)])
+        cached = await self._cached_verdicts(list(cache_keys.values()))
+
+        for item in to_process:
+            user_input = user_inputs[str(item.temp_id)]
+            cache_key = cache_keys[str(item.temp_id)]
+            if cache_key in cached:
+                await self._process_cached_verdict(item, cached[cache_key])
+                continue
+            messages = build_llm_messages(prompt_name, user_input, self.params.get("prompt_version"))
+            estimated_prompt_tokens, budget_error = check_input_budget(messages, max_input_tokens)
+            if budget_error:
+                await self._process_llm_result(item, [budget_error], 0)
+                continue
+            estimates[str(item.temp_id)] = estimated_prompt_tokens
+            requests.append(BatchRequest(
+                custom_id=str(item.temp_id),
+                messages=messages,
+                model=model,
+                temperature=self.params.get("temperature", settings.llm_temperature),
+                max_tokens=self.params.get("max_tokens", settings.llm_max_tokens),
+                response_schema=self.pydantic_schema if self.params.get("structured_output", settings.llm_structured_output_enabled) else None,
+            ))
+            batched_items.append(item)
+
+        if requests:
+            self.logger.info(f"Etapa '{self.stage_name}': enviando {len(requests)} peticiones en modo batch.")
+            responses = await run_batch(requests, provider=self.params.get("provider"))
+            for item in batched_items:
+                llm_response = responses.get(str(item.temp_id)) or LLMResponse(
+                    text="", model=model, usage={}, success=False,
+                    error_message="El trabajo batch no devolvió resultado para este ítem.",
+                )
+                validated_obj, errors, tokens_used = parse_llm_response(
+                    llm_response, self.stage_name, item, self.pydantic_schema, estimates.get(str(item.temp_id))
+                )
+                if not errors:
+                    await self._store_verdict(cache_keys[str(item.temp_id)], validated_obj)
+                result_to_process = errors if errors else validated_obj
+                await self._process_llm_result(item, result_to_process, tokens_used)
+
+        return items
 
     async def execute(self, items: List[Item]) -> List[Item]:
+        if self.ctx.get("execution_mode") == "bulk":
+            return await self._execute_bulk(items)
+        if self._pack_size() > 1 and len(items) > 1:
+            return await self._execute_packed(items)
         tasks = [self._execute_single_item(item) for item in items]
         # Recolectamos los ítems procesados para asegurar que los cambios se propaguen
         processed_items = await asyncio.gather(*tasks)
@@ -77,7 +358,6 @@ class LLMStage(BaseStage):
 
 class BaseAgentStage(BaseStage):
     """Abstracción para etapas que operan como agentes con herramientas (ej. búsqueda web)."""
-    pydantic_schema: Any = None
     tools: List[Any] = []
 
     @abstractmethod
@@ -92,11 +372,19 @@ class BaseAgentStage(BaseStage):
 
     async def _execute_single_item(self, item: Item) -> Item:
         """Orquesta el flujo de agente para un solo ítem."""
+        if not self._partition_skipped([item]):
+            return item
+
         prompt_name = self.params.get("prompt")
         if not prompt_name:
             raise ValueError(f"La etapa de agente '{self.stage_name}' no tiene un 'prompt' válido.")
 
         user_input = self._prepare_llm_input(item)
+        cache_key = self._verdict_cache_key(user_input)
+        cached = await self._cached_verdicts([cache_key])
+        if cache_key in cached:
+            await self._process_cached_verdict(item, cached[cache_key])
+            return item
 
         validated_obj, errors, tokens_used = await call_llm_with_tools(
             prompt_name=prompt_name,
@@ -108,6 +396,8 @@ class BaseAgentStage(BaseStage):
             tools=self.tools,
             **self.params
         )
+        if not errors:
+            await self._store_verdict(cache_key, validated_obj)
 
         result_to_process = errors if errors else validated_obj
         await self._process_llm_result(item, result_to_process, tokens_used)
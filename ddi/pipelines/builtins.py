@@ -6,6 +6,7 @@ from .stages import (
     analize_construct,
     architect_item,
     correct_style,
+    deduplicate_items,
     finalize_item,
     persist,
     refine_item,
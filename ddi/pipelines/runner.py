@@ -2,14 +2,18 @@
 
 import yaml
 import asyncio
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from collections import Counter
 
 from ddi.schemas.models import Item
+from ddi.schemas.item_schemas import RefinementPatch
 from ddi.schemas.enums import ItemStatus
+from ddi.core.config import settings
 from ddi.core.log import logger
+from ddi.core import metrics
 from ddi.pipelines.abstractions import BaseStage
-from ddi.pipelines.utils.stage_helpers import initialize_items_for_pipeline, add_process_log_entry, apply_patches
+from ddi.pipelines.utils.stage_helpers import initialize_items_for_pipeline, add_process_log_entry, apply_patches, path_overlaps
 from ddi.pipelines.registry import get_full_registry
 from ddi.db import crud
 
@@ -52,81 +56,415 @@ async def _notificar_progreso(
     except Exception as e:
         logger.warning(f"No se pudo enviar la actualización de progreso por WebSocket para el lote {batch_id}: {e}")
 
-async def _run_qa_cycle(items_to_validate: List[Item], qa_config: Dict, ctx: Dict[str, Any], stage_registry) -> List[Item]:
+def _step_key(stage_config: Dict) -> str:
+    """Nombre con que una entrada del pipeline queda registrada en el checkpoint de los ítems."""
+    return stage_config.get("name") or "qa_cycle"
+
+def _mark_completed(items: List[Item], step_key: str) -> None:
+    """Anota en el checkpoint de los ítems que siguen vivos que completaron la entrada `step_key`."""
+    for item in items:
+        if item.status == ItemStatus.FATAL:
+            continue
+        completed = item.checkpoint.setdefault("completed_stages", [])
+        if step_key not in completed:
+            completed.append(step_key)
+
+def _save_checkpoint(ctx: Dict[str, Any], items: List[Item]) -> None:
     """
-    Ejecuta el ciclo de validación y refinamiento para un conjunto de ítems.
+    Persiste el progreso de los ítems a mitad de una entrada (p. ej., tras cada
+    iteración de QA). Es best-effort: un fallo de la BD no interrumpe el pipeline.
     """
-    MAX_RETRIES = qa_config.get("max_retries", 3)
+    db = ctx.get("db_session")
+    if not db or not items:
+        return
+    try:
+        crud.save_items(db=db, items=items)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el checkpoint de {len(items)} ítems: {e}")
+        # La sesión es compartida: se deja utilizable para los guardados siguientes.
+        db.rollback()
+
+def _build_qa_stages(stage_configs: List[Dict], ctx: Dict[str, Any], stage_registry) -> List[BaseStage]:
+    """Instancia las etapas (validadores o refinadores) declaradas en el ciclo de QA."""
+    stages = []
+    for stage_config in stage_configs:
+        stage_class = stage_registry.get(stage_config["name"])
+        stages.append(stage_class(stage_config["name"], stage_config.get("params", {}), ctx))
+    return stages
+
+def _plan_validators(item: Item, validators: List[BaseStage]) -> Tuple[List[BaseStage], List[RefinementPatch]]:
+    """
+    Decide qué validadores deben volver a auditar el ítem según los campos que
+    cambiaron desde su última ejecución (`item.dirty_fields`):
 
-    processed_items_map = {item.temp_id: item for item in items_to_validate}
+    - sin ejecución previa: se ejecuta completo;
+    - sin cambios en sus dependencias: se omite y sus hallazgos siguen vigentes;
+    - con cambios y `supports_partial_input`: se ejecuta solo sobre las rutas
+      modificadas y se conservan sus hallazgos sobre las demás;
+    - con cambios en otro caso: se ejecuta completo.
 
-    for item_id, item in processed_items_map.items():
-        logger.info(f"Iniciando ciclo de QA para el ítem {item.temp_id}.")
-        for i in range(MAX_RETRIES):
-            if item.status == ItemStatus.FATAL:
-                break
+    Devuelve los validadores a ejecutar y los hallazgos arrastrados.
+    """
+    previous = item.temp_data.setdefault("qa_findings", {})
+    focus = item.temp_data["qa_focus"] = {}
+    kept = item.temp_data["qa_kept"] = {}
+    to_run: List[BaseStage] = []
+    carried: List[RefinementPatch] = []
+
+    for validator in validators:
+        name = validator.stage_name
+        if name not in previous:
+            to_run.append(validator)
+            continue
+
+        # Las correcciones con refined_value ya se aplicaron; solo se arrastran diagnósticos.
+        findings = [p for p in previous[name] if p.refined_value is None]
+        changed = validator.relevant_changes(item)
+        if not changed:
+            carried.extend(findings)
+            metrics.incr(f"qa.validator_skipped.{name}")
+            continue
+
+        if validator.supports_partial_input:
+            focus[name] = changed
+            kept[name] = [p for p in findings if not any(path_overlaps(p.field_path, path) for path in changed)]
+            carried.extend(kept[name])
+            metrics.incr(f"qa.validator_partial.{name}")
+        to_run.append(validator)
+
+    item.dirty_fields.clear()
+    return to_run, carried
+
+def _merge_partial_findings(item: Item) -> None:
+    """Tras una re-validación parcial, suma a los hallazgos nuevos los que se conservaron."""
+    findings = item.temp_data.get("qa_findings", {})
+    for name, kept in item.temp_data.pop("qa_kept", {}).items():
+        findings[name] = kept + findings.get(name, [])
+    item.temp_data.pop("qa_focus", None)
+
+def _resolve_qa_iteration(
+    item: Item,
+    log_len_before_validation: int,
+    iteration: int,
+    carried: Optional[List[RefinementPatch]] = None,
+) -> bool:
+    """
+    Consolida los hallazgos producidos por los validadores en una iteración
+    (más los arrastrados de validadores que no hizo falta re-ejecutar),
+    aplica las correcciones de estilo y decide si el ítem queda aprobado.
+    """
+    _merge_partial_findings(item)
+    new_patches = item.refinement_log[log_len_before_validation:]
+
+    # Separar hallazgos (sin refined_value) de correcciones de estilo (con refined_value)
+    findings_to_address = [p for p in new_patches if p.refined_value is None] + list(carried or [])
+    style_corrections = [p for p in new_patches if p.refined_value is not None]
 
-            log_len_before_validation = len(item.refinement_log)
+    # Aplicar correcciones de estilo inmediatamente
+    if style_corrections:
+        apply_patches(item, style_corrections, origin="correct_style")
 
-            # 1. Ejecutar todos los validadores en paralelo
-            validation_tasks = []
-            for validator_config in qa_config.get("validators", []):
-                stage_class = stage_registry.get(validator_config["name"])
-                stage_instance = stage_class(validator_config["name"], validator_config.get("params", {}), ctx)
-                validation_tasks.append(stage_instance.execute([item]))
+    # Decidir si el ítem está aprobado
+    if not findings_to_address:
+        item.status = ItemStatus.VALIDATION_COMPLETE
+        logger.info(f"Ítem {item.temp_id} APROBADO en el ciclo de QA {iteration+1}.")
+        return True
 
-            await asyncio.gather(*validation_tasks)
+    logger.info(f"Ítem {item.temp_id} requiere refinamiento. {len(findings_to_address)} hallazgos encontrados.")
+    return False
 
-            # 2. Consolidar hallazgos y parches de esta iteración
-            new_patches = item.refinement_log[log_len_before_validation:]
+def _finish_qa(item: Item, max_retries: int, iterations: int, started: float) -> int:
+    """
+    Cierra el ciclo de QA de un ítem: lo marca como FATAL si no aprobó tras
+    agotar los intentos y registra en su process_log cuánto tardó su ciclo.
+    Devuelve la duración en milisegundos.
+    """
+    duration_ms = int((time.perf_counter() - started) * 1000)
+    metrics.incr("qa.items")
+    metrics.incr("qa.item_ms", duration_ms)
+    if item.status != ItemStatus.VALIDATION_COMPLETE:
+        item.status = ItemStatus.FATAL
+        item.status_comment = f"El ítem no pasó la validación después de {max_retries} intentos."
+        add_process_log_entry(item, "qa_cycle", item.status, item.status_comment, duration_ms=duration_ms)
+    else:
+        comment = f"Aprobado tras {iterations} iteración(es) de QA."
+        add_process_log_entry(item, "qa_cycle", item.status, comment, duration_ms=duration_ms)
+    return duration_ms
+
+def _log_qa_timings(durations: List[int], wall_ms: int) -> None:
+    """Resume el tiempo del ciclo de QA: suma de los ciclos por ítem frente al tiempo real."""
+    if not durations:
+        return
+    total_ms = sum(durations)
+    logger.info(
+        f"Ciclo de QA de {len(durations)} ítems: {wall_ms} ms reales, {total_ms} ms sumando los ciclos por ítem "
+        f"(máx. {max(durations)} ms, aceleración {total_ms / max(wall_ms, 1):.1f}x)."
+    )
 
-            # Separar hallazgos (sin refined_value) de correcciones de estilo (con refined_value)
-            findings_to_address = [p for p in new_patches if p.refined_value is None]
-            style_corrections = [p for p in new_patches if p.refined_value is not None]
+async def _run_item_qa(item: Item, qa_config: Dict, ctx: Dict[str, Any], stage_registry) -> int:
+    """
+    Ciclo de validación y refinamiento de un ítem, con su propio contador de
+    intentos. Un ítem reanudado continúa desde las iteraciones registradas en
+    su checkpoint.
+    """
+    max_retries = qa_config.get("max_retries", 3)
+    started = time.perf_counter()
+    iterations = item.checkpoint.get("qa_iterations", 0)
+
+    logger.info(f"Iniciando ciclo de QA para el ítem {item.temp_id} (iteraciones previas: {iterations}).")
+    item.temp_data.pop("qa_findings", None)
+    for i in range(iterations, max_retries):
+        if item.status == ItemStatus.FATAL:
+            break
+        iterations = i + 1
+
+        log_len_before_validation = len(item.refinement_log)
+
+        # 1. Ejecutar en paralelo los validadores afectados por los últimos cambios
+        validators = _build_qa_stages(qa_config.get("validators", []), ctx, stage_registry)
+        to_run, carried = _plan_validators(item, validators)
+        await asyncio.gather(*[validator.execute([item]) for validator in to_run])
+
+        # 2. Consolidar hallazgos, aplicar estilo y decidir aprobación
+        if _resolve_qa_iteration(item, log_len_before_validation, i, carried):
+            break
+
+        # 3. Ejecutar Refinadores (si hay hallazgos de contenido)
+        refiners = _build_qa_stages(qa_config.get("refiners", []), ctx, stage_registry)
+        await asyncio.gather(*[refiner.execute([item]) for refiner in refiners])
+        logger.info(f"Ítem {item.temp_id} completó el ciclo de refinamiento {i+1}.")
+        item.checkpoint["qa_iterations"] = i + 1
+        _save_checkpoint(ctx, [item])
+
+    return _finish_qa(item, max_retries, iterations, started)
+
+def _qa_semaphore(qa_config: Dict) -> asyncio.Semaphore:
+    """Límite de ciclos de QA simultáneos: `max_concurrency` del ciclo o `settings.qa_max_concurrency`."""
+    return asyncio.Semaphore(max(1, qa_config.get("max_concurrency", settings.qa_max_concurrency)))
+
+async def _run_qa_cycle(
+    items_to_validate: List[Item],
+    qa_config: Dict,
+    ctx: Dict[str, Any],
+    stage_registry,
+    semaphore: Optional[asyncio.Semaphore] = None,
+) -> List[Item]:
+    """
+    Ejecuta el ciclo de validación y refinamiento para un conjunto de ítems.
+    Los ciclos de los distintos ítems corren a la vez, como mucho
+    `max_concurrency` (parámetro del ciclo o `settings.qa_max_concurrency`).
+    En modo streaming cada ítem llega por separado, así que el semáforo se
+    crea una vez por ejecución y se comparte entre llamadas.
+    """
+    semaphore = semaphore or _qa_semaphore(qa_config)
 
-            # 3. Aplicar correcciones de estilo inmediatamente
-            if style_corrections:
-                item = apply_patches(item, style_corrections)
+    async def bounded(item: Item) -> int:
+        async with semaphore:
+            return await _run_item_qa(item, qa_config, ctx, stage_registry)
 
-            # 4. Decidir si el ítem está aprobado
-            if not findings_to_address:
-                item.status = ItemStatus.VALIDATION_COMPLETE
-                logger.info(f"Ítem {item.temp_id} APROBADO en el ciclo de QA {i+1}.")
-                break
+    started = time.perf_counter()
+    durations = await asyncio.gather(*[bounded(item) for item in items_to_validate])
+    _log_qa_timings(list(durations), int((time.perf_counter() - started) * 1000))
+    return items_to_validate
 
-            # 5. Ejecutar Refinadores (si hay hallazgos de contenido)
-            logger.info(f"Ítem {item.temp_id} requiere refinamiento. {len(findings_to_address)} hallazgos encontrados.")
-            refiner_tasks = []
-            for refiner_config in qa_config.get("refiners", []):
-                stage_class = stage_registry.get(refiner_config["name"])
-                stage_instance = stage_class(refiner_config["name"], refiner_config.get("params", {}), ctx)
-                refiner_tasks.append(stage_instance.execute([item]))
+def _qa_uses_packing(qa_config: Dict) -> bool:
+    """True si algún validador del ciclo agrupa varios ítems por petición."""
+    return any(
+        stage_config.get("params", {}).get("pack_size", settings.llm_pack_size) > 1
+        for stage_config in qa_config.get("validators", [])
+    )
 
-            await asyncio.gather(*refiner_tasks)
-            logger.info(f"Ítem {item.temp_id} completó el ciclo de refinamiento {i+1}.")
+async def _run_qa_cycle_bulk(items_to_validate: List[Item], qa_config: Dict, ctx: Dict[str, Any], stage_registry) -> List[Item]:
+    """
+    Variante del ciclo de QA para el modo masivo: en cada iteración, cada
+    validador y refinador procesa todos los ítems pendientes a la vez, de modo
+    que sus peticiones viajan en un único trabajo batch. También se usa en modo
+    interactivo cuando algún validador empaqueta varios ítems por petición.
 
+    Cada ítem lleva su propio contador de iteraciones, que parte del de su
+    checkpoint si el lote se está reanudando.
+    """
+    MAX_RETRIES = qa_config.get("max_retries", 3)
+    pending = list(items_to_validate)
+    for item in pending:
+        item.temp_data.pop("qa_findings", None)
+    started = time.perf_counter()
+    iterations: Dict[Any, int] = {item.temp_id: item.checkpoint.get("qa_iterations", 0) for item in pending}
+    durations: List[int] = []
+
+    for i in range(MAX_RETRIES):
+        pending = [
+            item for item in pending
+            if item.status != ItemStatus.FATAL and iterations[item.temp_id] < MAX_RETRIES
+        ]
+        if not pending:
+            break
+
+        log_lens = {item.temp_id: len(item.refinement_log) for item in pending}
+        for item in pending:
+            iterations[item.temp_id] += 1
+        validators = _build_qa_stages(qa_config.get("validators", []), ctx, stage_registry)
+        assigned: Dict[str, List[Item]] = {validator.stage_name: [] for validator in validators}
+        carried: Dict[Any, List[RefinementPatch]] = {}
+        for item in pending:
+            to_run, carried[item.temp_id] = _plan_validators(item, validators)
+            for validator in to_run:
+                assigned[validator.stage_name].append(item)
+        await asyncio.gather(*[
+            validator.execute(assigned[validator.stage_name])
+            for validator in validators if assigned[validator.stage_name]
+        ])
+
+        still_pending = []
+        for item in pending:
+            if _resolve_qa_iteration(item, log_lens[item.temp_id], iterations[item.temp_id] - 1, carried[item.temp_id]):
+                durations.append(_finish_qa(item, MAX_RETRIES, iterations[item.temp_id], started))
+            else:
+                still_pending.append(item)
+        pending = still_pending
+        if not pending:
+            break
+
+        refiners = _build_qa_stages(qa_config.get("refiners", []), ctx, stage_registry)
+        await asyncio.gather(*[refiner.execute(pending) for refiner in refiners])
+        logger.info(f"Ciclo de refinamiento {i+1} completado para {len(pending)} ítems en modo batch.")
+        for item in pending:
+            item.checkpoint["qa_iterations"] = iterations[item.temp_id]
+        _save_checkpoint(ctx, pending)
+
+    for item in items_to_validate:
         if item.status != ItemStatus.VALIDATION_COMPLETE:
-            item.status = ItemStatus.FATAL
-            item.status_comment = f"El ítem no pasó la validación después de {MAX_RETRIES} intentos."
-            add_process_log_entry(item, "qa_cycle", item.status, item.status_comment)
+            durations.append(_finish_qa(item, MAX_RETRIES, iterations.get(item.temp_id, 0), started))
 
-    return list(processed_items_map.values())
+    _log_qa_timings(durations, int((time.perf_counter() - started) * 1000))
+    return items_to_validate
 
 
+def _items_for_stage(stage_config: Dict, items: List[Item]) -> List[Item]:
+    """
+    Los ítems que debe procesar una entrada del pipeline: no fallidos, que no
+    la completaron ya (según su checkpoint) y con el estado que escucha.
+    """
+    step_key = _step_key(stage_config)
+    items_for_stage = [
+        item for item in items
+        if item.status != ItemStatus.FATAL and step_key not in item.checkpoint.get("completed_stages", ())
+    ]
+    listen_to_status = stage_config.get("listen_to_status_pattern")
+    if listen_to_status:
+        # El patrón se compara sin distinguir mayúsculas: la configuración usa el nombre del estado.
+        pattern = listen_to_status.lower()
+        items_for_stage = [item for item in items_for_stage if item.status.value.startswith(pattern)]
+    return items_for_stage
+
+def _build_stage(stage_config: Dict, ctx: Dict[str, Any], stage_registry) -> Optional[BaseStage]:
+    """Instancia la etapa de una entrada del pipeline (None para el ciclo de QA)."""
+    if "qa_cycle" in stage_config:
+        return None
+    stage_name = stage_config.get("name")
+    stage_class = stage_registry.get(stage_name)
+    if not stage_class:
+        raise KeyError(f"La etapa '{stage_name}' no se encuentra en el registro.")
+    return stage_class(stage_name, stage_config.get("params", {}), ctx)
+
+async def _execute_stage(
+    stage_config: Dict,
+    stage_instance: Optional[BaseStage],
+    items_for_stage: List[Item],
+    ctx: Dict[str, Any],
+    stage_registry,
+    qa_semaphore: Optional[asyncio.Semaphore] = None,
+) -> List[Item]:
+    """Ejecuta una entrada del pipeline (etapa o ciclo de QA) y devuelve los ítems procesados."""
+    if stage_instance is None:
+        qa_config = stage_config["qa_cycle"]
+        if ctx["execution_mode"] == "bulk" or _qa_uses_packing(qa_config):
+            return await _run_qa_cycle_bulk(items_for_stage, qa_config, ctx, stage_registry)
+        return await _run_qa_cycle(items_for_stage, qa_config, ctx, stage_registry, qa_semaphore)
+    return await stage_instance.execute(items_for_stage)
+
+def _mark_stage_failure(items: List[Item], stage_name: str, error: Exception) -> None:
+    for item in items:
+        item.status = ItemStatus.FATAL
+        item.status_comment = f"Error fatal no manejado en la etapa '{stage_name}': {str(error)}"
+
+async def _run_streaming(
+    items: List[Item],
+    stages_config: List[Dict],
+    ctx: Dict[str, Any],
+    stage_registry,
+    batch_id: str,
+) -> None:
+    """
+    Modo de flujo de datos: cada ítem recorre el pipeline por su cuenta y pasa
+    a la siguiente etapa en cuanto termina la anterior, sin esperar al resto
+    del lote. Cada ítem se persiste y notifica al terminar cada una de sus
+    etapas. Las instancias de etapa se comparten entre ítems.
+    """
+    try:
+        instances = [_build_stage(stage_config, ctx, stage_registry) for stage_config in stages_config]
+    except KeyError as e:
+        logger.error(f"Configuración de pipeline inválida para el lote {batch_id}: {e}")
+        _mark_stage_failure(items, "pipeline", e)
+        await _notificar_progreso(ctx, batch_id, items, progress_fraction=1.0)
+        return
+
+    # Un semáforo por ciclo de QA para toda la ejecución: el límite de
+    # concurrencia abarca a todos los ítems, que entran al ciclo de uno en uno.
+    qa_semaphores = [
+        _qa_semaphore(stage_config["qa_cycle"]) if "qa_cycle" in stage_config else None
+        for stage_config in stages_config
+    ]
+    total_steps = len(stages_config) * len(items)
+    completed_steps = 0
+
+    async def run_item_path(index: int) -> None:
+        nonlocal completed_steps
+        for stage_config, stage_instance, qa_semaphore in zip(stages_config, instances, qa_semaphores):
+            stage_name = _step_key(stage_config)
+            items_for_stage = _items_for_stage(stage_config, [items[index]])
+            if items_for_stage:
+                try:
+                    processed_items = await _execute_stage(
+                        stage_config, stage_instance, items_for_stage, ctx, stage_registry, qa_semaphore
+                    )
+                    if processed_items:
+                        items[index] = processed_items[0]
+                    _mark_completed([items[index]], stage_name)
+                except Exception as e:
+                    logger.error(f"Error inesperado durante la etapa '{stage_name}' para el ítem {items[index].temp_id}: {e}", exc_info=True)
+                    _mark_stage_failure(items_for_stage, stage_name, e)
+                _save_checkpoint(ctx, [items[index]])
+            completed_steps += 1
+            await _notificar_progreso(ctx, batch_id, items, progress_fraction=completed_steps / total_steps)
+
+    await asyncio.gather(*[run_item_path(index) for index in range(len(items))])
+
 async def run(
     pipeline_config_path: str,
     user_params: Optional[Dict[str, Any]] = None,
     items_to_process: Optional[List[Item]] = None,
     ctx: Optional[Dict[str, Any]] = None,
+    execution_mode: Optional[str] = None,
 ):
     """
     Orquesta la ejecución de un pipeline de forma dinámica, basándose en
     el archivo de configuración proporcionado e implementando el ciclo de QA.
+
+    Tras cada entrada del pipeline los ítems se persisten con su checkpoint
+    (entradas completadas e iteraciones de QA), de modo que un lote
+    interrumpido puede reanudarse con `resume` sin repetir trabajo ya hecho.
+
+    `execution_mode` puede ser "interactive" (por defecto, optimiza latencia),
+    "bulk" (agrupa las peticiones LLM de cada etapa en trabajos batch del
+    proveedor, optimizando rendimiento y costo) o "streaming" (cada ítem avanza
+    por las etapas sin esperar al resto del lote).
     """
     stage_registry = get_full_registry()
 
     if ctx is None:
         ctx = {}
+    ctx["execution_mode"] = execution_mode or ctx.get("execution_mode") or settings.pipeline_execution_mode
 
     try:
         with open(pipeline_config_path, "r", encoding="utf-8") as f:
@@ -143,45 +481,36 @@ async def run(
 
     db = ctx.get("db_session")
     batch_id = items[0].batch_id if items else "ID de lote no disponible"
-    logger.info(f"--- Iniciando Ejecución de Pipeline para el lote {batch_id} ---")
+    logger.info(f"--- Iniciando Ejecución de Pipeline para el lote {batch_id} (modo {ctx['execution_mode']}) ---")
 
     await _notificar_progreso(ctx, batch_id, items, progress_fraction=0.0)
 
+    if ctx["execution_mode"] == "streaming":
+        await _run_streaming(items, pipeline_stages_config, ctx, stage_registry, batch_id)
+        logger.info(f"--- Pipeline finalizado para el lote {batch_id} ---")
+        return
+
     for i, stage_config in enumerate(pipeline_stages_config):
 
-        stage_name = stage_config.get("name") or "qa_cycle"
+        stage_name = _step_key(stage_config)
+        items_for_stage: List[Item] = []
 
         try:
             processed_items = []
+            stage_instance = _build_stage(stage_config, ctx, stage_registry)
+            items_for_stage = _items_for_stage(stage_config, items)
 
-            if "qa_cycle" in stage_config:
-                items_for_stage = [item for item in items if item.status != ItemStatus.FATAL]
-                if items_for_stage:
-                    logger.info(f"Ejecutando ciclo de QA. Ítems a procesar: {len(items_for_stage)}.")
-                    processed_items = await _run_qa_cycle(items_for_stage, stage_config["qa_cycle"], ctx, stage_registry)
-
-            else:
-                stage_params = stage_config.get("params", {})
-                listen_to_status = stage_config.get("listen_to_status_pattern")
-
-                stage_class = stage_registry.get(stage_name)
-                if not stage_class:
-                    raise KeyError(f"La etapa '{stage_name}' no se encuentra en el registro.")
-                stage_instance: BaseStage = stage_class(stage_name, stage_params, ctx)
-
-                items_for_stage = [item for item in items if item.status != ItemStatus.FATAL]
-                if listen_to_status:
-                    items_for_stage = [item for item in items_for_stage if item.status.value.startswith(listen_to_status)]
-
-                if items_for_stage:
-                    logger.info(f"Ejecutando etapa: '{stage_name}'. Ítems a procesar: {len(items_for_stage)}.")
-                    processed_items = await stage_instance.execute(items_for_stage)
+            if items_for_stage:
+                logger.info(f"Ejecutando etapa: '{stage_name}'. Ítems a procesar: {len(items_for_stage)}.")
+                processed_items = await _execute_stage(stage_config, stage_instance, items_for_stage, ctx, stage_registry)
 
             if processed_items:
                 processed_map = {item.temp_id: item for item in processed_items}
                 for index, item in enumerate(items):
                     if item.temp_id in processed_map:
                         items[index] = processed_map[item.temp_id]
+            processed_ids = {item.temp_id for item in items_for_stage}
+            _mark_completed([item for item in items if item.temp_id in processed_ids], stage_name)
 
             if db:
                 crud.save_items(db=db, items=items)
@@ -191,9 +520,34 @@ async def run(
 
         except Exception as e:
             logger.error(f"Error inesperado durante la etapa '{stage_name}': {e}", exc_info=True)
-            for item in items_for_stage:
-                item.status = ItemStatus.FATAL
-                item.status_comment = f"Error fatal no manejado en la etapa '{stage_name}': {str(e)}"
+            _mark_stage_failure(items_for_stage or [item for item in items if item.status != ItemStatus.FATAL], stage_name, e)
             await _notificar_progreso(ctx, batch_id, items, progress_fraction=1.0)
 
     logger.info(f"--- Pipeline finalizado para el lote {batch_id} ---")
+
+
+async def resume(
+    pipeline_config_path: str,
+    batch_id: str,
+    ctx: Dict[str, Any],
+    execution_mode: Optional[str] = None,
+) -> bool:
+    """
+    Reanuda un lote interrumpido a partir de lo persistido: los ítems se
+    cargan de la BD con su estado, plan, payload, logs y checkpoint, y el
+    pipeline salta las entradas e iteraciones de QA ya completadas.
+    Devuelve False si el lote no existe o ya no tiene ítems pendientes.
+    """
+    db = ctx.get("db_session")
+    if not db:
+        raise ValueError("Reanudar un lote requiere una sesión de base de datos en el contexto.")
+
+    items = crud.load_items(db, batch_id)
+    if not any(item.status.value not in crud.TERMINAL_STATUSES for item in items):
+        logger.info(f"El lote {batch_id} no tiene ítems pendientes; no hay nada que reanudar.")
+        return False
+
+    metrics.incr("pipeline.resumed")
+    logger.info(f"--- Reanudando el lote {batch_id} ({len(items)} ítems) ---")
+    await run(pipeline_config_path, items_to_process=items, ctx=ctx, execution_mode=execution_mode)
+    return True
@@ -1,6 +1,5 @@
 # ddi/pipelines/stages/analize_construct.py
 
-import json
 from typing import List, Any, Optional
 
 from ..registry import register
@@ -32,12 +31,12 @@ class AnalyzeConstructStage(LLMStage):
         # Construimos el objeto de entrada a medida con solo lo indispensable.
         input_data = {
             "objetivo_aprendizaje": item.generation_params.objetivo_aprendizaje,
-            "dominio": item.generation_params.dominio.model_dump(),
-            "audiencia": item.generation_params.audiencia.model_dump(),
+            "dominio": item.generation_params.dominio,
+            "audiencia": item.generation_params.audiencia,
             "nivel_cognitivo": item.generation_params.nivel_cognitivo.value
         }
 
-        return json.dumps(input_data, ensure_ascii=False)
+        return self._serialize_input(input_data, full=item.generation_params)
 
     async def _process_llm_result(self, item: Item, result: Optional[PlanDeItem], tokens_used: int):
         """
@@ -1,6 +1,5 @@
 # ddi/pipelines/stages/architect_item.py
 
-import json
 from typing import List, Any, Optional
 
 from ..registry import register
@@ -35,15 +34,17 @@ class ArchitectItemStage(LLMStage):
 
         # Construimos el dossier con el plan y el contexto esencial.
         input_data = {
-            "plan_de_item": item.plan_de_item.model_dump(),
+            "plan_de_item": item.plan_de_item,
             "contexto_de_generacion": {
-                "audiencia": item.generation_params.audiencia.model_dump(),
-                "dominio": item.generation_params.dominio.model_dump(),
-                "restricciones": item.generation_params.restricciones.model_dump() if item.generation_params.restricciones else None
+                "audiencia": item.generation_params.audiencia,
+                "dominio": item.generation_params.dominio,
             }
         }
 
-        return json.dumps(input_data, ensure_ascii=False)
+        return self._serialize_input(input_data, full={
+            "plan_de_item": item.plan_de_item.model_dump(mode="json"),
+            "contexto_de_generacion": item.generation_params.model_dump(mode="json"),
+        })
 
     async def _process_llm_result(self, item: Item, result: Optional[GeneratedItemContent], tokens_used: int):
         """
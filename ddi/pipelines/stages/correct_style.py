@@ -1,6 +1,5 @@
 # ddi/pipelines/stages/correct_style.py
 
-import json
 from typing import List, Any, Optional
 
 from ..registry import register
@@ -8,7 +7,9 @@ from ddi.pipelines.abstractions import LLMStage
 from ddi.schemas.models import Item
 from ddi.schemas.enums import ItemStatus
 from ddi.schemas.item_schemas import RefinementPatch
-from ddi.pipelines.utils.stage_helpers import add_process_log_entry, handle_missing_payload
+from ddi.pipelines.utils.stage_helpers import (
+    add_process_log_entry, handle_missing_payload, record_stage_findings, text_fields_for_validation
+)
 
 @register("correct_style")
 class CorrectStyleStage(LLMStage):
@@ -17,11 +18,18 @@ class CorrectStyleStage(LLMStage):
     en un conjunto de reglas mecánicas.
     """
     pydantic_schema = List[RefinementPatch]
+    cache_verdicts = True
+    packable = True
+    depends_on = ("cuerpo_item", "clave_y_diagnostico")
+    # Sus propias correcciones ya se aplicaron; no hace falta re-auditarlas.
+    ignore_changes_from = ("correct_style",)
+    supports_partial_input = True
 
     def _prepare_llm_input(self, item: Item) -> str:
         """
         Prepara el JSON de entrada para el Corrector de Estilo, enviando
-        solo los textos y los hallazgos previos relevantes.
+        solo los textos (los modificados, en una re-validación parcial) y los
+        hallazgos previos relevantes.
         """
         if handle_missing_payload(item, self.stage_name):
             raise ValueError("Payload ausente.")
@@ -33,11 +41,11 @@ class CorrectStyleStage(LLMStage):
         ]
 
         input_data = {
-            "textos_por_ruta": item.payload.get_all_text_fields_by_path(),
+            "textos_por_ruta": text_fields_for_validation(item, self.stage_name),
             "hallazgos_guia": hallazgos_simplificados
         }
 
-        return json.dumps(input_data, ensure_ascii=False)
+        return self._serialize_input(input_data)
 
     async def _process_llm_result(self, item: Item, result: Optional[List[RefinementPatch]], tokens_used: int):
         """
@@ -46,6 +54,7 @@ class CorrectStyleStage(LLMStage):
         if result is None:
             return
 
+        record_stage_findings(item, self.stage_name, result)
         codes_found = [p.code for p in result] if result else []
 
         if not result:
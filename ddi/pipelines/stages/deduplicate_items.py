@@ -0,0 +1,102 @@
+# ddi/pipelines/stages/deduplicate_items.py
+
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from ..registry import register, get_full_registry
+from ddi.core import metrics
+from ddi.core.config import settings
+from ddi.db import crud
+from ddi.schemas.models import Item
+from ddi.schemas.enums import ItemStatus
+from ddi.pipelines.abstractions import BaseStage
+from ddi.pipelines.utils.similarity import SimilarityIndex, cuerpo_item_text
+from ddi.pipelines.utils.stage_helpers import add_process_log_entry
+
+@register("deduplicate_items")
+class DeduplicateItemsStage(BaseStage):
+    """
+    Etapa que detecta borradores casi idénticos antes del ciclo de QA, dentro
+    del lote y contra los ítems recientes de la base de datos. No realiza
+    llamadas a LLMs salvo para regenerar.
+
+    Parámetros:
+        threshold: similitud estimada a partir de la cual dos ítems son duplicados.
+        history_items: cuántos ítems recientes de otros lotes se comparan.
+        on_duplicate: "flag" (el duplicado pasa a FATAL y no consume QA) o
+            "regenerate" (se vuelve a ejecutar `regenerate_stage` para él).
+        regenerate_stage / regenerate_params: etapa y parámetros con que se regenera.
+        max_regenerations: intentos de regeneración antes de marcarlo.
+
+    El índice vive en la instancia: en el modo streaming, donde la misma
+    instancia recibe los ítems de uno en uno, cada uno se compara con los
+    que ya pasaron por la etapa.
+    """
+    _index: Optional[SimilarityIndex] = None
+
+    async def execute(self, items: List[Item]) -> List[Item]:
+        if self._index is None:
+            self._index = SimilarityIndex(self.params.get("threshold", settings.dedup_similarity_threshold))
+            self._index_history(self._index, items)
+        index = self._index
+
+        duplicates = self._check(index, [item for item in items if item.payload])
+        attempts = 0
+        while duplicates and self.params.get("on_duplicate", "flag") == "regenerate" \
+                and attempts < self.params.get("max_regenerations", 1):
+            attempts += 1
+            await self._regenerate([item for item, _ in duplicates])
+            duplicates = self._check(index, [item for item, _ in duplicates if item.payload])
+
+        for item, (origin, similarity) in duplicates:
+            metrics.incr("dedup.flagged")
+            add_process_log_entry(
+                item, self.stage_name, ItemStatus.FATAL,
+                f"Casi duplicado del {origin} (similitud estimada {similarity:.2f}); se descarta antes del QA.",
+            )
+        return items
+
+    def _index_history(self, index: SimilarityIndex, items: List[Item]) -> None:
+        """Indexa el cuerpo de los ítems recientes de otros lotes."""
+        db: Optional[Session] = self.ctx.get("db_session")
+        limit = self.params.get("history_items", settings.dedup_history_items)
+        if not db or not limit or not items:
+            return
+        try:
+            rows = crud.get_recent_item_bodies(db, items[0].batch_id, limit)
+        except Exception as e:
+            self.logger.warning(f"No se pudo leer el historial para detectar duplicados: {e}")
+            db.rollback()
+            return
+        for item_id, cuerpo_item in rows:
+            if cuerpo_item:
+                index.add(f"ítem {item_id}", index.signature_for(cuerpo_item_text(cuerpo_item)))
+
+    def _check(self, index: SimilarityIndex, items: List[Item]) -> List[Tuple[Item, Tuple[str, float]]]:
+        """
+        Compara cada ítem con el índice; los que no son duplicados se añaden
+        a él, de modo que el primero de un grupo de casi-idénticos se conserva.
+        """
+        duplicates = []
+        for item in items:
+            signature = index.signature_for(cuerpo_item_text(item.payload.cuerpo_item.model_dump()))
+            match = index.query(signature)
+            if match is None:
+                index.add(f"ítem {item.temp_id} del mismo lote", signature)
+                continue
+            metrics.incr("dedup.duplicates")
+            self.logger.info(f"Ítem {item.temp_id}: casi duplicado del {match[0]} (similitud estimada {match[1]:.2f}).")
+            duplicates.append((item, match))
+        return duplicates
+
+    async def _regenerate(self, items: List[Item]) -> None:
+        """Vuelve a generar el borrador de los duplicados, sin la caché de respuestas."""
+        stage_name = self.params.get("regenerate_stage", "architect_item")
+        stage_class = get_full_registry().get(stage_name)
+        if not stage_class:
+            raise KeyError(f"La etapa '{stage_name}' no se encuentra en el registro.")
+        params: Dict[str, Any] = {**self.params.get("regenerate_params", {}), "cache": False}
+        self.logger.info(f"Regenerando {len(items)} ítems casi duplicados con '{stage_name}'.")
+        metrics.incr("dedup.regenerated", len(items))
+        await stage_class(stage_name, params, self.ctx).execute(items)
@@ -1,6 +1,5 @@
 # ddi/pipelines/stages/finalize_item.py
 
-import json
 from typing import List, Any, Optional
 
 from ..registry import register
@@ -17,20 +16,25 @@ class FinalizeItemStage(LLMStage):
     del ítem y determinar si está listo para producción.
     """
     pydantic_schema = FinalEvaluationSchema
+    payload_fields = {
+        "dominio", "objetivo_aprendizaje", "audiencia", "nivel_cognitivo", "formato", "contexto",
+        "cuerpo_item", "clave_y_diagnostico", "trazabilidad_pensamiento",
+    }
 
     def _prepare_llm_input(self, item: Item) -> str:
         """
         Prepara el JSON de entrada para el Evaluador Final.
-        El input es el payload completo del ítem para una evaluación holística.
+        El input es el contenido completo del ítem para una evaluación holística
+        (sin versión, metadatos de creación ni evaluaciones previas).
         """
         if handle_missing_payload(item, self.stage_name):
             raise ValueError("Payload ausente.")
 
         input_data = {
-            "item_a_evaluar": item.payload.model_dump()
+            "item_a_evaluar": self._project_payload(item)
         }
 
-        return json.dumps(input_data, ensure_ascii=False)
+        return self._serialize_input(input_data, full={"item_a_evaluar": item.payload})
 
     async def _process_llm_result(self, item: Item, result: Optional[FinalEvaluationSchema], tokens_used: int):
         """
@@ -1,6 +1,5 @@
 # ddi/pipelines/stages/refine_item.py
 
-import json
 from typing import List, Any, Optional
 
 from ..registry import register
@@ -18,6 +17,21 @@ class RefinePsychometricStage(LLMStage):
     """
     pydantic_schema = List[RefinementPatch]
 
+    @staticmethod
+    def _findings_to_address(item: Item) -> List[RefinementPatch]:
+        # Solo los hallazgos que este agente debe corregir (psicométricos y factuales),
+        # excluyendo los de estilo que son manejados por otro agente.
+        return [
+            p for p in item.refinement_log
+            if "FORMATO_" not in p.code and "ORTOTIPOGRAFICO" not in p.code
+        ]
+
+    def skip_reason(self, item: Item) -> Optional[str]:
+        """Si no hay hallazgos de contenido, no es necesario llamar al LLM."""
+        if item.payload and not self._findings_to_address(item):
+            return "No se encontraron hallazgos de contenido para refinar."
+        return None
+
     def _prepare_llm_input(self, item: Item) -> str:
         """
         Prepara el "expediente de corrección" para el Maestro Psicométrico.
@@ -25,16 +39,7 @@ class RefinePsychometricStage(LLMStage):
         if handle_missing_payload(item, self.stage_name):
             raise ValueError("Payload ausente.")
 
-        # Filtramos los hallazgos para enviar solo los que este agente debe corregir
-        # (psicométricos y factuales), excluyendo los de estilo que son manejados por otro agente.
-        hallazgos_a_corregir = [
-            p.model_dump() for p in item.refinement_log
-            if "FORMATO_" not in p.code and "ORTOTIPOGRAFICO" not in p.code
-        ]
-
-        # Si no hay hallazgos de contenido, no es necesario llamar al LLM.
-        if not hallazgos_a_corregir:
-            return "" # Devolvemos un string vacío para saltar la llamada al LLM.
+        hallazgos_a_corregir = [p.model_dump() for p in self._findings_to_address(item)]
 
         input_data = {
             "contexto_psicometrico": {
@@ -46,19 +51,13 @@ class RefinePsychometricStage(LLMStage):
             "hallazgos_a_corregir": hallazgos_a_corregir
         }
 
-        return json.dumps(input_data, ensure_ascii=False)
+        return self._serialize_input(input_data)
 
     async def _process_llm_result(self, item: Item, result: Optional[List[RefinementPatch]], tokens_used: int):
         """
         Procesa los parches correctivos, los aplica al payload del ítem y
         actualiza los logs.
         """
-        # Si el input estaba vacío, no hubo llamada al LLM.
-        if self._prepare_llm_input(item) == "":
-            comment = "OK. No se encontraron hallazgos de contenido para refinar."
-            add_process_log_entry(item, self.stage_name, item.status, comment, tokens_used=0)
-            return
-
         if result is None:
             return
 
@@ -68,7 +67,7 @@ class RefinePsychometricStage(LLMStage):
             return
 
         # Aplicamos los parches de contenido al ítem
-        apply_patches(item, result)
+        apply_patches(item, result, origin=self.stage_name)
 
         comment = f"Éxito. {len(result)} parche(s) de contenido aplicado(s)."
 
@@ -1,42 +1,50 @@
 # ddi/pipelines/stages/validate_factual.py
 
-import json
 from typing import List, Any, Optional
 
 from ..registry import register
-from ddi.pipelines.abstractions import BaseAgentStage # Hereda de BaseAgentStage por el uso de herramientas
+from ddi.pipelines.abstractions import LLMStage
 from ddi.schemas.models import Item
 from ddi.schemas.enums import ItemStatus
 from ddi.schemas.item_schemas import RefinementPatch
-from ddi.pipelines.utils.stage_helpers import add_process_log_entry, handle_missing_payload
-
-# Suponiendo que tienes una herramienta de búsqueda definida y registrada
-# from ddi.llm.tools import web_search_tool
+from ddi.pipelines.utils.stage_helpers import (
+    add_process_log_entry, handle_missing_payload, record_stage_findings, get_qa_focus, text_fields_for_validation
+)
 
 @register("validate_factual")
-class ValidateFactualStage(BaseAgentStage):
+class ValidateFactualStage(LLMStage):
     """
-    Etapa que utiliza un agente con herramientas de búsqueda para verificar
-    la exactitud factual del contenido de un ítem.
+    Etapa que verifica la exactitud factual del contenido de un ítem.
+
+    Mientras no haya herramientas de búsqueda (`call_llm_with_tools` aún no
+    está implementada), la auditoría es una llamada LLM normal; cuando las
+    haya, la etapa pasará a heredar de `BaseAgentStage` y declarará `tools`.
     """
     pydantic_schema = List[RefinementPatch]
-    # tools = [web_search_tool] # Aquí se inyectarían las herramientas que el agente puede usar.
+    cache_verdicts = True
+    depends_on = ("cuerpo_item", "clave_y_diagnostico")
+    # Las correcciones ortotipográficas no alteran los hechos.
+    ignore_changes_from = ("correct_style",)
+    supports_partial_input = True
 
     def _prepare_llm_input(self, item: Item) -> str:
         """
         Prepara el JSON de entrada para el Auditor Factual, enviando solo
-        los textos a verificar para minimizar la carga.
+        los textos a verificar para minimizar la carga. En una re-validación
+        parcial, solo los textos modificados con el enunciado como contexto.
         """
         if handle_missing_payload(item, self.stage_name):
             raise ValueError("Payload ausente.")
 
         input_data = {
             "contenido": {
-                "textos_a_validar": item.payload.get_all_text_fields_by_path()
+                "textos_a_validar": text_fields_for_validation(item, self.stage_name)
             }
         }
+        if get_qa_focus(item, self.stage_name):
+            input_data["contexto"] = {"enunciado_pregunta": item.payload.cuerpo_item.enunciado_pregunta}
 
-        return json.dumps(input_data, ensure_ascii=False)
+        return self._serialize_input(input_data)
 
     async def _process_llm_result(self, item: Item, result: Optional[List[RefinementPatch]], tokens_used: int):
         """
@@ -51,6 +59,7 @@ class ValidateFactualStage(BaseAgentStage):
                 self.logger.warning(f"El Auditor Factual generó un 'refined_value' inesperado para el ítem {item.temp_id}. Se forzará a nulo.")
                 hallazgo.refined_value = None
 
+        record_stage_findings(item, self.stage_name, result)
         codes_found = [p.code for p in result] if result else []
 
         if not result:
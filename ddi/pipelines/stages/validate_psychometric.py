@@ -1,6 +1,5 @@
 # ddi/pipelines/stages/validate_psychometric.py
 
-import json
 from typing import List, Any, Optional
 
 from ..registry import register
@@ -8,7 +7,7 @@ from ddi.pipelines.abstractions import LLMStage
 from ddi.schemas.models import Item
 from ddi.schemas.enums import ItemStatus
 from ddi.schemas.item_schemas import RefinementPatch
-from ddi.pipelines.utils.stage_helpers import add_process_log_entry, handle_missing_payload
+from ddi.pipelines.utils.stage_helpers import add_process_log_entry, handle_missing_payload, record_stage_findings
 
 @register("validate_psychometric")
 class ValidatePsychometricStage(LLMStage):
@@ -17,18 +16,25 @@ class ValidatePsychometricStage(LLMStage):
     psicométrica y genera un reporte de hallazgos.
     """
     pydantic_schema = List[RefinementPatch]
+    cache_verdicts = True
+    packable = True
+    payload_fields = {
+        "dominio", "objetivo_aprendizaje", "audiencia", "nivel_cognitivo", "formato", "contexto",
+        "cuerpo_item", "clave_y_diagnostico",
+    }
+    # La rúbrica evalúa el ítem como un todo: cualquier cambio en su contenido
+    # obliga a re-auditarlo completo.
+    depends_on = ("contexto", "cuerpo_item", "clave_y_diagnostico")
 
     def _prepare_llm_input(self, item: Item) -> str:
         """
-        Prepara el JSON de entrada para el Validador Psicométrico.
-        El input es el payload completo del ítem para una revisión holística.
+        Prepara el JSON de entrada para el Validador Psicométrico: el ítem
+        completo salvo la trazabilidad y los metadatos, que su prompt no usa.
         """
         if handle_missing_payload(item, self.stage_name):
             raise ValueError("Payload ausente.")
 
-        input_data = item.payload.model_dump()
-
-        return json.dumps(input_data, ensure_ascii=False)
+        return self._serialize_input(self._project_payload(item), full=item.payload)
 
     async def _process_llm_result(self, item: Item, result: Optional[List[RefinementPatch]], tokens_used: int):
         """
@@ -44,6 +50,7 @@ class ValidatePsychometricStage(LLMStage):
                 self.logger.warning(f"El Validador Psicométrico generó un 'refined_value' inesperado para el ítem {item.temp_id}. Se forzará a nulo.")
                 hallazgo.refined_value = None
 
+        record_stage_findings(item, self.stage_name, result)
         codes_found = [p.code for p in result] if result else []
 
         if not result:
@@ -6,23 +6,132 @@ Utilidades para extraer JSON de respuestas de LLM y construir mensajes de prompt
 
 import json
 import re
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 from datetime import datetime
 import pytz
 
-# --- CORRECCIÓN ---
-# La expresión regular ahora busca un bloque ```json que comience al
-# inicio del string (con posible espacio en blanco antes).
-# Esto evita que se confunda con bloques de código anidados.
-_JSON_FENCE = re.compile(r"^\s*```json\s*([\s\S]*?)```\s*$", re.IGNORECASE | re.MULTILINE)
+_FENCE = "```"
+_FENCE_LANG = "json"
+_MULTILINE_OPEN = '"<<<TEXTO_MULTILINEA\n'
+_MULTILINE_CLOSE = '\nTEXTO_MULTILINEA>>>"'
+_WHITESPACE = " \t\r\n\f\v"
+# Sin cuantificadores perezosos ni grupos anidados: cada intento solo recorre
+# el tramo de blancos tras la valla, así que no hay retroceso catastrófico.
+_FENCE_CLOSE = re.compile(r"```[^\S\n]*(?:\n|$)")
+
+# Las funciones siguientes recorren el texto con búsquedas que siempre
+# avanzan: el coste es lineal en la longitud de la respuesta aunque haya
+# marcadores sin cerrar o muchas vallas.
+
+def _fence_open_end(text: str) -> int:
+    """
+    Posición tras la valla de apertura ```json (al inicio de una línea, con
+    sangría opcional y sin distinguir mayúsculas), o -1 si no hay ninguna.
+    """
+    pos = text.find(_FENCE)
+    while pos != -1:
+        line_start = text.rfind("\n", 0, pos) + 1
+        lang_end = pos + len(_FENCE) + len(_FENCE_LANG)
+        if text[pos + len(_FENCE):lang_end].lower() == _FENCE_LANG and not text[line_start:pos].strip():
+            return lang_end
+        # Solo la primera valla de una línea puede abrir el bloque: se salta a la siguiente.
+        line_end = text.find("\n", pos)
+        if line_end == -1:
+            return -1
+        pos = text.find(_FENCE, line_end + 1)
+    return -1
+
+def _fence_close_start(text: str, pos: int, limit: int) -> int:
+    """Primera valla ``` en [pos, limit) seguida solo de blancos hasta el fin de línea, o -1."""
+    m = _FENCE_CLOSE.search(text, pos, limit)
+    return m.start() if m else -1
+
+def _next_multiline_block(text: str, pos: int, limit: int) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Siguiente bloque `"clave": "<<<TEXTO_MULTILINEA ... TEXTO_MULTILINEA>>>"`
+    completo en [pos, limit). Devuelve (fin de la clave, inicio del contenido,
+    fin del contenido, fin del bloque) o None.
+    """
+    first_quote = text.find('"', pos, limit)
+    search = pos
+    while first_quote != -1:
+        marker = text.find(_MULTILINE_OPEN, search, limit)
+        if marker == -1:
+            return None
+        # Hacia atrás desde el marcador: blancos, ':', blancos y la comilla que cierra la clave.
+        j = marker - 1
+        while j >= pos and text[j] in _WHITESPACE:
+            j -= 1
+        if j >= pos and text[j] == ":":
+            j -= 1
+            while j >= pos and text[j] in _WHITESPACE:
+                j -= 1
+            if j > first_quote and text[j] == '"':
+                content_start = marker + len(_MULTILINE_OPEN)
+                content_end = text.find(_MULTILINE_CLOSE, content_start, limit)
+                if content_end == -1:
+                    # Sin terminador, ningún bloque posterior puede cerrarse tampoco.
+                    return None
+                return j, content_start, content_end, content_end + len(_MULTILINE_CLOSE)
+        search = marker + 1
+    return None
+
+def _escape_multiline_blocks(text: str, start: int, end: int) -> str:
+    pieces: List[str] = []
+    pos = start
+    while (block := _next_multiline_block(text, pos, end)) is not None:
+        key_end, content_start, content_end, block_end = block
+        pieces.append(text[pos:key_end])
+        pieces.append('": ')
+        pieces.append(json.dumps(text[content_start:content_end]))
+        pos = block_end
+    pieces.append(text[pos:end])
+    return "".join(pieces)
 
 def extract_json_block(text: str) -> str:
     """
     Si el texto es un bloque de código JSON, devuelve solo su contenido.
     En caso contrario, devuelve el texto entero para un parseo directo.
     """
-    m = _JSON_FENCE.search(text.strip())
-    return m.group(1).strip() if m else text.strip()
+    text = text.strip()
+    body_start = _fence_open_end(text)
+    if body_start == -1:
+        return text
+    body_end = _fence_close_start(text, body_start, len(text))
+    return text[body_start:body_end].strip() if body_end != -1 else text
+
+def clean_llm_json(text: str) -> str:
+    """
+    Extrae el bloque ```json (si lo hay) y convierte los bloques
+    TEXTO_MULTILINEA en strings JSON escapados, en una sola pasada.
+
+    Una valla ``` que aparece dentro del contenido de un bloque multilínea no
+    cierra el bloque JSON.
+    """
+    text = text.strip()
+    body_start = _fence_open_end(text)
+    if body_start == -1:
+        return _escape_multiline_blocks(text, 0, len(text)).strip()
+
+    pieces: List[str] = []
+    pos = body_start
+    while True:
+        block = _next_multiline_block(text, pos, len(text))
+        # Un cierre dentro del bloque no cuenta; el tramo acaba en el marcador
+        # de apertura, así que el `$` de la búsqueda no da falsos cierres.
+        limit = block[1] if block is not None else len(text)
+        body_end = _fence_close_start(text, pos, limit)
+        if body_end != -1:
+            pieces.append(text[pos:body_end])
+            return "".join(pieces).strip()
+        if block is None:
+            # Valla de apertura sin cierre: se trata el texto completo.
+            return _escape_multiline_blocks(text, 0, len(text)).strip()
+        key_end, content_start, content_end, block_end = block
+        pieces.append(text[pos:key_end])
+        pieces.append('": ')
+        pieces.append(json.dumps(text[content_start:content_end]))
+        pos = block_end
 
 def parse_payload(text: str) -> Union[Dict[str, Any], List[Any]]:
     """
@@ -35,6 +144,18 @@ def parse_payload(text: str) -> Union[Dict[str, Any], List[Any]]:
 
     return json.loads(clean_text, strict=False)
 
+# La zona horaria se construye una sola vez, no en cada llamada.
+MEXICO_CITY_TZ = pytz.timezone('America/Mexico_City')
+
+def current_date_context() -> str:
+    now = datetime.now(MEXICO_CITY_TZ)
+    return f"La fecha y hora actual es {now.strftime('%d de %B de %Y, %H:%M:%S')} en la Ciudad de México."
+
+def serialize_payload(payload: Union[Dict[str, Any], List[Any], str]) -> str:
+    if isinstance(payload, str):
+        return payload
+    return json.dumps(payload, ensure_ascii=False, indent=2)
+
 def build_prompt_messages(
     system_template: str,
     user_message_template: str,
@@ -42,22 +163,16 @@ def build_prompt_messages(
 ) -> List[Dict[str, Any]]:
     """
     Construye la lista de mensajes system+user para la API del LLM,
-    inyectando placeholders dinámicos de forma segura.
+    inyectando placeholders dinámicos de forma segura. El mensaje de sistema
+    es estático y va primero; todo lo dinámico (fecha, payload) va en el
+    mensaje de usuario, para que la caché de prefijos del proveedor aplique.
     """
     final_user_message_content = user_message_template
 
     if "{current_date_context}" in final_user_message_content:
-        mexico_city_tz = pytz.timezone('America/Mexico_City')
-        now = datetime.now(mexico_city_tz)
-        date_context = f"La fecha y hora actual es {now.strftime('%d de %B de %Y, %H:%M:%S')} en la Ciudad de México."
-        final_user_message_content = final_user_message_content.replace('{current_date_context}', date_context)
-
-    if isinstance(payload, str):
-        user_content_payload_str = payload
-    else:
-        user_content_payload_str = json.dumps(payload, ensure_ascii=False, indent=2)
+        final_user_message_content = final_user_message_content.replace('{current_date_context}', current_date_context())
 
-    final_user_message_content = final_user_message_content.replace('{input}', user_content_payload_str)
+    final_user_message_content = final_user_message_content.replace('{input}', serialize_payload(payload))
 
     messages = []
     if system_template:
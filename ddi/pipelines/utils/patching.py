@@ -0,0 +1,179 @@
+# ddi/pipelines/utils/patching.py
+
+"""
+Motor de parches sobre el payload de un ítem.
+
+Una ruta como `cuerpo_item.opciones[0].texto` se compila una sola vez por
+esquema en una secuencia de accesos (atributo / índice) y en el validador del
+tipo del campo final. Aplicar un parche es recorrer el modelo, validar solo
+el valor nuevo contra ese tipo y asignarlo en su sitio, sin volcar ni
+re-validar el payload completo.
+
+Dentro de una misma aplicación se detectan los conflictos: un parche cuya
+ruta se solapa con la de otro ya aplicado y que propone otro valor (o que
+parte de un `original_value` que ya no es el vigente) se rechaza.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Annotated, Any, List, Optional, Tuple, Type, Union, get_args, get_origin
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from ddi.core import metrics
+from ddi.schemas.item_schemas import RefinementPatch
+
+Segment = Union[str, int]
+
+_SEGMENT_RE = re.compile(r"([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]")
+
+class PatchPathError(ValueError):
+    """La ruta de un parche no es válida para el esquema."""
+
+@dataclass(frozen=True)
+class CompiledPath:
+    """Ruta de parche ya resuelta contra un esquema."""
+    field_path: str
+    segments: Tuple[Segment, ...]
+    adapter: TypeAdapter
+
+    def get(self, root: BaseModel) -> Any:
+        node: Any = root
+        for segment in self.segments:
+            node = _step(node, segment, self.field_path)
+        return node
+
+    def set(self, root: BaseModel, value: Any) -> Any:
+        """Valida `value` contra el tipo del campo y lo asigna. Devuelve el valor anterior."""
+        parent: Any = root
+        for segment in self.segments[:-1]:
+            parent = _step(parent, segment, self.field_path)
+        last = self.segments[-1]
+        previous = _step(parent, last, self.field_path)
+        validated = self.adapter.validate_python(value)
+        if isinstance(last, int):
+            parent[last] = validated
+        else:
+            setattr(parent, last, validated)
+        return previous
+
+def _step(node: Any, segment: Segment, field_path: str) -> Any:
+    # La compilación garantiza que los segmentos de texto son atributos de un modelo.
+    try:
+        return node[segment] if segment.__class__ is int else getattr(node, segment)
+    except (IndexError, AttributeError, TypeError):
+        raise PatchPathError(f"La ruta '{field_path}' no existe en el ítem.") from None
+
+def _unwrap_optional(annotation: Any) -> Any:
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return annotation
+
+def parse_path(field_path: str) -> Tuple[Segment, ...]:
+    """'cuerpo_item.opciones[0].texto' -> ('cuerpo_item', 'opciones', 0, 'texto')."""
+    segments: List[Segment] = []
+    pos = 0
+    expect_name = True
+    while pos < len(field_path):
+        if not expect_name and field_path[pos] == ".":
+            pos += 1
+            expect_name = True
+            continue
+        match = _SEGMENT_RE.match(field_path, pos)
+        if not match or (expect_name and match.group(2) is not None) or (not expect_name and match.group(1) is not None):
+            raise PatchPathError(f"Sintaxis de ruta inválida: '{field_path}'.")
+        segments.append(match.group(1) if match.group(1) is not None else int(match.group(2)))
+        pos = match.end()
+        expect_name = False
+    if not segments or expect_name:
+        raise PatchPathError(f"Sintaxis de ruta inválida: '{field_path}'.")
+    return tuple(segments)
+
+@lru_cache(maxsize=1024)
+def compile_path(schema: Type[BaseModel], field_path: str) -> CompiledPath:
+    """Compila (una vez por esquema y ruta) los accesos y el validador del campo final."""
+    segments = parse_path(field_path)
+    annotation: Any = schema
+    constraints: List[Any] = []
+    for segment in segments:
+        annotation = _unwrap_optional(annotation)
+        if isinstance(segment, int):
+            if get_origin(annotation) not in (list, List):
+                raise PatchPathError(f"La ruta '{field_path}' indexa un campo que no es una lista.")
+            annotation = get_args(annotation)[0]
+            constraints = []
+        else:
+            if not (isinstance(annotation, type) and issubclass(annotation, BaseModel)):
+                raise PatchPathError(f"La ruta '{field_path}' accede a un atributo de un campo que no es un modelo.")
+            model_field = annotation.model_fields.get(segment)
+            if model_field is None:
+                raise PatchPathError(f"El campo '{segment}' de la ruta '{field_path}' no existe en {annotation.__name__}.")
+            annotation = model_field.annotation
+            # Restricciones del campo (gt, le, max_length...), que no forman parte del tipo.
+            constraints = list(model_field.metadata)
+    if constraints:
+        annotation = Annotated[(annotation, *constraints)]
+    return CompiledPath(field_path, segments, TypeAdapter(annotation))
+
+def _overlaps(a: Tuple[Segment, ...], b: Tuple[Segment, ...]) -> bool:
+    shorter = min(len(a), len(b))
+    return a[:shorter] == b[:shorter]
+
+@dataclass
+class PatchResult:
+    """Resultado de aplicar una lista de parches."""
+    applied: List[RefinementPatch] = field(default_factory=list)
+    # Rutas cuyo valor cambió efectivamente.
+    changed: List[str] = field(default_factory=list)
+    rejected: List[Tuple[RefinementPatch, str]] = field(default_factory=list)
+
+def apply_patches_in_place(root: BaseModel, patches: List[RefinementPatch]) -> PatchResult:
+    """
+    Aplica sobre `root` los parches con `refined_value`, en orden. Los parches
+    con ruta inválida, valor que no valida o en conflicto con uno anterior se
+    rechazan sin afectar a los demás.
+    """
+    result = PatchResult()
+    touched: List[Tuple[Tuple[Segment, ...], Optional[str]]] = []
+    schema = type(root)
+
+    for patch in patches:
+        if patch.refined_value is None:
+            continue
+        try:
+            compiled = compile_path(schema, patch.field_path)
+            conflict = _find_conflict(compiled, patch, touched, root)
+            if conflict:
+                metrics.incr("patches.conflicts")
+                result.rejected.append((patch, conflict))
+                continue
+            previous = compiled.set(root, patch.refined_value)
+        except (PatchPathError, ValidationError) as e:
+            metrics.incr("patches.rejected")
+            result.rejected.append((patch, str(e)))
+            continue
+        touched.append((compiled.segments, patch.refined_value))
+        result.applied.append(patch)
+        if previous != compiled.get(root):
+            result.changed.append(patch.field_path)
+    return result
+
+def _find_conflict(
+    compiled: CompiledPath,
+    patch: RefinementPatch,
+    touched: List[Tuple[Tuple[Segment, ...], Optional[str]]],
+    root: BaseModel,
+) -> Optional[str]:
+    for segments, value in touched:
+        if not _overlaps(segments, compiled.segments):
+            continue
+        if segments == compiled.segments and value == patch.refined_value:
+            # Dos validadores proponen la misma corrección: no es un conflicto.
+            return None
+        if segments == compiled.segments and patch.original_value is not None and compiled.get(root) == patch.original_value:
+            return None
+        return f"Conflicto con otro parche ya aplicado sobre '{patch.field_path}'."
+    return None
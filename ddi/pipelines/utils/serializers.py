@@ -0,0 +1,55 @@
+# ddi/pipelines/utils/serializers.py
+
+"""
+Serialización compacta de la entrada de cada etapa LLM.
+
+Los tokens de entrada son la mayor parte del gasto: el mismo payload se envía
+a varios validadores en cada iteración de QA. Antes de enviarlo:
+
+- se proyecta a los campos que declara la etapa (ver `LLMStage.payload_fields`);
+- se eliminan nulos y contenedores vacíos (los valores por defecto con
+  significado, como la dificultad o el número de opciones, se conservan);
+- se serializa sin espacios ni sangría.
+
+Los tokens ahorrados respecto a la serialización completa se acumulan en las
+métricas `input_tokens.<etapa>.sent` / `.saved`.
+"""
+
+import json
+from typing import Any, Iterable, Optional
+
+from pydantic import BaseModel
+
+from ddi.core import metrics
+from ddi.llm.tokens import estimate_tokens
+
+def prune(value: Any) -> Any:
+    """Convierte modelos a datos JSON y elimina nulos y contenedores vacíos, recursivamente."""
+    if isinstance(value, BaseModel):
+        value = value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        pruned = {k: prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if v is not None and v != {} and v != []}
+    if isinstance(value, (list, tuple)):
+        return [prune(v) for v in value if v is not None]
+    return value
+
+def project_model(model: BaseModel, fields: Optional[Iterable[str]] = None) -> Any:
+    """Proyecta un modelo a los campos de primer nivel indicados (todos si es None)."""
+    include = set(fields) if fields is not None else None
+    return prune(model.model_dump(mode="json", include=include, exclude_none=True))
+
+def serialize_stage_input(stage_name: str, data: Any, full: Any = None) -> str:
+    """
+    Serializa la entrada de una etapa. `full` es la entrada sin proyectar
+    (por defecto, `data`) y solo se usa para medir el ahorro.
+    """
+    text = json.dumps(prune(data), ensure_ascii=False, separators=(",", ":"))
+    baseline = full if full is not None else data
+    if isinstance(baseline, BaseModel):
+        baseline = baseline.model_dump(mode="json")
+    baseline_text = json.dumps(baseline, ensure_ascii=False, default=str)
+    sent_tokens = estimate_tokens(text)
+    metrics.incr(f"input_tokens.{stage_name}.sent", sent_tokens)
+    metrics.incr(f"input_tokens.{stage_name}.saved", max(0, estimate_tokens(baseline_text) - sent_tokens))
+    return text
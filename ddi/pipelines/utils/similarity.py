@@ -0,0 +1,104 @@
+# ddi/pipelines/utils/similarity.py
+
+"""
+Detección local de casi-duplicados entre ítems.
+
+Cada texto se reduce a su conjunto de shingles (trigramas de palabras
+normalizadas) y este a una firma MinHash, cuya fracción de posiciones
+coincidentes estima la similitud de Jaccard entre dos textos. Un índice LSH
+por bandas limita las comparaciones a los candidatos que comparten alguna
+banda, de modo que consultar no recorre todo el historial.
+"""
+
+import hashlib
+import random
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Set, Tuple
+
+_WORD_RE = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 61) - 1
+
+Signature = Tuple[int, ...]
+
+def _normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Trigramas de palabras (o las palabras sueltas, si el texto es más corto)."""
+    words = _WORD_RE.findall(_normalize(text))
+    if len(words) < size:
+        return set(words)
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def cuerpo_item_text(cuerpo_item: Mapping[str, Any]) -> str:
+    """Texto comparable de un `cuerpo_item` (ya volcado a dict): estímulo, enunciado y opciones."""
+    parts = [cuerpo_item.get("estimulo") or "", cuerpo_item.get("enunciado_pregunta") or ""]
+    parts.extend(opcion.get("texto") or "" for opcion in cuerpo_item.get("opciones") or [])
+    return "\n".join(part for part in parts if part)
+
+class MinHasher:
+    """Firmas MinHash de `num_perm` permutaciones (a·x + b mod p), reproducibles por semilla."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, tokens: Set[str]) -> Signature:
+        if not tokens:
+            return (_MAX_HASH,) * self.num_perm
+        hashes = [
+            int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            for token in tokens
+        ]
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self._params
+        )
+
+def estimated_similarity(a: Signature, b: Signature) -> float:
+    """Estimación de la similitud de Jaccard a partir de dos firmas."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+class SimilarityIndex:
+    """Índice LSH en memoria sobre firmas MinHash."""
+
+    def __init__(self, threshold: float, num_perm: int = 64, bands: int = 32):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands.")
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self._rows = num_perm // bands
+        self._buckets: List[Dict[Signature, List[Hashable]]] = [defaultdict(list) for _ in range(bands)]
+        self._signatures: Dict[Hashable, Signature] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def signature_for(self, text: str) -> Signature:
+        return self.hasher.signature(shingles(text))
+
+    def _bands(self, signature: Signature):
+        for i, buckets in enumerate(self._buckets):
+            yield buckets, signature[i * self._rows:(i + 1) * self._rows]
+
+    def add(self, key: Hashable, signature: Signature) -> None:
+        self._signatures[key] = signature
+        for buckets, band in self._bands(signature):
+            buckets[band].append(key)
+
+    def query(self, signature: Signature) -> Optional[Tuple[Hashable, float]]:
+        """El elemento indexado más parecido por encima del umbral, con su similitud estimada."""
+        candidates = set()
+        for buckets, band in self._bands(signature):
+            candidates.update(buckets.get(band, ()))
+        best: Optional[Tuple[Hashable, float]] = None
+        for key in candidates:
+            similarity = estimated_similarity(signature, self._signatures[key])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
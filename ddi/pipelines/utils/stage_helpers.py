@@ -2,13 +2,13 @@
 
 from __future__ import annotations
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Set
 import uuid
 
-from dpath.util import set as dpath_set
 from ddi.schemas.models import Item
 from ddi.schemas.enums import ItemStatus
-from ddi.schemas.item_schemas import ItemGenerationParams, ProcessLogEntry, RefinementPatch, ItemPayloadSchema
+from ddi.schemas.item_schemas import ItemGenerationParams, ProcessLogEntry, RefinementPatch
+from ddi.pipelines.utils.patching import apply_patches_in_place
 from ddi.core.log import logger
 
 def initialize_items_for_pipeline(params: Dict[str, Any]) -> List[Item]:
@@ -73,10 +73,24 @@ def handle_missing_payload(item: Item, stage_name: str) -> bool:
         return True
     return False
 
-def apply_patches(item: Item, patches: List[RefinementPatch]) -> Item:
+def path_overlaps(path: str, other: str) -> bool:
+    """True si una ruta es igual a la otra o la contiene (p. ej. 'cuerpo_item' y 'cuerpo_item.opciones[0]')."""
+    if len(path) > len(other):
+        path, other = other, path
+    return other == path or (other.startswith(path) and other[len(path)] in ".[")
+
+def paths_touching(paths: Iterable[str], prefixes: Iterable[str]) -> Set[str]:
+    """Las rutas de `paths` que se solapan con alguno de los `prefixes`."""
+    prefixes = list(prefixes)
+    return {path for path in paths if any(path_overlaps(path, prefix) for prefix in prefixes)}
+
+def apply_patches(item: Item, patches: List[RefinementPatch], origin: Optional[str] = None) -> Item:
     """
-    Aplica una lista de parches a un objeto Item, modifica su payload
-    y actualiza su log de refinamiento. Devuelve el ítem modificado.
+    Aplica una lista de parches al payload del ítem, en su sitio, y actualiza
+    su log de refinamiento. Devuelve el ítem modificado.
+
+    Las rutas cuyo valor cambia realmente quedan en `item.dirty_fields`
+    (ruta -> `origin`), para que el ciclo de QA sepa qué re-validar.
     """
     if not item.payload:
         logger.warning(f"Intento de aplicar parches a un ítem sin payload: {item.temp_id}")
@@ -85,20 +99,37 @@ def apply_patches(item: Item, patches: List[RefinementPatch]) -> Item:
     if not patches:
         return item
 
-    payload_dict = item.payload.model_dump()
-    applied_patches_count = 0
+    result = apply_patches_in_place(item.payload, patches)
+    for parche, motivo in result.rejected:
+        logger.error(f"Parche rechazado en el ítem {item.temp_id} ({parche.code} en '{parche.field_path}'): {motivo}")
 
-    for parche in patches:
-        if parche.refined_value is not None:
-            try:
-                dpath_set(payload_dict, parche.field_path, parche.refined_value)
-                applied_patches_count += 1
-            except (KeyError, IndexError):
-                logger.error(f"Error al aplicar parche: Ruta no válida '{parche.field_path}' en el ítem {item.temp_id}")
-
-    if applied_patches_count > 0:
-        item.payload = ItemPayloadSchema.model_validate(payload_dict)
+    if result.applied:
         item.refinement_log.extend(patches)
-        logger.info(f"Aplicados {applied_patches_count} parches al ítem {item.temp_id}")
+        for path in result.changed:
+            item.dirty_fields[path] = origin or "desconocido"
+        logger.info(f"Aplicados {len(result.applied)} parches al ítem {item.temp_id} ({len(result.changed)} campos modificados)")
 
     return item
+
+def record_stage_findings(item: Item, stage_name: str, findings: List[RefinementPatch]) -> None:
+    """Guarda los hallazgos de la última ejecución de un validador para el ciclo de QA."""
+    item.temp_data.setdefault("qa_findings", {})[stage_name] = list(findings)
+
+def get_qa_focus(item: Item, stage_name: str) -> Optional[Set[str]]:
+    """
+    Rutas a las que el ciclo de QA restringió la re-validación de la etapa,
+    o None si debe revisar el ítem completo.
+    """
+    return item.temp_data.get("qa_focus", {}).get(stage_name)
+
+def text_fields_for_validation(item: Item, stage_name: str) -> Dict[str, str]:
+    """
+    Los textos del ítem por ruta. Si el ciclo de QA restringió la etapa a
+    los campos modificados, solo esos (o todos, si el foco no toca ningún texto).
+    """
+    textos = item.payload.get_all_text_fields_by_path()
+    focus = get_qa_focus(item, stage_name)
+    if not focus:
+        return textos
+    focused = {ruta: texto for ruta, texto in textos.items() if paths_touching([ruta], focus)}
+    return focused or textos
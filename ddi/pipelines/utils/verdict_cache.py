@@ -0,0 +1,78 @@
+# ddi/pipelines/utils/verdict_cache.py
+
+"""
+Caché persistente de veredictos de las etapas de validación.
+
+Los hallazgos de `validate_factual`, `validate_psychometric` y `correct_style`
+dependen solo de la entrada que reciben, así que un veredicto ya obtenido para
+la misma entrada y la misma versión del prompt se reutiliza sin llamar al LLM:
+en re-ejecuciones, lotes reanudados o ítems que un refinador dejó como estaban.
+
+La clave es el SHA-256 de (etapa, versión y huella del prompt, entrada
+serializada). Solo se guardan resultados válidos, nunca errores.
+
+Las consultas usan una sesión propia en un hilo aparte: no bloquean el bucle
+de eventos y nunca confirman ni revierten la sesión compartida del pipeline.
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Any, Callable, Dict, Iterable
+
+from ddi.core import metrics
+from ddi.core.config import settings
+from ddi.db import crud
+from ddi.db.session import SessionLocal
+from ddi.prompts import CompiledPrompt
+from ddi.schemas.adapters import get_adapter
+
+logger = logging.getLogger(__name__)
+
+def verdict_key(stage_name: str, prompt: CompiledPrompt, user_input: str) -> str:
+    """Clave estable del veredicto de una etapa para una entrada concreta."""
+    material = "\0".join((stage_name, prompt.name, prompt.version, prompt.digest, user_input))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+def _in_own_session(operation: Callable[..., Any], *args: Any) -> Any:
+    db = SessionLocal()
+    try:
+        return operation(db, *args)
+    finally:
+        db.close()
+
+async def lookup_verdicts(stage_name: str, schema: Any, keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Recupera los veredictos guardados para `keys`, ya validados contra `schema`.
+    Las claves sin veredicto (o con uno que ya no valida) no aparecen en el resultado.
+    """
+    keys = [key for key in keys if key]
+    if not keys:
+        return {}
+    try:
+        stored = await asyncio.to_thread(_in_own_session, crud.get_verdicts, keys, settings.verdict_cache_ttl_s)
+    except Exception as e:
+        logger.warning(f"No se pudo consultar la caché de veredictos para '{stage_name}': {e}")
+        return {}
+
+    adapter = get_adapter(schema)
+    verdicts: Dict[str, Any] = {}
+    for key, raw in stored.items():
+        try:
+            verdicts[key] = adapter.validate_python(raw)
+        except Exception:
+            # El esquema cambió desde que se guardó; se tratará como un fallo de caché.
+            continue
+    metrics.incr(f"verdict_cache.hits.{stage_name}", len(verdicts))
+    metrics.incr(f"verdict_cache.misses.{stage_name}", len(keys) - len(verdicts))
+    return verdicts
+
+async def store_verdict(stage_name: str, prompt: CompiledPrompt, key: str, schema: Any, verdict: Any) -> None:
+    """Guarda el veredicto válido de una etapa. Un fallo de la BD no interrumpe el pipeline."""
+    if not key:
+        return
+    try:
+        data = get_adapter(schema).dump_python(verdict, mode="json")
+        await asyncio.to_thread(_in_own_session, crud.save_verdict, key, stage_name, prompt.version, data)
+    except Exception as e:
+        logger.warning(f"No se pudo guardar el veredicto de '{stage_name}' en la caché: {e}")
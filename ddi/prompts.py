@@ -1,49 +1,198 @@
-# app/prompts/__init__.py
+# ddi/prompts.py
 
+"""
+Registro de plantillas de prompt versionadas.
+
+Los prompts viven en `<prompts_dir>/v_<versión>/*.md`. Cada versión se carga
+completa la primera vez que se usa (o al arrancar, con `preload_prompts`): el
+mensaje de sistema se separa del de usuario por `***` y las posiciones de los
+placeholders (`{input}`, `{current_date_context}`) se precompilan, de modo que
+construir los mensajes de una llamada es solo concatenar segmentos.
+
+Si `settings.prompt_reload_interval_s > 0`, una tarea en segundo plano vigila
+los archivos y recarga la versión modificada; la versión nueva sustituye a la
+anterior de una sola vez, nunca a medias. Pueden servirse varias versiones a
+la vez (p. ej. con el parámetro de etapa `prompt_version`).
+"""
+
+import asyncio
+import hashlib
 import logging
+import re
+import threading
+from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
-from typing import Dict, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from ddi.core.config import settings
+from ddi.pipelines.utils.parsers import current_date_context, serialize_payload
 
 logger = logging.getLogger(__name__)
 
 PROMPT_SEPARATOR = "***"
+PLACEHOLDERS = ("input", "current_date_context")
+_PLACEHOLDER_PATTERN = re.compile(r"\{(" + "|".join(PLACEHOLDERS) + r")\}")
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """Plantilla ya separada y con los placeholders localizados."""
+    name: str
+    version: str
+    system_message: str
+    # Segmentos literales intercalados con los nombres de placeholder:
+    # segments[0] + valor(placeholders[0]) + segments[1] + ...
+    segments: Tuple[str, ...]
+    placeholders: Tuple[str, ...]
+
+    @classmethod
+    def compile(cls, name: str, version: str, full_content: str) -> "CompiledPrompt":
+        if PROMPT_SEPARATOR in full_content:
+            system_message, content_template = (part.strip() for part in full_content.split(PROMPT_SEPARATOR, 1))
+        else:
+            # Si no hay separador, se trata todo como una sola plantilla.
+            system_message, content_template = "", full_content
+        segments: List[str] = []
+        placeholders: List[str] = []
+        pos = 0
+        for match in _PLACEHOLDER_PATTERN.finditer(content_template):
+            segments.append(content_template[pos:match.start()])
+            placeholders.append(match.group(1))
+            pos = match.end()
+        segments.append(content_template[pos:])
+        return cls(name, version, system_message, tuple(segments), tuple(placeholders))
+
+    @cached_property
+    def digest(self) -> str:
+        """Huella del texto de la plantilla; cambia si se edita aunque la versión sea la misma."""
+        material = f"{self.version}\0{self.system_message}\0{self.content}"
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def content(self) -> str:
+        """La plantilla de usuario original, con los placeholders sin sustituir."""
+        parts = [self.segments[0]]
+        for placeholder, segment in zip(self.placeholders, self.segments[1:]):
+            parts.append(f"{{{placeholder}}}")
+            parts.append(segment)
+        return "".join(parts)
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = [self.segments[0]]
+        for placeholder, segment in zip(self.placeholders, self.segments[1:]):
+            parts.append(values[placeholder])
+            parts.append(segment)
+        return "".join(parts)
+
+    def build_messages(self, payload: Union[Dict[str, Any], List[Any], str]) -> List[Dict[str, Any]]:
+        """
+        Mensajes system+user para la API del LLM. El mensaje de sistema es
+        estático y va primero, para que la caché de prefijos del proveedor aplique.
+        """
+        values = {"input": serialize_payload(payload)}
+        if "current_date_context" in self.placeholders:
+            values["current_date_context"] = current_date_context()
+        messages = []
+        if self.system_message:
+            messages.append({"role": "system", "content": self.system_message})
+        messages.append({"role": "user", "content": self.render(values)})
+        return messages
 
-_PROMPT_CACHE: Dict[str, Union[str, Dict[str, str]]] = {}
-_PROMPTS_DIR = Path(__file__).parent.resolve()
+class PromptRegistry:
+    """Versiones de prompts cargadas en memoria, con recarga atómica."""
 
-def load_prompt(prompt_name: str) -> Union[str, Dict[str, str]]:
+    def __init__(self, root: Path):
+        self.root = root
+        self._versions: Dict[str, Dict[str, CompiledPrompt]] = {}
+        self._signatures: Dict[str, Dict[str, Tuple[float, int]]] = {}
+        self._lock = threading.Lock()
+
+    def version_dir(self, version: str) -> Path:
+        return self.root / f"v_{version}"
+
+    def available_versions(self) -> List[str]:
+        return sorted(p.name[2:] for p in self.root.glob("v_*") if p.is_dir())
+
+    def _signature(self, version: str) -> Dict[str, Tuple[float, int]]:
+        signature = {}
+        for path in self.version_dir(version).glob("*.md"):
+            stat = path.stat()
+            signature[path.name] = (stat.st_mtime, stat.st_size)
+        return signature
+
+    def load_version(self, version: str) -> Dict[str, CompiledPrompt]:
+        """Lee y compila todos los prompts de una versión y la publica de una vez."""
+        directory = self.version_dir(version)
+        if not directory.is_dir():
+            raise FileNotFoundError(f"No existe el directorio de prompts '{directory}' para la versión '{version}'.")
+        signature = self._signature(version)
+        prompts = {
+            name: CompiledPrompt.compile(name, version, (directory / name).read_text(encoding="utf-8"))
+            for name in signature
+        }
+        if self._signature(version) != signature:
+            # Algún archivo cambió mientras se leía: se conserva la versión anterior.
+            raise RuntimeError(f"Los prompts de la versión '{version}' cambiaron durante la carga.")
+        with self._lock:
+            self._versions[version] = prompts
+            self._signatures[version] = signature
+        logger.info(f"Prompts de la versión '{version}' cargados ({len(prompts)} plantillas).")
+        return prompts
+
+    def get(self, prompt_name: str, version: Optional[str] = None) -> CompiledPrompt:
+        version = version or settings.prompt_version
+        prompts = self._versions.get(version)
+        if prompts is None:
+            prompts = self.load_version(version)
+        try:
+            return prompts[prompt_name]
+        except KeyError:
+            logger.error(f"Error: prompt '{prompt_name}' no encontrado en '{self.version_dir(version)}'")
+            raise FileNotFoundError(f"Prompt '{prompt_name}' no encontrado para la versión '{version}'.") from None
+
+    def reload_changed(self) -> List[str]:
+        """Recarga las versiones cuyos archivos cambiaron. Devuelve las recargadas."""
+        reloaded = []
+        for version in list(self._versions):
+            try:
+                if self._signature(version) == self._signatures.get(version):
+                    continue
+                self.load_version(version)
+                reloaded.append(version)
+            except Exception as e:
+                logger.error(f"No se pudo recargar la versión de prompts '{version}': {e}")
+        return reloaded
+
+def _resolve_root() -> Path:
+    root = Path(settings.prompts_dir)
+    if not root.is_absolute():
+        root = Path(__file__).resolve().parent.parent / root
+    return root
+
+_REGISTRY = PromptRegistry(_resolve_root())
+
+def get_prompt(prompt_name: str, version: Optional[str] = None) -> CompiledPrompt:
+    return _REGISTRY.get(prompt_name, version)
+
+def load_prompt(prompt_name: str, version: Optional[str] = None) -> Union[str, Dict[str, str]]:
     """
-    Carga un prompt desde el archivo .md correspondiente, lo cachea y lo devuelve.
-    Ahora utiliza '***' como el separador para dividir el system_message del content.
+    Compatibilidad con el formato anterior: devuelve el dict con
+    system_message/content, o la plantilla completa si no hay separador.
     """
-    if prompt_name in _PROMPT_CACHE:
-        return _PROMPT_CACHE[prompt_name]
+    prompt = get_prompt(prompt_name, version)
+    if not prompt.system_message:
+        return prompt.content
+    return {"system_message": prompt.system_message, "content": prompt.content}
 
-    try:
-        file_path = _PROMPTS_DIR / prompt_name
-        with open(file_path, 'r', encoding='utf-8') as f:
-            full_content = f.read()
+def preload_prompts(versions: Optional[List[str]] = None) -> None:
+    """Carga al arrancar la versión configurada y las adicionales indicadas."""
+    for version in versions or [settings.prompt_version, *settings.prompt_preload_versions]:
+        _REGISTRY.load_version(version)
 
-        # Se busca el separador '***'
-        if PROMPT_SEPARATOR in full_content:
-            parts = full_content.split(PROMPT_SEPARATOR, 1)
-            system_message = parts[0].strip()
-            content_template = parts[1].strip()
-
-            prompt_data = {
-                "system_message": system_message,
-                "content": content_template
-            }
-            _PROMPT_CACHE[prompt_name] = prompt_data
-            return prompt_data
-        else:
-            # Si no hay separador, se trata todo como una sola plantilla.
-            _PROMPT_CACHE[prompt_name] = full_content
-            return full_content
-
-    except FileNotFoundError:
-        logger.error(f"Error: Archivo de prompt no encontrado en '{file_path}'")
-        raise
-    except Exception as e:
-        logger.error(f"Error al cargar el prompt '{prompt_name}': {e}")
-        raise
+async def watch_prompts() -> None:
+    """Bucle de recarga en caliente; se ejecuta como tarea durante la vida de la app."""
+    while True:
+        await asyncio.sleep(settings.prompt_reload_interval_s)
+        reloaded = await asyncio.to_thread(_REGISTRY.reload_changed)
+        for version in reloaded:
+            logger.info(f"Prompts de la versión '{version}' recargados en caliente.")
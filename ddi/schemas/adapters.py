@@ -0,0 +1,49 @@
+# ddi/schemas/adapters.py
+
+"""
+Registro de validadores precompilados para las salidas de los LLM.
+
+Construir un `TypeAdapter` compila el validador de pydantic-core, lo que
+cuesta mucho más que validar un payload. El registro lo compila una sola vez
+por esquema (los de las etapas, al importar el módulo) y valida directamente
+desde el texto con `validate_json`, que usa el parser JSON en Rust de
+pydantic-core en lugar de `json.loads` + `validate_python`.
+"""
+
+import json
+from typing import Any, Dict, List, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from .item_schemas import FinalEvaluationSchema, GeneratedItemContent, PlanDeItem, RefinementPatch
+
+_ADAPTERS: Dict[Any, TypeAdapter] = {}
+
+def get_adapter(schema: Any) -> TypeAdapter:
+    """Devuelve el `TypeAdapter` compilado del esquema, creándolo la primera vez."""
+    adapter = _ADAPTERS.get(schema)
+    if adapter is None:
+        adapter = _ADAPTERS[schema] = TypeAdapter(schema)
+    return adapter
+
+def _is_json_syntax_error(error: ValidationError) -> bool:
+    return any(e["type"] == "json_invalid" for e in error.errors())
+
+def validate_llm_json(schema: Any, text: Union[str, bytes]) -> Any:
+    """
+    Parsea y valida en un solo paso. Si el JSON no es estricto (p. ej. saltos
+    de línea literales dentro de un string, que los LLM emiten a menudo), se
+    recurre a `json.loads(strict=False)` antes de validar.
+    """
+    adapter = get_adapter(schema)
+    try:
+        return adapter.validate_json(text)
+    except ValidationError as e:
+        if not _is_json_syntax_error(e):
+            raise
+    return adapter.validate_python(json.loads(text, strict=False))
+
+# Esquemas de salida de las etapas LLM, compilados al importar.
+STAGE_SCHEMAS = (PlanDeItem, GeneratedItemContent, List[RefinementPatch], FinalEvaluationSchema)
+for _schema in STAGE_SCHEMAS:
+    get_adapter(_schema)
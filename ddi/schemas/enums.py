@@ -1,7 +1,29 @@
 # ddi/schemas/enums.py
 
+import unicodedata
 from enum import Enum
 
+def _normalize_label(value: str) -> str:
+    """Minúsculas y sin acentos, para comparar etiquetas escritas por un LLM."""
+    decomposed = unicodedata.normalize("NFKD", value.strip())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+class LenientLabelEnum(str, Enum):
+    """
+    Enum de etiquetas que acepta variantes de mayúsculas y acentos
+    ("media", "MEDIA", "Media" → MEDIA), tanto por valor como por nombre.
+    """
+
+    @classmethod
+    def _missing_(cls, value):
+        if not isinstance(value, str):
+            return None
+        normalized = _normalize_label(value)
+        for member in cls:
+            if normalized in (_normalize_label(member.value), _normalize_label(member.name)):
+                return member
+        return None
+
 class ItemStatus(str, Enum):
     """Define los posibles estados de un ítem a lo largo del pipeline."""
 
@@ -18,13 +40,22 @@ class ItemStatus(str, Enum):
     EVALUATION_COMPLETE = "evaluation_complete"
 
 
-class DificultadEsperadaEnum(str, Enum):
+class JobStatus(str, Enum):
+    """Estados de un trabajo de la cola de lotes (tabla 'pipeline_jobs')."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class DificultadEsperadaEnum(LenientLabelEnum):
     BAJA = "Baja"
     MEDIA = "Media"
     ALTA = "Alta"
 
 
-class NivelCognitivoEnum(str, Enum):
+class NivelCognitivoEnum(LenientLabelEnum):
     RECORDAR = "Recordar"
     COMPRENDER = "Comprender"
     APLICAR = "Aplicar"
@@ -132,6 +132,18 @@ class ProcessLogEntry(BaseModel):
     tokens_used: Optional[int] = None
     codes_found: Optional[List[str]] = Field(default_factory=list)
 
+class LLMCallUsage(BaseModel):
+    """Desglose de tokens de una llamada individual al LLM."""
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    stage_name: str
+    model: Optional[str] = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    total_tokens: int = 0
+    estimated_prompt_tokens: Optional[int] = None
+    cache_hit: bool = False
+
 class RefinementPatch(BaseModel):
     code: str
     field_path: str
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 import uuid
-from typing import List, Optional, Any
+from typing import List, Dict, Optional, Any
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
 
@@ -12,6 +12,7 @@ from .item_schemas import (
     RefinementPatch,
     ProcessLogEntry,
     ItemGenerationParams,
+    LLMCallUsage,
     PlanDeItem
 )
 
@@ -38,8 +39,13 @@ class Item(BaseModel):
     # --- Historial y Trazabilidad ---
     refinement_log: List[RefinementPatch] = Field(default_factory=list, description="Log de todos los hallazgos y modificaciones de calidad.")
     process_log: List[ProcessLogEntry] = Field(default_factory=list, description="Log de las etapas del pipeline ejecutadas para este ítem.")
+    llm_usage: List[LLMCallUsage] = Field(default_factory=list, description="Desglose de tokens (prompt, completion, cached) por llamada al LLM.")
+
+    # --- Reanudación ---
+    checkpoint: Dict[str, Any] = Field(default_factory=dict, description="Etapas completadas e iteraciones de QA hechas, para reanudar el lote tras una interrupción.")
 
     # --- Datos Temporales ---
+    dirty_fields: Dict[str, str] = Field(default_factory=dict, exclude=True, description="Rutas del payload modificadas desde la última validación, con la etapa que las cambió.")
     temp_data: dict[str, Any] = Field({}, exclude=True, description="Contenedor para datos temporales entre etapas que no se persisten.")
 
     # --- Configuración del Modelo Pydantic ---
@@ -0,0 +1,167 @@
+# ddi/worker.py
+
+"""
+Worker de la cola de lotes.
+
+Arrienda trabajos de la tabla `pipeline_jobs` y ejecuta el pipeline de cada
+lote fuera del proceso de la API, de modo que los workers escalan (en núcleos
+y en nodos) por separado de las réplicas de la API. Cada lote se procesa con
+`runner.resume`, que parte de lo persistido: un trabajo retomado tras la
+caída de otro worker salta las etapas e iteraciones de QA ya completadas.
+
+Mientras procesa un lote, el worker renueva su arrendamiento cada tercio del
+`worker_visibility_timeout_s`; si deja de hacerlo (el proceso murió), el
+trabajo vuelve a estar disponible al vencer. Al recibir SIGTERM/SIGINT deja
+de arrendar y devuelve a la cola los lotes en curso.
+
+Uso:
+    python -m ddi.worker [--concurrency N]
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import uuid
+from typing import Dict
+
+from ddi.core import metrics
+from ddi.core.config import settings
+from ddi.core.log import logger
+from ddi.db import crud
+from ddi.db.session import SessionLocal
+from ddi.llm.cache import close_response_cache
+from ddi.llm.providers import init_client_pool, close_client_pool
+from ddi.pipelines.runner import resume as resume_pipeline_async
+from ddi.prompts import preload_prompts, watch_prompts
+
+# Registra las etapas del pipeline (importación por efecto secundario).
+from ddi.pipelines import builtins  # noqa: F401
+
+class Worker:
+    """Procesa hasta `concurrency` lotes de la cola a la vez."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, concurrency)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopping = asyncio.Event()
+        self._active: Dict[uuid.UUID, asyncio.Task] = {}
+
+    def stop(self) -> None:
+        logger.info(f"Worker {self.worker_id}: deteniéndose; los lotes en curso vuelven a la cola.")
+        self._stopping.set()
+
+    async def run(self) -> None:
+        logger.info(f"Worker {self.worker_id} iniciado (concurrencia {self.concurrency}).")
+        while not self._stopping.is_set():
+            if len(self._active) >= self.concurrency or not self._lease_next():
+                await self._wait(settings.worker_poll_interval_s)
+
+        for task in self._active.values():
+            task.cancel()
+        await asyncio.gather(*self._active.values(), return_exceptions=True)
+        logger.info(f"Worker {self.worker_id} detenido.")
+
+    async def _wait(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _lease_next(self) -> bool:
+        """Arrienda un trabajo y lanza su procesamiento. False si no había ninguno disponible."""
+        db = SessionLocal()
+        try:
+            job = crud.lease_job(db, self.worker_id, settings.worker_visibility_timeout_s)
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id}: no se pudo arrendar un trabajo: {e}")
+            return False
+        finally:
+            db.close()
+        if job is None:
+            return False
+
+        metrics.incr("worker.jobs.leased")
+        logger.info(f"Worker {self.worker_id}: lote {job.batch_id} arrendado (intento {job.attempts}/{job.max_attempts}).")
+        task = asyncio.create_task(self._process(job.id, job.batch_id))
+        self._active[job.id] = task
+        task.add_done_callback(lambda _: self._active.pop(job.id, None))
+        return True
+
+    async def _process(self, job_id: uuid.UUID, batch_id: str) -> None:
+        db = SessionLocal()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, batch_id, asyncio.current_task()))
+        try:
+            await resume_pipeline_async(settings.pipeline_config_path, batch_id, {"db_session": db})
+        except asyncio.CancelledError:
+            # Parada ordenada o arrendamiento perdido: si sigue siendo nuestro, vuelve a la cola.
+            self._settle(crud.release_job, job_id, "worker.jobs.released")
+            raise
+        except Exception as e:
+            logger.error(f"Worker {self.worker_id}: fallo al procesar el lote {batch_id}: {e}", exc_info=True)
+            self._settle(crud.fail_job, job_id, "worker.jobs.failed", str(e), settings.worker_retry_delay_s)
+        else:
+            self._settle(crud.complete_job, job_id, "worker.jobs.completed")
+            logger.info(f"Worker {self.worker_id}: lote {batch_id} terminado.")
+        finally:
+            heartbeat.cancel()
+            db.close()
+
+    async def _heartbeat(self, job_id: uuid.UUID, batch_id: str, job_task: asyncio.Task) -> None:
+        """Renueva el arrendamiento; si otro worker tomó el trabajo, cancela el procesamiento."""
+        interval = settings.worker_visibility_timeout_s / 3
+        while True:
+            await asyncio.sleep(interval)
+            db = SessionLocal()
+            try:
+                renewed = crud.renew_lease(db, job_id, self.worker_id, settings.worker_visibility_timeout_s)
+            except Exception as e:
+                # Un fallo puntual de la BD no cancela el lote: el arrendamiento aún no ha vencido.
+                logger.warning(f"Worker {self.worker_id}: no se pudo renovar el arrendamiento del lote {batch_id}: {e}")
+                continue
+            finally:
+                db.close()
+            if not renewed:
+                logger.warning(f"Worker {self.worker_id}: se perdió el arrendamiento del lote {batch_id}; se abandona.")
+                metrics.incr("worker.jobs.lease_lost")
+                job_task.cancel()
+                return
+
+    def _settle(self, operation, job_id: uuid.UUID, metric: str, *args) -> None:
+        """Cierra el trabajo (completado, fallido o devuelto) si este worker aún lo tiene arrendado."""
+        db = SessionLocal()
+        try:
+            if operation(db, job_id, self.worker_id, *args):
+                metrics.incr(metric)
+        except Exception as e:
+            # El arrendamiento vencerá y otro worker lo retomará desde el checkpoint.
+            logger.error(f"Worker {self.worker_id}: no se pudo actualizar el trabajo {job_id}: {e}")
+        finally:
+            db.close()
+
+async def _main(concurrency: int) -> None:
+    preload_prompts()
+    # Los lotes se ejecutan aquí: los prompts editados en disco deben recargarse también en el worker.
+    prompt_watcher = asyncio.create_task(watch_prompts()) if settings.prompt_reload_interval_s > 0 else None
+    init_client_pool()
+    worker = Worker(concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        if prompt_watcher is not None:
+            prompt_watcher.cancel()
+        await close_client_pool()
+        close_response_cache()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=settings.worker_concurrency, help="Lotes a la vez en este proceso.")
+    args = parser.parse_args()
+    asyncio.run(_main(args.concurrency))
+
+if __name__ == "__main__":
+    main()
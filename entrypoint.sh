@@ -5,8 +5,18 @@ until psql "$DATABASE_URL" -c '\q' 2>/dev/null; do
   sleep 1
 done > /dev/null
 
-echo "✅ Postgres disponible. Ejecutando migraciones..."
-psql "$DATABASE_URL" -f /usr/src/app/migration.sql > /dev/null
+# Los workers no migran: lo hace el servicio web, y dos psql concurrentes
+# sobre la misma migración pueden chocar.
+if [ -z "$SKIP_MIGRATIONS" ]; then
+  echo "✅ Postgres disponible. Ejecutando migraciones..."
+  psql "$DATABASE_URL" -f /usr/src/app/migration.sql > /dev/null
+  echo "✅ Migraciones completadas."
+fi
 
-echo "✅ Migraciones completadas. Iniciando servidor DDI..."
+# Con argumentos se ejecuta ese comando (p. ej., `python -m ddi.worker`).
+if [ "$#" -gt 0 ]; then
+  exec "$@"
+fi
+
+echo "✅ Iniciando servidor DDI..."
 exec uvicorn ddi.main:app --host 0.0.0.0 --port 8000
@@ -1,14 +1,12 @@
 -- migration.sql
 -- Script de migración para la tabla 'items' del proyecto DDI.
 
--- Elimina la tabla existente para asegurar una creación limpia.
-DROP TABLE IF EXISTS items CASCADE;
-
 -- Habilita la extensión para generación de UUIDs si no existe.
 CREATE EXTENSION IF NOT EXISTS "pgcrypto";
 
--- Crea la tabla 'items' con la estructura alineada al proyecto DDI.
-CREATE TABLE items (
+-- Crea la tabla 'items' si no existe. La migración no es destructiva: se
+-- ejecuta en cada arranque y los lotes a medias deben sobrevivir para reanudarse.
+CREATE TABLE IF NOT EXISTS items (
     -- Columnas de Identificación y Estado (optimizadas para búsquedas)
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
     temp_id UUID NOT NULL,
@@ -21,12 +19,20 @@ CREATE TABLE items (
     payload JSONB, -- Puede ser nulo al inicio del pipeline
     process_log JSONB NOT NULL DEFAULT '[]'::jsonb,
     refinement_log JSONB NOT NULL DEFAULT '[]'::jsonb,
+    llm_usage JSONB NOT NULL DEFAULT '[]'::jsonb, -- Desglose de tokens por llamada
+    plan_de_item JSONB, -- Plan generado por el Analista Diagnóstico
+    checkpoint JSONB NOT NULL DEFAULT '{}'::jsonb, -- Progreso para reanudar el lote
 
     -- Metadatos de la fila
     created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
     updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+-- Columnas añadidas después de la creación original de la tabla.
+ALTER TABLE items ADD COLUMN IF NOT EXISTS llm_usage JSONB NOT NULL DEFAULT '[]'::jsonb;
+ALTER TABLE items ADD COLUMN IF NOT EXISTS plan_de_item JSONB;
+ALTER TABLE items ADD COLUMN IF NOT EXISTS checkpoint JSONB NOT NULL DEFAULT '{}'::jsonb;
+
 -- Trigger para actualizar 'updated_at' automáticamente en cada modificación.
 CREATE OR REPLACE FUNCTION trigger_set_timestamp()
 RETURNS TRIGGER AS $$
@@ -61,3 +67,45 @@ CREATE INDEX IF NOT EXISTS idx_payload_dominio_tema ON items USING gin ((payload
 CREATE INDEX IF NOT EXISTS idx_payload_audiencia_nivel ON items USING gin ((payload -> 'audiencia' ->> 'nivel_educativo') gin_trgm_ops);
 CREATE INDEX IF NOT EXISTS idx_payload_nivel_cognitivo ON items USING gin ((payload ->> 'nivel_cognitivo') gin_trgm_ops);
 CREATE INDEX IF NOT EXISTS idx_payload_formato_tipo ON items USING gin ((payload -> 'formato' ->> 'tipo_reactivo') gin_trgm_ops);
+
+-- --- CACHÉ DE VEREDICTOS ---
+-- Veredictos de las etapas de validación por hash de (entrada, versión de prompt).
+-- No se elimina al migrar: su valor está precisamente en sobrevivir entre lotes.
+CREATE TABLE IF NOT EXISTS verdict_cache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    stage_name VARCHAR(255) NOT NULL,
+    prompt_version VARCHAR(255) NOT NULL,
+    verdict JSONB NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_verdict_cache_stage_name ON verdict_cache (stage_name);
+CREATE INDEX IF NOT EXISTS idx_verdict_cache_created_at ON verdict_cache (created_at);
+
+-- --- COLA DE LOTES ---
+-- Trabajos que procesan los workers (`python -m ddi.worker`). Se arriendan con
+-- SELECT ... FOR UPDATE SKIP LOCKED; un arrendamiento vencido (worker caído)
+-- deja el trabajo disponible de nuevo.
+CREATE TABLE IF NOT EXISTS pipeline_jobs (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    batch_id VARCHAR(255) NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'queued', -- queued | running | done | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    available_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    leased_by VARCHAR(255),
+    lease_expires_at TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE OR REPLACE TRIGGER set_timestamp
+BEFORE UPDATE ON pipeline_jobs
+FOR EACH ROW
+EXECUTE PROCEDURE trigger_set_timestamp();
+
+-- Como mucho un trabajo activo por lote.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_pipeline_jobs_active_batch ON pipeline_jobs (batch_id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS ix_pipeline_jobs_batch_id ON pipeline_jobs (batch_id);
+CREATE INDEX IF NOT EXISTS ix_pipeline_jobs_status_available_at ON pipeline_jobs (status, available_at);
@@ -0,0 +1,66 @@
+# tests/test_circuit_breaker.py
+
+import asyncio
+import os
+
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/ddi")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import pytest
+
+from ddi.llm.limiter import get_limiter
+from ddi.llm.providers import BaseLLMClient, LLMResponse
+from ddi.llm.retry import CircuitBreaker, get_breaker
+from ddi.core.config import settings
+
+class _RejectedSchema(Exception):
+    """Error no transitorio (p. ej., un 400 por esquema rechazado)."""
+    status_code = 400
+
+class _FakeClient(BaseLLMClient):
+    provider_name = "fake_breaker_test"
+
+    def __init__(self, error: Exception = None):
+        super().__init__(settings, model="fake-model")
+        self.error = error
+
+    async def _call(self, messages, tool_choice, **kwargs):
+        if self.error is not None:
+            raise self.error
+        return LLMResponse(text="{}", model=self.model, usage={"total": 1})
+
+def _half_open_breaker() -> CircuitBreaker:
+    breaker = get_breaker(_FakeClient.provider_name)
+    breaker._open()
+    breaker.opened_at -= settings.llm_breaker_open_s
+    return breaker
+
+def test_non_transient_error_releases_half_open_probe():
+    async def scenario():
+        breaker = _half_open_breaker()
+        with pytest.raises(_RejectedSchema):
+            await _FakeClient(_RejectedSchema("schema"))._limited_call([{"role": "user", "content": "x"}], "none")
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker._probe_in_flight
+
+        # La siguiente llamada puede actuar como prueba y, si tiene éxito, cierra el breaker.
+        await _FakeClient()._limited_call([{"role": "user", "content": "x"}], "none")
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+def test_limiter_failure_releases_half_open_probe(monkeypatch):
+    async def failing_acquire(self, *args, **kwargs):
+        raise RuntimeError("limiter")
+
+    async def scenario():
+        breaker = _half_open_breaker()
+        client = _FakeClient()
+        monkeypatch.setattr(type(get_limiter(client.provider_name, client.model)), "acquire", failing_acquire)
+        with pytest.raises(RuntimeError):
+            await client._limited_call([{"role": "user", "content": "x"}], "none")
+        assert not breaker._probe_in_flight
+        await breaker.before_call()
+        assert breaker._probe_in_flight
+
+    asyncio.run(scenario())